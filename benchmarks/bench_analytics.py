@@ -0,0 +1,36 @@
+"""Benchmark price_analytics.compute_price_stats on minute-resolution series
+
+Run from the repository root:
+
+    python benchmarks/bench_analytics.py
+"""
+import os
+import sys
+import time
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_analytics import compute_price_stats, format_price_summary
+
+def make_series(days, seed=42):
+    """Random-walk prices sampled once a minute"""
+    count = days * 24 * 60
+    rng = np.random.default_rng(seed)
+    timestamps = time.time() - 60.0 * np.arange(count)[::-1]
+    prices = 60000 * np.exp(np.cumsum(rng.normal(0, 0.0008, count)))
+    return timestamps, prices
+
+def main():
+    print(f"{'days':>5} {'samples':>8} {'stats (ms)':>11} {'summary (ms)':>13}")
+    for days in (1, 3, 7, 14):
+        timestamps, prices = make_series(days)
+        runs = 200
+        stats_time = min(timeit.repeat(lambda: compute_price_stats(timestamps, prices), number=runs, repeat=5)) / runs
+        stats = compute_price_stats(timestamps, prices)
+        summary_time = min(timeit.repeat(lambda: format_price_summary(stats), number=runs, repeat=5)) / runs
+        print(f"{days:>5} {len(prices):>8} {stats_time * 1000:>11.3f} {summary_time * 1000:>13.3f}")
+
+if __name__ == "__main__":
+    main()
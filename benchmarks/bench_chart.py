@@ -0,0 +1,114 @@
+"""Benchmark chart rendering time and peak memory
+
+Compares the original per-run pyplot chart with chart_renderer. Each case
+runs in its own process so peak RSS is measured per case. Run from the
+repository root:
+
+    python benchmarks/bench_chart.py
+"""
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+from io import BytesIO
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CASES = ["pyplot", "renderer-png", "renderer-png-compressed", "renderer-svg", "renderer-compact"]
+
+def make_series(count, seed=7):
+    rng = np.random.default_rng(seed)
+    timestamps = time.time() - 60.0 * np.arange(count)[::-1]
+    prices = 60000 + np.cumsum(rng.normal(0, 25, count))
+    return timestamps, prices
+
+def render_pyplot(timestamps, prices):
+    """The chart as email_agent used to draw it, through pyplot at 300 dpi"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    from datetime import datetime, timezone
+
+    dates = [datetime.fromtimestamp(ts, timezone.utc) for ts in timestamps]
+    plt.figure(figsize=(12, 6))
+    plt.plot(dates, prices, 'b-', label='BTC Price', linewidth=2)
+    plt.title('Bitcoin Price Trend (24 Hours)', fontsize=14)
+    plt.xlabel('Time (UTC)', fontsize=12)
+    plt.ylabel('Price (USD)', fontsize=12)
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.legend(fontsize=10)
+    plt.gcf().autofmt_xdate()
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    plt.annotate(f'${prices[-1]:,.2f}', (dates[-1], prices[-1]), xytext=(10, 10), textcoords='offset points')
+    plt.annotate(f'${prices[0]:,.2f}', (dates[0], prices[0]), xytext=(-10, 10), textcoords='offset points',
+                 horizontalalignment='right')
+    plt.tight_layout()
+    buf = BytesIO()
+    plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
+    plt.close()
+    return buf.getvalue()
+
+def run_case(case, points, runs):
+    timestamps, prices = make_series(points)
+    start = time.perf_counter()
+    if case == "pyplot":
+        render = render_pyplot
+    else:
+        from chart_renderer import ChartRenderer
+        preset, output_format, compress_png = {
+            "renderer-png": ("email", "png", False),
+            "renderer-png-compressed": ("email", "png", True),
+            "renderer-svg": ("email", "svg", False),
+            "renderer-compact": ("compact", "png", False)
+        }[case]
+        render = ChartRenderer(preset=preset, output_format=output_format, compress_png=compress_png).render
+
+    output = render(timestamps, prices)
+    first = time.perf_counter() - start
+
+    # Each run appends a sample so the data, and the cache key, changes
+    times = []
+    for i in range(runs):
+        timestamps = np.append(timestamps[1:], timestamps[-1] + 60)
+        prices = np.append(prices[1:], prices[-1] + (i % 5 - 2) * 10)
+        start = time.perf_counter()
+        output = render(timestamps, prices)
+        times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    render(timestamps, prices)
+    unchanged = time.perf_counter() - start
+
+    return {
+        "case": case,
+        "points": points,
+        "first_ms": first * 1000,
+        "render_ms": sorted(times)[len(times) // 2] * 1000,
+        "unchanged_ms": unchanged * 1000,
+        "bytes": len(output),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] in CASES:
+        print(json.dumps(run_case(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))))
+        return
+
+    print(f"{'case':<24} {'points':>7} {'first ms':>9} {'render ms':>10} {'same ms':>8} {'KB':>7} {'peak RSS MB':>12}")
+    for points in (1440, 10080):
+        for case in CASES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), case, str(points), "10"],
+                check=True, capture_output=True, text=True, cwd=ROOT
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{result['case']:<24} {result['points']:>7} {result['first_ms']:>9.1f} {result['render_ms']:>10.1f} "
+                  f"{result['unchanged_ms']:>8.1f} {result['bytes'] / 1024:>7.0f} {result['peak_rss_mb']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark report_fanout.build_messages throughput in subscribers per second
+
+Builds the messages for synthetic subscribers spread over a number of
+(detail, timezone) segments, once in a single deduplicated fan-out and once
+building each subscriber's message separately, and serializes them as SMTP
+would. Run from the repository root:
+
+    python benchmarks/bench_fanout.py
+    python benchmarks/bench_fanout.py --subscribers 1000,20000 --timezones 8 --workers 8
+"""
+import os
+import sys
+import time
+import argparse
+from email.mime.image import MIMEImage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import report_fanout
+from report_fanout import build_report, build_messages, DETAIL_LEVELS
+from price_analytics import compute_price_stats
+
+TIMEZONES = ("UTC", "Europe/London", "Europe/Berlin", "America/New_York", "America/Los_Angeles",
+             "Asia/Tokyo", "Asia/Singapore", "Australia/Sydney", "Asia/Kolkata", "America/Sao_Paulo")
+
+ANALYSIS = """Subject: Bitcoin climbs 1.8% as ETF inflows pick up
+
+Dear Reader,
+
+Bitcoin rose 1.8% over the day to $67,300, recovering from an early dip to $65,900 as spot ETF inflows
+accelerated and treasury yields eased after softer inflation data. Momentum is positive, with the price
+holding above its short moving average through the afternoon.
+
+Risks remain around the upcoming FOMC meeting; a hawkish surprise could reverse the move quickly.
+
+Best Regards,"""
+
+def make_subscribers(count, timezones):
+    return [
+        {"email": f"reader{i}@example.com", "timezone": TIMEZONES[i % timezones], "detail": DETAIL_LEVELS[i // timezones % 2]}
+        for i in range(count)
+    ]
+
+def run_case(count, timezones, workers, deduplicate, report, attachment):
+    subscribers = make_subscribers(count, timezones)
+    start = time.perf_counter()
+    if deduplicate:
+        messages, stats = build_messages(report, subscribers, "agent@example.com", [attachment], workers=workers)
+        segments = stats['segments']
+    else:
+        # One build per subscriber, as calling the agent per person would
+        messages = []
+        for subscriber in subscribers:
+            messages.extend(build_messages(report, [subscriber], "agent@example.com", [attachment], workers=1)[0])
+        segments = count
+    built = time.perf_counter() - start
+    payload = sum(len(message.as_bytes()) for message in messages)
+    total = time.perf_counter() - start
+    return {
+        "segments": segments,
+        "build_per_second": count / built,
+        "total_per_second": count / total,
+        "mb": payload / 1024 / 1024
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--subscribers', default='100,1000,10000', help='subscriber counts, comma separated')
+    parser.add_argument('--timezones', type=int, default=5, help=f'distinct timezones (up to {len(TIMEZONES)})')
+    parser.add_argument('--workers', type=int, default=report_fanout.REPORT_WORKERS, help='thread pool size')
+    args = parser.parse_args()
+
+    timestamps = time.time() - 60.0 * np.arange(1440)[::-1]
+    prices = 67000 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.0008, len(timestamps))))
+    report = build_report(ANALYSIS, compute_price_stats(timestamps, prices))
+    attachment = MIMEImage(os.urandom(120 * 1024), _subtype='png')
+
+    print(f"{'subscribers':>11} {'mode':<12} {'segments':>9} {'build subs/s':>13} {'+serialize subs/s':>18} {'sent MB':>8}")
+    for count in (int(count) for count in args.subscribers.split(',') if count):
+        for deduplicate in (True, False):
+            result = run_case(count, min(args.timezones, len(TIMEZONES)), args.workers, deduplicate, report, attachment)
+            print(f"{count:>11} {'segments' if deduplicate else 'per person':<12} {result['segments']:>9} "
+                  f"{result['build_per_second']:>13.0f} {result['total_per_second']:>18.0f} {result['mb']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark news_index.NewsIndex build, incremental update and query times
+
+Synthetic eco_info rows (Zipf-distributed filler words with query terms
+sprinkled in) are loaded with update(), as on the email agent's first run,
+then new batches are added incrementally and the default Bitcoin/macro
+query is run. "all live" spreads the stored stories over the index's max
+age, so all of them are indexed and scored; "30 days" spreads them over a
+month, so only the last NEWS_MAX_AGE_HOURS are loaded. Run from the
+repository root:
+
+    python benchmarks/bench_news_index.py
+    python benchmarks/bench_news_index.py --sizes 100000,250000 --batch 500
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from news_index import NewsIndex, query_terms, NEWS_MAX_AGE_HOURS
+
+QUERY_WORDS = query_terms() + ['market', 'price', 'stock', 'earnings', 'oil', 'gold', 'china', 'bank']
+
+def make_rows(count, span_seconds, seed=11, start_id=0, now=None):
+    """count rows with timestamps spread evenly over span_seconds up to now"""
+    rng = random.Random(seed + start_id)
+    now = now or time.time()
+    vocabulary = [f"w{i}" for i in range(20000)]
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+
+    def words(n):
+        picked = rng.choices(vocabulary, weights, k=n)
+        for _ in range(rng.randint(0, 3)):
+            picked[rng.randrange(n)] = rng.choice(QUERY_WORDS)
+        return " ".join(picked)
+
+    step = span_seconds / max(count, 1)
+    return [
+        {
+            "url": f"https://news.example.com/{start_id + i}",
+            "finance_info": f"Title: {words(10)}\nDescription: {words(30)}\nSource: https://news.example.com/{start_id + i}",
+            "timestamp": datetime.fromtimestamp(now - span_seconds + i * step, timezone.utc).isoformat()
+        }
+        for i in range(count)
+    ]
+
+def run_case(name, size, span_seconds, batch, queries):
+    now = time.time()
+    rows = make_rows(size, span_seconds, now=now)
+
+    # Stands in for the local store query (ISO timestamps in UTC sort as strings)
+    def fetch_rows_since(since):
+        return [row for row in rows if row['timestamp'] >= since]
+
+    index = NewsIndex()
+    start = time.perf_counter()
+    index.update(fetch_rows_since, now=now)
+    build_seconds = time.perf_counter() - start
+    indexed = len(index)
+
+    # Memory held by the index itself (the rows are shared with the caller)
+    tracemalloc.start()
+    measured = NewsIndex()
+    measured.update(fetch_rows_since, now=now)
+    memory_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    del measured
+
+    # New stories arriving after the bulk load, fetched through update()
+    update_times = []
+    for round_number in range(5):
+        later = now + (round_number + 1) * 60
+        new_rows = make_rows(batch, 60, start_id=size + round_number * batch, now=later)
+        start = time.perf_counter()
+        index.update(lambda since: new_rows, now=later)
+        update_times.append(time.perf_counter() - start)
+
+    terms = query_terms()
+    query_times = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        results = index.search(terms, now=later)
+        query_times.append(time.perf_counter() - start)
+
+    return {
+        "case": name,
+        "size": size,
+        "indexed": indexed,
+        "build_us_per_article": build_seconds / max(indexed, 1) * 1e6,
+        "build_seconds": build_seconds,
+        "update_ms": statistics.median(update_times) * 1000,
+        "query_ms": statistics.median(query_times) * 1000,
+        "results": len(results),
+        "memory_mb": memory_mb
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='10000,100000', help='stored articles, comma separated')
+    parser.add_argument('--batch', type=int, default=100, help='new articles per incremental update')
+    parser.add_argument('--queries', type=int, default=20, help='queries per case')
+    args = parser.parse_args()
+
+    print(f"{'case':<9} {'articles':>9} {'indexed':>8} {'build s':>8} {'us/article':>11} {'update ms':>10} {'query ms':>9} "
+          f"{'results':>8} {'index MB':>9}")
+    for size in (int(size) for size in args.sizes.split(',') if size):
+        for name, span in (("all live", NEWS_MAX_AGE_HOURS * 3600 * 0.9), ("30 days", 30 * 86400)):
+            result = run_case(name, size, span, args.batch, args.queries)
+            print(f"{result['case']:<9} {result['size']:>9} {result['indexed']:>8} {result['build_seconds']:>8.2f} "
+                  f"{result['build_us_per_article']:>11.1f} {result['update_ms']:>10.2f} {result['query_ms']:>9.2f} "
+                  f"{result['results']:>8} {result['memory_mb']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""End-to-end benchmark of a scheduler tick against local fake services
+
+Runs get_and_store_btc_price, get_finance_news and run_email_agent for a
+few ticks against the stand-ins in fake_services.py, so nothing leaves the
+machine. Each case runs in its own process and temporary working directory
+(with its own .env and cache/), and reports per-stage and whole-tick
+latency, request counts per service and peak RSS. The first tick runs with
+cold caches and is reported separately.
+
+Cases start from the first value of each size and vary one size at a time:
+price history length (btc_price rows for today), Brave results per search
+and email recipients. Results are written to benchmarks/results/<commit>.json
+so runs on different commits can be compared. Run from the repository root:
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --history 1440,10080 --results 20,100 --recipients 1,50
+    python benchmarks/bench_pipeline.py --latency openai=1.5 --errors brave=0.1,supabase=0.02
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/<other commit>.json
+
+Rate limits are off and every tick sends the email (EMAIL_TRIGGER_ENABLED=
+false) so the numbers measure the code rather than the throttles; pass
+--env KEY=VALUE to change any agent setting.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Agent settings for every case, --env overrides them
+DEFAULT_ENV = {
+    "BRAVE_RATE_LIMIT": "0",
+    "SMTP_RATE_LIMIT": "0",
+    "EMAIL_TRIGGER_ENABLED": "false",
+    "PRICE_SAMPLE_SECONDS": "0",
+    "MPLBACKEND": "Agg"
+}
+
+STAGES = ("price", "news", "email", "tick")
+
+def parse_sizes(value):
+    return [int(size) for size in value.split(',') if size]
+
+def parse_pairs(value, cast=str):
+    pairs = {}
+    for item in (value or '').split(','):
+        if item:
+            key, _, setting = item.partition('=')
+            pairs[key.strip()] = cast(setting)
+    return pairs
+
+def git_commit(root=ROOT):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+def make_history(count):
+    """count btc_price rows spread evenly over today (UTC) up to now"""
+    now = time.time()
+    midnight = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    step = (now - 30 - midnight) / max(count, 1)
+    return [
+        {
+            "id": i + 1,
+            "price": round(67000 + 400 * ((i * 7919) % 1000) / 1000 - 200 + i * 0.01, 2),
+            "created_at": datetime.fromtimestamp(midnight + i * step, timezone.utc).isoformat()
+        }
+        for i in range(count)
+    ]
+
+def make_cases(history, results, recipients):
+    base = {"history": history[0], "results": results[0], "recipients": recipients[0]}
+    cases = [dict(base)]
+    for key, values in (("history", history), ("results", results), ("recipients", recipients)):
+        for value in values[1:]:
+            cases.append(dict(base, **{key: value}))
+    for case in cases:
+        case['name'] = f"h{case['history']}-r{case['results']}-m{case['recipients']}"
+    return cases
+
+def run_worker(ticks):
+    """Run the agents for `ticks` ticks in this process and write result.json"""
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import btc_agent
+    import info_agent
+    import email_agent
+    import smtp_pool
+    from http_client import get_http_client
+    from llm_cache import get_llm_cache
+    import_seconds = time.perf_counter() - start
+
+    results = []
+    for _ in range(ticks):
+        tick_start = time.perf_counter()
+        price = btc_agent.get_and_store_btc_price()
+        price_done = time.perf_counter()
+        news = info_agent.get_finance_news()
+        news_done = time.perf_counter()
+        email = email_agent.run_email_agent()
+        email_done = time.perf_counter()
+        results.append({
+            "price": price_done - tick_start,
+            "news": news_done - price_done,
+            "email": email_done - news_done,
+            "tick": email_done - tick_start,
+            "price_ok": price is not None,
+            "news_inserted": news['inserted'],
+            "news_timings": news['timings'],
+            "email_ok": email is not None,
+            "email_timings": email or {}
+        })
+
+    result = {
+        "import_seconds": import_seconds,
+        "ticks": results,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "http_client": get_http_client().stats(),
+        "llm_cache": dict(get_llm_cache().stats),
+        "smtp_engine": dict(smtp_pool._engine.stats) if smtp_pool._engine else {}
+    }
+    with open('result.json', 'w') as f:
+        json.dump(result, f, indent=2)
+
+def summarize(ticks):
+    """Cold (first tick) and warm (median of the rest) seconds per stage"""
+    warm = ticks[1:] or ticks
+    return {
+        "cold": {stage: ticks[0][stage] for stage in STAGES},
+        "warm": {stage: statistics.median(tick[stage] for tick in warm) for stage in STAGES}
+    }
+
+def run_case(services, case, ticks, agent_env, keep):
+    services.reset(tables={"btc_price": make_history(case['history'])}, results_per_search=case['results'])
+    settings = dict(services.env(), **DEFAULT_ENV)
+    settings['EMAIL_RECIPIENTS'] = ",".join(f"reader{i}@example.com" for i in range(case['recipients']))
+    settings.update(agent_env)
+
+    workdir = tempfile.mkdtemp(prefix=f"bench-{case['name']}-")
+    # info_agent and email_agent let .env override the environment, so the
+    # fake endpoints go in both
+    with open(os.path.join(workdir, '.env'), 'w') as f:
+        f.writelines(f"{key}={value}\n" for key, value in settings.items())
+
+    with open(os.path.join(workdir, 'agents.log'), 'w') as log:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', str(ticks)],
+                       cwd=workdir, env=dict(os.environ, **settings), stdout=log, stderr=subprocess.STDOUT,
+                       check=True)
+    with open(os.path.join(workdir, 'result.json')) as f:
+        result = json.load(f)
+
+    result.update(case)
+    result.update(services.snapshot())
+    result['summary'] = summarize(result['ticks'])
+    if keep:
+        result['workdir'] = workdir
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+def print_results(cases):
+    print(f"{'case':<22} {'cold tick':>9} {'tick':>7} {'price':>7} {'news':>7} {'email':>7} "
+          f"{'requests (cg/brave/oai/sb/smtp)':>32} {'subs/s':>8} {'RSS MB':>7}")
+    for case in cases:
+        cold, warm = case['summary']['cold'], case['summary']['warm']
+        requests = case['requests']
+        counts = "/".join(str(requests.get(service, 0)) for service in ('coingecko', 'brave', 'openai', 'supabase', 'smtp'))
+        # Report fan-out throughput (build and delivery) over the warm ticks
+        rates = [tick['email_timings']['subscribers_per_second'] for tick in case['ticks'][1:] or case['ticks']
+                 if 'subscribers_per_second' in tick['email_timings']]
+        rate = f"{statistics.median(rates):.1f}" if rates else "-"
+        print(f"{case['name']:<22} {cold['tick']:>8.2f}s {warm['tick']:>6.2f}s {warm['price']:>6.2f}s "
+              f"{warm['news']:>6.2f}s {warm['email']:>6.2f}s {counts:>32} {rate:>8} {case['peak_rss_mb']:>7.1f}")
+
+def print_comparison(current, baseline):
+    print(f"\nWarm medians against {baseline['commit']}{' (dirty)' if baseline.get('dirty') else ''}:")
+    print(f"{'case':<22} " + " ".join(f"{stage:>17}" for stage in STAGES))
+    previous = {case['name']: case for case in baseline['cases']}
+    for case in current['cases']:
+        if case['name'] not in previous:
+            continue
+        old, new = previous[case['name']]['summary']['warm'], case['summary']['warm']
+        cells = []
+        for stage in STAGES:
+            change = (new[stage] / old[stage] - 1) * 100 if old[stage] else 0.0
+            cells.append(f"{old[stage]:.2f}->{new[stage]:.2f} {change:+4.0f}%")
+        print(f"{case['name']:<22} " + " ".join(f"{cell:>17}" for cell in cells))
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == '--worker':
+        run_worker(int(sys.argv[2]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--history', default='1440,10080', help='btc_price rows for today, comma separated')
+    parser.add_argument('--results', default='20,100', help='Brave results per search, comma separated')
+    parser.add_argument('--recipients', default='1,50', help='email recipients, comma separated')
+    parser.add_argument('--ticks', type=int, default=3, help='ticks per case, the first one is cold')
+    parser.add_argument('--latency', help='per-service latency in seconds, e.g. openai=1.5,brave=0.4')
+    parser.add_argument('--errors', help='per-service error rate, e.g. brave=0.1,smtp=0.05')
+    parser.add_argument('--token-delay', type=float, default=0.002, help='seconds between streamed tokens')
+    parser.add_argument('--env', action='append', default=[], help='agent setting KEY=VALUE, repeatable')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='keep the per-case working directories and logs')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from fake_services import FakeServices
+
+    latency = parse_pairs(args.latency, float)
+    errors = parse_pairs(args.errors, float)
+    agent_env = parse_pairs(",".join(args.env))
+    services = FakeServices(latency=latency, errors=errors, token_delay=args.token_delay).start()
+
+    commit, dirty = git_commit()
+    cases = make_cases(parse_sizes(args.history), parse_sizes(args.results), parse_sizes(args.recipients))
+    results = []
+    try:
+        for case in cases:
+            results.append(run_case(services, case, args.ticks, agent_env, args.keep))
+    finally:
+        services.stop()
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "ticks": args.ticks,
+            "latency": services.latency,
+            "errors": services.errors,
+            "token_delay": args.token_delay,
+            "env": dict(DEFAULT_ENV, **agent_env)
+        },
+        "cases": results
+    }
+    print_results(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    relative = os.path.relpath(output, ROOT)
+    print(f"\nResults written to {output if relative.startswith('..') else relative}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
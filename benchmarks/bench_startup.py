@@ -0,0 +1,157 @@
+"""Cold-start cost of importing each agent module
+
+Imports btc_agent, info_agent, email_agent and scheduler in fresh Python
+processes under `python -X importtime`, in a temporary working directory
+with placeholder credentials, and reports the median import time, peak RSS
+and the slowest top-level imports for each. Nothing connects to a service,
+so no keys or network are needed. Run from the repository root:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --modules btc_agent,email_agent
+
+To compare against an older commit, check it out in a worktree and point
+--root at it, then compare the two results files:
+
+    git worktree add /tmp/agents-old <commit>
+    python benchmarks/bench_startup.py --root /tmp/agents-old
+    python benchmarks/bench_startup.py --compare benchmarks/results/startup-<commit>.json
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime, timezone
+
+from bench_pipeline import ROOT, RESULTS_DIR, git_commit
+
+MODULES = ("btc_agent", "info_agent", "email_agent", "scheduler")
+
+# Placeholder settings; older versions of the agents need them to import
+PLACEHOLDER_ENV = {
+    "SUPABASE_URL": "http://127.0.0.1:9/supabase",
+    "SUPABASE_KEY": "placeholder.supabase.key",
+    "OPENAI_API_KEY": "sk-placeholder",
+    "MPLBACKEND": "Agg"
+}
+
+# Runs in the child: time the import and report peak RSS
+IMPORT_SNIPPET = """
+import sys, time, json, resource
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}),
+      file=sys.__stdout__)
+"""
+
+def parse_importtime(output, depth=2):
+    """Cumulative microseconds per module imported at the given nesting depth
+
+    Depth 1 is the module imported by the snippet, depth 2 its own imports.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if len(name) - len(name.lstrip(' ')) == depth * 2 + 1:
+            modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative)
+    return modules
+
+def measure(root, module, workdir):
+    """Import module once in a fresh interpreter"""
+    env = dict(os.environ, PYTHONPATH=root, **PLACEHOLDER_ENV)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', IMPORT_SNIPPET.format(module=module)],
+                            cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    # The agents print while importing, the measurement is the last line
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    measurement['imports'] = parse_importtime(result.stderr)
+    return measurement
+
+def run_module(root, module, runs, top):
+    runs_data = []
+    for _ in range(runs):
+        workdir = tempfile.mkdtemp(prefix=f"bench-startup-{module}-")
+        try:
+            with open(os.path.join(workdir, '.env'), 'w') as f:
+                f.writelines(f"{key}={value}\n" for key, value in PLACEHOLDER_ENV.items())
+            runs_data.append(measure(root, module, workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    # Slowest top-level imports by median cumulative time (module itself excluded)
+    names = set().union(*(run['imports'] for run in runs_data)) - {module}
+    slowest = sorted(
+        ((name, statistics.median(run['imports'].get(name, 0) for run in runs_data) / 1e6) for name in names),
+        key=lambda item: item[1], reverse=True
+    )[:top]
+    return {
+        "module": module,
+        "seconds": statistics.median(run['seconds'] for run in runs_data),
+        "rss_mb": statistics.median(run['rss_mb'] for run in runs_data),
+        "runs": [{"seconds": run['seconds'], "rss_mb": run['rss_mb']} for run in runs_data],
+        "slowest_imports": dict(slowest)
+    }
+
+def print_results(results):
+    print(f"{'module':<12} {'import':>8} {'RSS MB':>7}  slowest imports")
+    for result in results:
+        slowest = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in result['slowest_imports'].items())
+        print(f"{result['module']:<12} {result['seconds'] * 1000:>6.0f}ms {result['rss_mb']:>7.1f}  {slowest}")
+
+def print_comparison(current, baseline):
+    print(f"\nAgainst {baseline['commit']}{' (dirty)' if baseline.get('dirty') else ''}:")
+    print(f"{'module':<12} {'import':>24} {'RSS MB':>22}")
+    previous = {result['module']: result for result in baseline['modules']}
+    for result in current['modules']:
+        old = previous.get(result['module'])
+        if old is None:
+            continue
+        seconds = f"{old['seconds'] * 1000:.0f}->{result['seconds'] * 1000:.0f}ms {(result['seconds'] / old['seconds'] - 1) * 100:+4.0f}%"
+        rss = f"{old['rss_mb']:.1f}->{result['rss_mb']:.1f} {(result['rss_mb'] / old['rss_mb'] - 1) * 100:+4.0f}%"
+        print(f"{result['module']:<12} {seconds:>24} {rss:>22}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modules', default=",".join(MODULES), help='modules to import, comma separated')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per module')
+    parser.add_argument('--top', type=int, default=4, help='slowest top-level imports to report')
+    parser.add_argument('--root', default=ROOT, help='checkout to import the agents from')
+    parser.add_argument('--output', help='results file (default benchmarks/results/startup-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    commit, dirty = git_commit(root)
+    results = [run_module(root, module, args.runs, args.top) for module in args.modules.split(',') if module]
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "modules": results
+    }
+    print_results(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    relative = os.path.relpath(output, ROOT)
+    print(f"\nResults written to {output if relative.startswith('..') else relative}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""Local stand-ins for CoinGecko, Brave, OpenAI, Supabase and SMTP
+
+One HTTP server answers all four HTTP APIs under a path prefix per service
+(/coingecko, /brave, /openai, /supabase) from the fixtures in
+fixtures/responses.json, and a small SMTP server accepts mail without
+delivering it. Every service has a configurable latency and error rate,
+and requests are counted per service and route.
+
+The Supabase stand-in implements the slice of PostgREST the agents use:
+select with eq/gt/gte/lt/lte/in filters, order, limit, offset, Range and
+count=exact, insert and upsert (merge or ignore) with on_conflict.
+"""
+import os
+import re
+import csv
+import json
+import time
+import random
+import threading
+import socketserver
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'responses.json')
+
+SERVICES = ('coingecko', 'brave', 'openai', 'supabase', 'smtp')
+
+# Default response latency per service, in seconds
+DEFAULT_LATENCY = {"coingecko": 0.08, "brave": 0.25, "openai": 0.6, "supabase": 0.03, "smtp": 0.01}
+
+# Most rows a Supabase select returns, callers have to page past it
+MAX_ROWS = 1000
+
+FILTER_OPS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b
+}
+
+def comparable(value):
+    """Turn a stored or filter value into something that orders correctly"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return value
+
+class FakeServices:
+    """Runs the fake HTTP and SMTP servers on free local ports"""
+
+    def __init__(self, latency=None, errors=None, token_delay=0.002, seed=1):
+        with open(FIXTURES) as f:
+            self.fixtures = json.load(f)
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.errors = dict.fromkeys(SERVICES, 0.0)
+        self.errors.update(errors or {})
+        self.token_delay = token_delay
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.tables = {}
+        self.next_id = Counter()
+        self.search_seq = 0
+        self.results_per_search = 20
+        self.smtp_stats = Counter()
+
+        services = self
+
+        class HTTPServer(ThreadingHTTPServer):
+            daemon_threads = True
+
+        class Handler(FakeHTTPHandler):
+            pass
+        Handler.services = services
+
+        class SMTPServer(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        class SMTPHandler(FakeSMTPHandler):
+            pass
+        SMTPHandler.services = services
+
+        self.http = HTTPServer(('127.0.0.1', 0), Handler)
+        self.smtp = SMTPServer(('127.0.0.1', 0), SMTPHandler)
+        self.threads = []
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.http.server_address[1]}"
+
+    def env(self):
+        """Environment settings that point the agents at these services"""
+        return {
+            "COINGECKO_API_URL": f"{self.base_url}/coingecko/api/v3",
+            "BRAVE_API_URL": f"{self.base_url}/brave/res/v1",
+            "BRAVE_API_KEY": "fake-brave-key",
+            "OPENAI_BASE_URL": f"{self.base_url}/openai/v1",
+            "OPENAI_API_KEY": "sk-fake",
+            "SUPABASE_URL": f"{self.base_url}/supabase",
+            "SUPABASE_KEY": "fake.supabase.key",
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(self.smtp.server_address[1]),
+            "SMTP_USE_SSL": "false",
+            "SMTP_STARTTLS": "false",
+            "GMAIL_APP_PASSWORD": ""
+        }
+
+    def start(self):
+        for server in (self.http, self.smtp):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in (self.http, self.smtp):
+            server.shutdown()
+            server.server_close()
+
+    def reset(self, tables=None, results_per_search=20):
+        """Clear the counters and replace the Supabase tables"""
+        with self.lock:
+            self.results_per_search = results_per_search
+            self.counts.clear()
+            self.smtp_stats.clear()
+            self.tables = {name: list(rows) for name, rows in (tables or {}).items()}
+            self.next_id = Counter({name: len(rows) for name, rows in self.tables.items()})
+            self.search_seq = 0
+
+    def count(self, service, route):
+        with self.lock:
+            self.counts[(service, route)] += 1
+
+    def snapshot(self):
+        """Request counts per service and per route, plus SMTP totals"""
+        with self.lock:
+            per_service = Counter()
+            for (service, _), count in self.counts.items():
+                per_service[service] += count
+            return {
+                "requests": dict(per_service),
+                "routes": {f"{service} {route}": count for (service, route), count in sorted(self.counts.items())},
+                "smtp": dict(self.smtp_stats)
+            }
+
+    def delay(self, service):
+        latency = self.latency.get(service, 0)
+        if latency:
+            time.sleep(latency)
+
+    def should_fail(self, service):
+        rate = self.errors.get(service, 0)
+        if not rate:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    # CoinGecko
+
+    def coingecko_prices(self, params):
+        ids = [asset for asset in params.get('ids', '').split(',') if asset]
+        currencies = [currency for currency in params.get('vs_currencies', 'usd').split(',') if currency]
+        base = self.fixtures['coingecko']
+        with self.lock:
+            drift = 1 + self.rng.gauss(0, 0.0005)
+        prices = {}
+        for asset in ids:
+            quotes = base.get(asset, {"usd": 1.0, "eur": 0.92})
+            prices[asset] = {
+                currency: round(quotes.get(currency, quotes['usd']) * drift, 2)
+                for currency in currencies
+            }
+        return prices
+
+    # Brave
+
+    def brave_results(self, query, count):
+        """count deterministic but unique results, different for every search"""
+        fixture = self.fixtures['brave']
+        with self.lock:
+            self.search_seq += 1
+            seq = self.search_seq
+        rng = random.Random(f"{query}:{seq}")
+        results = []
+        for i in range(count):
+            domain = rng.choice(fixture['domains'])
+            title = f"{rng.choice(fixture['subjects'])} {rng.choice(fixture['verbs'])} {rng.choice(fixture['contexts'])}"
+            description = " ".join(rng.sample(fixture['words'], 18)).capitalize() + "."
+            results.append({
+                "title": title,
+                "url": f"https://www.{domain}/markets/{seq}-{i}-{rng.getrandbits(32):08x}?utm_source=brave",
+                "description": description,
+                "age": f"{rng.randint(1, 23)} hours ago"
+            })
+        return {"type": "search", "query": {"original": query}, "web": {"type": "search", "results": results}}
+
+    # OpenAI
+
+    def planning_queries(self, request):
+        prompt = " ".join(str(message.get('content', '')) for message in request.get('messages', []))
+        planning = self.fixtures['openai']['planning']
+        return planning['bitcoin'] if 'Bitcoin' in prompt else planning['stock']
+
+    def completion(self, request):
+        created = int(time.time())
+        if request.get('tools'):
+            tool_calls = [
+                {
+                    "id": f"call_{i}",
+                    "type": "function",
+                    "function": {"name": "search_brave", "arguments": json.dumps({"query": query})}
+                }
+                for i, query in enumerate(self.planning_queries(request))
+            ]
+            message = {"role": "assistant", "content": None, "tool_calls": tool_calls}
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": self.fixtures['openai']['analysis']}
+            finish_reason = "stop"
+        return {
+            "id": f"chatcmpl-fake{created}",
+            "object": "chat.completion",
+            "created": created,
+            "model": request.get('model', 'gpt-4'),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 500, "completion_tokens": 180, "total_tokens": 680}
+        }
+
+    def completion_chunks(self, request):
+        created = int(time.time())
+        tokens = re.findall(r'\S+\s*|\s+', self.fixtures['openai']['analysis'])
+        base = {"id": f"chatcmpl-fake{created}", "object": "chat.completion.chunk",
+                "created": created, "model": request.get('model', 'gpt-4')}
+        yield dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for token in tokens:
+            yield dict(base, choices=[{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+        yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (request.get('stream_options') or {}).get('include_usage'):
+            yield dict(base, choices=[], usage={"prompt_tokens": 500, "completion_tokens": len(tokens),
+                                                "total_tokens": 500 + len(tokens)})
+
+    # Supabase
+
+    def select(self, table, params, headers):
+        with self.lock:
+            rows = list(self.tables.get(table, []))
+
+        for column, condition in params:
+            if column in ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns'):
+                continue
+            op, _, value = condition.partition('.')
+            if op == 'in':
+                allowed = {comparable(item) for item in next(csv.reader([value.strip('()')]))}
+                rows = [row for row in rows if comparable(row.get(column)) in allowed]
+            elif op in FILTER_OPS:
+                target = comparable(value)
+                rows = [
+                    row for row in rows
+                    if row.get(column) is not None and FILTER_OPS[op](comparable(row[column]), target)
+                ]
+
+        params = dict(params)
+        if 'order' in params:
+            column, _, direction = params['order'].partition('.')
+            rows.sort(key=lambda row: comparable(row.get(column)), reverse=direction.startswith('desc'))
+
+        total = len(rows)
+        start = int(params.get('offset', 0))
+        end = start + int(params['limit']) - 1 if 'limit' in params else total - 1
+        if headers.get('Range'):
+            range_start, range_end = headers['Range'].split('-')
+            start, end = int(range_start), int(range_end)
+        # Like PostgREST's db-max-rows on Supabase
+        rows = rows[start:min(end, start + MAX_ROWS - 1) + 1]
+
+        columns = params.get('select', '*')
+        if columns != '*':
+            names = [name.strip() for name in columns.split(',')]
+            rows = [{name: row.get(name) for name in names} for row in rows]
+        content_range = f"{start}-{start + len(rows) - 1}/{total}" if rows else f"*/{total}"
+        return rows, content_range
+
+    def insert(self, table, payload, params, prefer):
+        rows = payload if isinstance(payload, list) else [payload]
+        ignore = 'resolution=ignore-duplicates' in prefer
+        on_conflict = params.get('on_conflict') if ignore or 'resolution=merge-duplicates' in prefer else None
+        now = datetime.now(timezone.utc).isoformat()
+        stored = []
+        with self.lock:
+            existing = self.tables.setdefault(table, [])
+            index = {row.get(on_conflict): i for i, row in enumerate(existing)} if on_conflict else {}
+            for row in rows:
+                row = dict(row)
+                if on_conflict and row.get(on_conflict) in index:
+                    if not ignore:
+                        existing[index[row[on_conflict]]].update(row)
+                        stored.append(existing[index[row[on_conflict]]])
+                    continue
+                self.next_id[table] += 1
+                row.setdefault('id', self.next_id[table])
+                row.setdefault('created_at', now)
+                existing.append(row)
+                if on_conflict:
+                    index[row.get(on_conflict)] = len(existing) - 1
+                stored.append(row)
+        return stored
+
+class FakeHTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    services = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def route(self, method):
+        url = urlsplit(self.path)
+        service, _, rest = url.path.lstrip('/').partition('/')
+        params = parse_qsl(url.query, keep_blank_values=True)
+        # postgrest-py sends an empty JSON body with GETs too, it must be read off the connection
+        body = self.read_json()
+        if service not in SERVICES:
+            self.send_json(404, {"message": f"unknown service {service}"})
+            return
+
+        services = self.services
+        route = rest
+        if service == 'supabase':
+            route = f"{method} {rest.rsplit('/', 1)[-1]}"
+        services.count(service, route)
+        services.delay(service)
+
+        if services.should_fail(service):
+            self.send_json(503, {"message": "injected failure", "error": {"message": "injected failure"}},
+                           {"Retry-After": "0"})
+            return
+
+        if service == 'coingecko':
+            self.send_json(200, services.coingecko_prices(dict(params)))
+        elif service == 'brave':
+            params = dict(params)
+            self.send_json(200, services.brave_results(params.get('q', ''), services.results_per_search))
+        elif service == 'openai':
+            if body.get('stream'):
+                self.stream_sse(services.completion_chunks(body))
+            else:
+                self.send_json(200, services.completion(body))
+        else:
+            self.handle_supabase(method, rest.rsplit('/', 1)[-1], params, body)
+
+    def handle_supabase(self, method, table, params, body):
+        services = self.services
+        prefer = self.headers.get('Prefer', '')
+        if method == 'GET':
+            rows, content_range = services.select(table, params, self.headers)
+            self.send_json(200, rows, {"Content-Range": content_range})
+        elif method == 'POST':
+            rows = services.insert(table, body, dict(params), prefer)
+            if 'return=representation' in prefer:
+                self.send_json(201, rows)
+            else:
+                self.send_response(201)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+        else:
+            self.send_json(405, {"message": f"{method} not supported"})
+
+    def stream_sse(self, chunks):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        events = [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks] + ["data: [DONE]\n\n"]
+        for event in events:
+            data = event.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            if self.services.token_delay:
+                time.sleep(self.services.token_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        self.route('GET')
+
+    def do_POST(self):
+        self.route('POST')
+
+    def do_HEAD(self):
+        self.route('GET')
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: accepts and counts every message"""
+    services = None
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        services = self.services
+        with services.lock:
+            services.smtp_stats['sessions'] += 1
+        self.reply("220 localhost fake ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.reply("250-localhost\r\n250-8BITMIME\r\n250 SIZE 52428800")
+            elif command in ('HELO', 'RCPT', 'RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif command == 'MAIL':
+                services.count('smtp', 'MAIL')
+                self.reply("250 OK")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    size += len(data)
+                services.delay('smtp')
+                if services.should_fail('smtp'):
+                    self.reply("451 Injected temporary failure")
+                    continue
+                with services.lock:
+                    services.smtp_stats['messages'] += 1
+                    services.smtp_stats['bytes'] += size
+                self.reply("250 Queued")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
@@ -1,34 +1,36 @@
 import os
+import sys
+import time
 import requests
 from datetime import datetime, timezone
-from dotenv import load_dotenv
-from supabase import create_client
+from config import load_config, get_supabase
 
-# Load environment variables
-load_dotenv(override=True)
+# Load environment variables before the helper modules below read their settings
+load_config()
 
-# Initialize Supabase client
-supabase_url = os.getenv('SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_KEY')
+from http_client import get_http_client
+from price_sampler import PriceSampler
+from metrics import external_call, inc
+from local_store import write_rows, read_prices_since, sync_now
 
-# Initialize Supabase client
-supabase = create_client(supabase_url, supabase_key)
+# CoinGecko endpoint for simple prices
+COINGECKO_API_URL = os.getenv('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')
+COINGECKO_PRICE_URL = f"{COINGECKO_API_URL}/simple/price"
+
+# Watchlist for the multi-asset collector (CoinGecko ids and fiat currencies)
+PRICE_WATCHLIST = [asset.strip() for asset in os.getenv('PRICE_WATCHLIST', '').split(',') if asset.strip()]
+PRICE_CURRENCIES = [currency.strip() for currency in os.getenv('PRICE_CURRENCIES', 'usd').split(',') if currency.strip()]
+PRICE_IDS_PER_REQUEST = int(os.getenv('PRICE_IDS_PER_REQUEST', '100'))
+
+# High-frequency sampling (0 disables the sampler)
+PRICE_SAMPLE_SECONDS = float(os.getenv('PRICE_SAMPLE_SECONDS', '0'))
+PRICE_BAR_SECONDS = int(os.getenv('PRICE_BAR_SECONDS', '60'))
+PRICE_FLUSH_SECONDS = int(os.getenv('PRICE_FLUSH_SECONDS', '300'))
 
 def get_and_store_btc_price():
     try:
-        # CoinGecko API endpoint for Bitcoin price in USD
-        url = "https://api.coingecko.com/api/v3/simple/price"
-        params = {
-            "ids": "bitcoin",
-            "vs_currencies": "usd"
-        }
-        
-        # Make the API request
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        # Extract the price from the response
-        data = response.json()
+        # Fetch the Bitcoin price in USD from CoinGecko
+        data = fetch_prices(["bitcoin"], ["usd"])
         btc_price = data["bitcoin"]["usd"]
         
         # Prepare data for Supabase - using correct column names
@@ -37,8 +39,8 @@ def get_and_store_btc_price():
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        # Insert data into Supabase
-        result = supabase.table('btc_price').insert(price_data).execute()
+        # Write locally, the syncer pushes it to Supabase
+        write_rows('btc_price', [price_data])
         
         print(f"Current Bitcoin Price: ${btc_price:,.2f} USD")
         print("Price successfully stored in database")
@@ -51,28 +53,136 @@ def get_and_store_btc_price():
         print(f"Error storing data in Supabase: {e}")
         return None
 
-def get_latest_data():
-    """Fetch latest data from both tables"""
+def fetch_prices(assets, currencies, chunk_size=None):
+    """Fetch prices for every asset/currency pair from CoinGecko
+    
+    All currencies are requested in each call and the ids are chunked so
+    long watchlists stay within URL limits. Returns {asset: {currency: price}}.
+    """
+    chunk_size = chunk_size or PRICE_IDS_PER_REQUEST
+    prices = {}
+    for i in range(0, len(assets), chunk_size):
+        params = {
+            "ids": ",".join(assets[i:i + chunk_size]),
+            "vs_currencies": ",".join(currencies)
+        }
+        response = get_http_client().get(COINGECKO_PRICE_URL, service='coingecko', operation='simple_price', params=params)
+        response.raise_for_status()
+        prices.update(response.json())
+    return prices
+
+def collect_watchlist_prices(assets=None, currencies=None):
+    """Fetch prices for the whole watchlist and store them with one insert
+    
+    Rows go to the long-format asset_price table (asset, currency, price,
+    created_at). Returns the number of rows stored, or None on error.
+    """
+    assets = assets or PRICE_WATCHLIST
+    currencies = currencies or PRICE_CURRENCIES
+    if not assets:
+        print("Price watchlist is empty, nothing to collect")
+        return 0
+    
     try:
-        # Get Bitcoin price data for the last 24 hours
-        today = datetime.now(timezone.utc).date()
-        btc_data = supabase.table('btc_price')\
-            .select('*')\
-            .gte('created_at', today.isoformat())\
-            .order('created_at', desc=True)\
-            .execute()
+        prices = fetch_prices(assets, currencies)
         
-        # Get latest news (last 10 entries)
-        news_data = supabase.table('eco_info')\
-            .select('*')\
-            .order('timestamp', desc=True)\
-            .limit(10)\
-            .execute()
+        created_at = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {
+                "asset": asset,
+                "currency": currency,
+                "price": price,
+                "created_at": created_at
+            }
+            for asset, asset_prices in prices.items()
+            for currency, price in asset_prices.items()
+        ]
+        missing = set(assets) - set(prices)
+        if missing:
+            print(f"No prices returned for: {', '.join(sorted(missing))}")
         
-        return btc_data.data, news_data.data
+        # Insert the whole tick in one request
+        if rows:
+            with external_call('supabase', 'asset_price.insert') as span:
+                span.set(rows=len(rows))
+                get_supabase().table('asset_price').insert(rows).execute()
+        
+        print(f"Stored {len(rows)} prices for {len(prices)} assets in {len(currencies)} currencies")
+        return len(rows)
+        
+    except requests.RequestException as e:
+        print(f"Error fetching watchlist prices: {e}")
+        return None
     except Exception as e:
-        print(f"Error fetching data from Supabase: {e}")
-        return None, None
+        print(f"Error storing data in Supabase: {e}")
+        return None
+
+def store_price_bars(bars):
+    """Upsert aggregated bars so replayed bars don't create duplicates"""
+    with external_call('supabase', 'btc_price_bars.upsert') as span:
+        span.set(rows=len(bars))
+        get_supabase().table('btc_price_bars').upsert(bars, on_conflict='period_start').execute()
+
+def create_price_sampler():
+    """Build a sampler that polls the Bitcoin price and stores bars in btc_price_bars"""
+    return PriceSampler(
+        lambda: fetch_prices(["bitcoin"], ["usd"])["bitcoin"]["usd"],
+        store_price_bars,
+        sample_seconds=PRICE_SAMPLE_SECONDS or 15,
+        bar_seconds=PRICE_BAR_SECONDS,
+        flush_seconds=PRICE_FLUSH_SECONDS
+    )
+
+# Local copy of today's btc_price rows (cache/btc_price.npz), shared by every
+# reader in the process and created on first read so collecting prices
+# doesn't import numpy
+_price_cache = None
+
+def get_price_cache():
+    global _price_cache
+    if _price_cache is None:
+        from price_cache import PriceHistoryCache
+        _price_cache = PriceHistoryCache()
+    return _price_cache
+
+def fetch_btc_prices_since(since, page_size=1000):
+    """Fetch btc_price rows created at or after the given ISO timestamp, oldest first"""
+    rows = read_prices_since(since)
+    if rows is not None:
+        inc('local_reads_total', table='btc_price', source='local')
+        return rows
+    inc('local_reads_total', table='btc_price', source='supabase')
+    rows = []
+    with external_call('supabase', 'btc_price.select') as span:
+        # PostgREST caps each response (1000 rows by default), so page through.
+        # limit/offset rather than range(), whose end is exclusive in postgrest 0.13
+        while True:
+            page = get_supabase().table('btc_price')\
+                .select('price, created_at')\
+                .gte('created_at', since)\
+                .order('created_at')\
+                .limit(page_size)\
+                .offset(len(rows))\
+                .execute().data
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+        span.set(rows=len(rows))
+    return rows
 
 if __name__ == "__main__":
-    get_and_store_btc_price() 
\ No newline at end of file
+    if '--sample' in sys.argv:
+        sampler = create_price_sampler().start()
+        print(f"Sampling Bitcoin price every {sampler.sample_seconds}s, press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            sampler.stop()
+        sys.exit(0)
+    
+    get_and_store_btc_price()
+    if PRICE_WATCHLIST:
+        collect_watchlist_prices()
+    # Push this run's rows (and any earlier backlog) before exiting
+    sync_now()
@@ -0,0 +1,138 @@
+import os
+import hashlib
+import threading
+from io import BytesIO
+import numpy as np
+from metrics import inc
+
+# Figure size (inches) and resolution per preset
+CHART_PRESETS = {
+    "compact": {"size": (8, 4), "dpi": 100},
+    "email": {"size": (12, 6), "dpi": 150},
+    "print": {"size": (12, 6), "dpi": 300}
+}
+
+CHART_PRESET = os.getenv('CHART_PRESET', 'email')
+CHART_FORMAT = os.getenv('CHART_FORMAT', 'png')  # png or svg
+# Maximum PNG compression, slower to save for a slightly smaller attachment
+CHART_COMPRESS_PNG = os.getenv('CHART_COMPRESS_PNG', 'false').lower() == 'true'
+
+MIME_SUBTYPES = {"png": "png", "svg": "svg+xml"}
+
+class ChartRenderer:
+    """Renders the price chart on a reusable Agg figure
+
+    The figure, line and annotations are built once and only their data is
+    updated for each render. Output is cached by a hash of the series and
+    settings, so an unchanged series is not drawn again. matplotlib is
+    imported on first use.
+    """
+
+    def __init__(self, preset=None, output_format=None, compress_png=None, title='Bitcoin Price Trend (24 Hours)'):
+        self.preset = CHART_PRESETS[preset or CHART_PRESET]
+        self.output_format = output_format or CHART_FORMAT
+        self.compress_png = CHART_COMPRESS_PNG if compress_png is None else compress_png
+        self.title = title
+        self.figure = None
+        self.lock = threading.Lock()
+        self.last_key = None
+        self.last_output = None
+        self.stats = {"renders": 0, "cache_hits": 0}
+
+    @property
+    def mime_subtype(self):
+        return MIME_SUBTYPES[self.output_format]
+
+    @property
+    def extension(self):
+        return self.output_format
+
+    def _build(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        import matplotlib.dates as mdates
+
+        width, height = self.preset['size']
+        self.figure = Figure(figsize=(width, height), dpi=self.preset['dpi'])
+        FigureCanvasAgg(self.figure)
+        # Fixed margins instead of a tight layout pass on every render
+        self.figure.subplots_adjust(left=0.09, right=0.96, top=0.92, bottom=0.14)
+
+        ax = self.axes = self.figure.add_subplot()
+        self.line, = ax.plot([], [], 'b-', label='BTC Price', linewidth=2)
+        ax.set_title(self.title, fontsize=14)
+        ax.set_xlabel('Time (UTC)', fontsize=12)
+        ax.set_ylabel('Price (USD)', fontsize=12)
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax.legend(fontsize=10, loc='upper left')
+        ax.xaxis_date()
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+        ax.tick_params(axis='x', labelrotation=30)
+
+        # Price annotations at start and end
+        self.end_label = ax.annotate('', (0, 0), xytext=(10, 10), textcoords='offset points')
+        self.start_label = ax.annotate('', (0, 0), xytext=(-10, 10), textcoords='offset points',
+                                       horizontalalignment='right')
+
+    def _cache_key(self, timestamps, prices):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(timestamps, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+        digest.update(repr((self.preset, self.output_format, self.compress_png, self.title)).encode())
+        return digest.digest()
+
+    def render(self, timestamps, prices):
+        """Render time-sorted unix timestamps and prices, returns image bytes"""
+        key = self._cache_key(timestamps, prices)
+        with self.lock:
+            if key == self.last_key:
+                self.stats['cache_hits'] += 1
+                inc('chart_renders_total', result='cached')
+                return self.last_output
+
+            if self.figure is None:
+                self._build()
+
+            # Matplotlib date numbers are days since the unix epoch
+            dates = np.asarray(timestamps, dtype=np.float64) / 86400.0
+            prices = np.asarray(prices, dtype=np.float64)
+            self.line.set_data(dates, prices)
+
+            if len(prices):
+                self.end_label.set_text(f'${prices[-1]:,.2f}')
+                self.end_label.xy = (dates[-1], prices[-1])
+                self.start_label.set_text(f'${prices[0]:,.2f}')
+                self.start_label.xy = (dates[0], prices[0])
+            else:
+                self.end_label.set_text('')
+                self.start_label.set_text('')
+
+            self.axes.set_autoscale_on(True)
+            self.axes.relim()
+            self.axes.autoscale_view()
+            if len(prices) == 1:
+                # A single point would give a zero-width axis
+                self.axes.set_xlim(dates[0] - 1 / 48, dates[0] + 1 / 48)
+
+            buf = BytesIO()
+            if self.output_format == 'png' and self.compress_png:
+                self.figure.savefig(buf, format='png', pil_kwargs={"optimize": True})
+            else:
+                self.figure.savefig(buf, format=self.output_format)
+
+            self.stats['renders'] += 1
+            inc('chart_renders_total', result='rendered')
+            self.last_key = key
+            self.last_output = buf.getvalue()
+            return self.last_output
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_chart_renderer():
+    """Return the process-wide chart renderer"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer
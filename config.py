@@ -0,0 +1,42 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+_loaded = False
+
+def load_config(path='.env'):
+    """Load .env from the working directory into the environment, once per process
+
+    Values in .env take precedence over the environment. Call this before
+    importing the helper modules, which read their settings at import time.
+    """
+    global _loaded
+    if not _loaded:
+        load_dotenv(path, override=True)
+        _loaded = True
+
+_supabase = None
+_openai = None
+_clients_lock = threading.Lock()
+
+def get_supabase():
+    """Return the process-wide Supabase client, created on first use
+
+    The supabase package is only imported here, so processes that never
+    touch the database don't pay for it.
+    """
+    global _supabase
+    with _clients_lock:
+        if _supabase is None:
+            from supabase import create_client
+            _supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+        return _supabase
+
+def get_openai():
+    """Return the process-wide OpenAI client, created on first use"""
+    global _openai
+    with _clients_lock:
+        if _openai is None:
+            from openai import OpenAI
+            _openai = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return _openai
@@ -1,88 +1,149 @@
 import os
+import sys
 import json
-import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
 from email.mime.image import MIMEImage
 from datetime import datetime, timezone
-from dotenv import dotenv_values
-from supabase import create_client
-from openai import OpenAI
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from io import BytesIO
+from config import load_config, get_supabase, get_openai
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 
-# Load environment variables
-config = dotenv_values(".env")
-os.environ.update(config)
+# Load environment variables before the helper modules below read their settings
+load_config()
 
-# Initialize clients
-openai_client = OpenAI(
-    api_key=config['OPENAI_API_KEY']
-)
+import price_sampler
+from price_analytics import rows_to_arrays, compute_price_stats, format_price_summary
+from prompt_builder import build_analysis_context, count_tokens
+from llm_cache import cached_chat_completion, get_llm_cache
+from chart_renderer import get_chart_renderer
+from smtp_pool import get_delivery_engine
+from email_trigger import EmailTrigger
+from report_fanout import load_subscribers, build_report, build_messages
+from metrics import external_call, stage, inc, record_tokens, bind_context
+from news_index import NewsIndex, query_terms, NEWS_TOP_K
+from local_store import read_news_since, read_unsynced_news_since, count_local_news_since, count_unsynced_news_since
+# The price cache and its fetch helper are shared with btc_agent
+from btc_agent import get_price_cache, fetch_btc_prices_since
 
-supabase = create_client(
-    config['SUPABASE_URL'],
-    config['SUPABASE_KEY']
-)
+# How long an analysis is reused for identical input (seconds, 0 disables the cache)
+ANALYSIS_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL_ANALYSIS', '1800'))
+
+# Email addresses
+EMAIL_SENDER = os.getenv('EMAIL_SENDER', 'reachkga@gmail.com')
+EMAIL_RECIPIENTS = [
+    address.strip()
+    for address in os.getenv('EMAIL_RECIPIENTS', 'kg@campaignconsultants.co').split(',')
+    if address.strip()
+]
+
+# Stream the analysis completion (set EMAIL_STREAMING=false to wait for the full response)
+EMAIL_STREAMING = os.getenv('EMAIL_STREAMING', 'true').lower() == 'true'
+
+NEWS_QUERY = query_terms()
+
+# Change detection state and the relevance index over recent news, created
+# on first use and kept between runs
+_email_trigger = None
+_news_index = None
+
+def get_email_trigger():
+    global _email_trigger
+    if _email_trigger is None:
+        _email_trigger = EmailTrigger()
+    return _email_trigger
+
+def get_news_index():
+    global _news_index
+    if _news_index is None:
+        _news_index = NewsIndex()
+    return _news_index
 
 def get_latest_data():
     """Fetch latest data from both tables"""
     try:
-        # Get Bitcoin price data for the last 24 hours
-        today = datetime.now(timezone.utc).date()
-        btc_data = supabase.table('btc_price')\
-            .select('*')\
-            .gte('created_at', today.isoformat())\
-            .order('created_at', desc=True)\
-            .execute()
+        # Get today's Bitcoin prices, only fetching rows the local cache lacks
+        btc_data = get_price_cache().update(fetch_btc_prices_since)
         
-        # Get latest news (last 10 entries)
-        news_data = supabase.table('eco_info')\
-            .select('*')\
-            .order('timestamp', desc=True)\
-            .limit(10)\
-            .execute()
+        # Get the most relevant recent news, only fetching rows the index lacks
+        news_index = get_news_index()
+        news_index.update(fetch_news_since)
+        news_data = news_index.search(NEWS_QUERY, NEWS_TOP_K)
         
-        return btc_data.data, news_data.data
+        return add_sampled_prices(btc_data), news_data
     except Exception as e:
         print(f"Error fetching data from Supabase: {e}")
         return None, None
 
-def create_analysis(btc_data, news_data):
-    """Use OpenAI to analyze the data and create an email content"""
+def fetch_news_since(since, page_size=1000):
+    """Fetch eco_info rows stored at or after the given ISO timestamp, oldest first"""
+    rows = read_news_since(since)
+    if rows is not None:
+        inc('local_reads_total', table='eco_info', source='local')
+        return rows
+    inc('local_reads_total', table='eco_info', source='supabase')
+    rows = []
+    with external_call('supabase', 'eco_info.select') as span:
+        # Page past PostgREST's row cap, the newest stories come last
+        while True:
+            page = get_supabase().table('eco_info')\
+                .select('*')\
+                .gte('timestamp', since)\
+                .order('timestamp')\
+                .limit(page_size)\
+                .offset(len(rows))\
+                .execute().data
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+        span.set(rows=len(rows))
+    # Stories stored locally but not synced yet (the index skips repeated URLs)
+    return rows + read_unsynced_news_since(since)
+
+def count_news_since(since):
+    """Count eco_info rows stored after the given ISO timestamp"""
+    count = count_local_news_since(since)
+    if count is not None:
+        inc('local_reads_total', table='eco_info', source='local')
+        return count
+    inc('local_reads_total', table='eco_info', source='supabase')
+    with external_call('supabase', 'eco_info.count'):
+        result = get_supabase().table('eco_info')\
+            .select('url', count='exact')\
+            .gt('timestamp', since)\
+            .limit(1)\
+            .execute()
+    # Stories stored locally but not synced yet
+    return (result.count or 0) + count_unsynced_news_since(since)
+
+def add_sampled_prices(btc_data):
+    """Add high-resolution samples newer than the stored rows from the running sampler"""
+    sampler = price_sampler.active_sampler
+    if not sampler:
+        return btc_data
+    
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    samples = sampler.recent((datetime.now(timezone.utc) - today).total_seconds())
+    if btc_data:
+        latest = datetime.fromisoformat(btc_data[0]['created_at'].replace('Z', '+00:00'))
+        samples = [
+            sample for sample in samples
+            if datetime.fromisoformat(sample['created_at']) > latest
+        ]
+    return samples + btc_data
+
+def build_analysis_messages(btc_data, news_data):
+    """Build the OpenAI messages for the analysis email, None without price data"""
     
     # Check if we have any price data
     if not btc_data:
         return None
         
-    # Check if we have any new news in the last 10 minutes
-    current_time = datetime.now(timezone.utc)
-    has_news = False
-    
-    if news_data:
-        for news in news_data:
-            news_time = datetime.fromisoformat(news['timestamp'].replace('Z', '+00:00'))
-            time_diff = (current_time - news_time).total_seconds() / 60  # Convert to minutes
-            if time_diff <= 10:  # Check if news is from last 10 minutes
-                has_news = True
-                break
-    
-    # Prepare the price context
-    context = "Recent Bitcoin Prices:\n"
-    for price in btc_data:
-        context += f"- ${price['price']:,.2f} at {price['created_at']}\n"
+    # news_data is already ranked by relevance and recency
+    recent_news = news_data or []
+    has_news = bool(recent_news)
     
     # Create different prompts based on whether we have news
     if has_news:
-        context += "\nRecent Financial News:\n"
-        for news in news_data:
-            news_time = datetime.fromisoformat(news['timestamp'].replace('Z', '+00:00'))
-            time_diff = (current_time - news_time).total_seconds() / 60
-            if time_diff <= 10:  # Only include news from last 10 minutes
-                context += f"- {news['finance_info']}\n"
-        
         system_content = """You are a professional financial and crypto analyst. Create a very concise but insightful analysis 
                         of the recent Bitcoin price movements and related financial news. Focus on key correlations 
                         between market events and price changes. Keep the analysis short, professional, and 
@@ -93,6 +154,19 @@ def create_analysis(btc_data, news_data):
                         the Bitcoin price movements. Keep it concise and professional. Format with a subject line that 
                         indicates it's a price update only. End the email with 'Best Regards,' on a new line."""
     
+    user_prefix = f"Based on this data, create a {'short analysis' if has_news else 'brief price update'} email:\n\n"
+    
+    # Summarize the price series and fit the series and news into the token budget
+    timestamps, prices = rows_to_arrays(btc_data)
+    context, token_report = build_analysis_context(
+        format_price_summary(compute_price_stats(timestamps, prices)),
+        timestamps,
+        prices,
+        recent_news,
+        reserved_tokens=count_tokens(system_content) + count_tokens(user_prefix)
+    )
+    print(f"Prompt tokens: {token_report}")
+    
     # Create the prompt for OpenAI
     messages = [
         {
@@ -101,160 +175,286 @@ def create_analysis(btc_data, news_data):
         },
         {
             "role": "user",
-            "content": f"Based on this data, create a {'short analysis' if has_news else 'brief price update'} email:\n\n{context}"
+            "content": user_prefix + context
         }
     ]
+    return messages
+
+def add_signature(email_content):
+    """Add the agent signature after "Best Regards," or at the end"""
+    signature = "\n\n--\nFinance Agent\nAutomated Market Analysis\n"
+    signature += "Updates on significant moves | 24/7 monitoring\n"
+    
+    # Insert signature after "Best Regards" or at the end
+    if "Best Regards," in email_content:
+        return email_content.replace("Best Regards,", "Best Regards," + signature)
+    return email_content + signature
+
+def create_analysis(btc_data, news_data):
+    """Use OpenAI to analyze the data and create an email content"""
+    messages = build_analysis_messages(btc_data, news_data)
+    if not messages:
+        return None
     
     try:
-        response = openai_client.chat.completions.create(
+        response = cached_chat_completion(
+            get_openai(),
+            ANALYSIS_CACHE_TTL,
             model="gpt-4",
             messages=messages
         )
         
         # Add signature to the email content
-        email_content = response.choices[0].message.content
-        
-        signature = "\n\n--\nFinance Agent\nAutomated Market Analysis\n"
-        signature += "Updates every 10 minutes | 24/7 monitoring\n"
-        
-        # Insert signature after "Best Regards" or at the end
-        if "Best Regards," in email_content:
-            email_content = email_content.replace("Best Regards,", "Best Regards," + signature)
-        else:
-            email_content += signature
-            
-        return email_content
+        return add_signature(response.choices[0].message.content)
         
     except Exception as e:
         print(f"Error creating analysis with OpenAI: {e}")
         return None
 
+class EmailDraft:
+    """Email content assembled while the analysis streams in
+    
+    The subject is split off as soon as the first line is complete, and the
+    rest of the text is accumulated as the body.
+    """
+    
+    def __init__(self, started_at=None):
+        self.started_at = started_at or time.perf_counter()
+        self.subject = None
+        self.subject_at = None
+        self.first_line = ""
+        self.body = StringIO()
+    
+    def feed(self, text):
+        if self.subject is None:
+            self.first_line += text
+            if '\n' not in self.first_line:
+                return
+            line, text = self.first_line.split('\n', 1)
+            self.subject = line.replace("Subject:", "").strip()
+            self.subject_at = time.perf_counter() - self.started_at
+        self.body.write(text)
+    
+    def content(self):
+        if self.subject is None:
+            # The model never finished its first line
+            return self.first_line
+        return f"Subject: {self.subject}\n{self.body.getvalue()}"
+
+def stream_analysis(btc_data, news_data):
+    """Create the analysis email from a streamed completion
+    
+    Returns (email_content, timings) where timings holds time to first
+    token, time to subject and total generation time in seconds. Cached
+    analyses are returned without streaming.
+    """
+    messages = build_analysis_messages(btc_data, news_data)
+    if not messages:
+        return None, {}
+    
+    start = time.perf_counter()
+    draft = EmailDraft(start)
+    timings = {"time_to_first_token": None, "time_to_subject": None, "generation_seconds": None, "cached": False}
+    
+    cache = get_llm_cache()
+    cache_key = cache.make_key(model="gpt-4", messages=messages, stream=True)
+    cached = cache.get(cache_key) if ANALYSIS_CACHE_TTL > 0 else None
+    
+    try:
+        if cached is not None:
+            timings['cached'] = True
+            timings['time_to_first_token'] = time.perf_counter() - start
+            draft.feed(cached)
+        else:
+            with external_call('openai', 'chat.completions.stream') as span:
+                stream = get_openai().chat.completions.create(
+                    model="gpt-4",
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                for chunk in stream:
+                    if chunk.usage:
+                        # The last chunk carries the usage and no choices
+                        record_tokens(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                        span.set(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    if timings['time_to_first_token'] is None:
+                        timings['time_to_first_token'] = time.perf_counter() - start
+                        span.set(time_to_first_token=timings['time_to_first_token'])
+                    draft.feed(delta)
+            if ANALYSIS_CACHE_TTL > 0:
+                cache.put(cache_key, draft.content(), ANALYSIS_CACHE_TTL)
+    except Exception as e:
+        print(f"Error creating analysis with OpenAI: {e}")
+        return None, timings
+    
+    timings['time_to_subject'] = draft.subject_at
+    timings['generation_seconds'] = time.perf_counter() - start
+    
+    email_content = draft.content()
+    if not email_content:
+        return None, timings
+    return add_signature(email_content), timings
+
 def create_price_graph(btc_data):
     """Create a graph of Bitcoin prices"""
     try:
-        # Convert timestamps and prices into lists
-        timestamps = [datetime.fromisoformat(price['created_at'].replace('Z', '+00:00')) for price in btc_data]
-        prices = [price['price'] for price in btc_data]
-
-        # Create the plot with a larger figure size
-        plt.figure(figsize=(12, 6))
-        plt.plot(timestamps, prices, 'b-', label='BTC Price', linewidth=2)
-        
-        # Format the plot
-        plt.title('Bitcoin Price Trend (24 Hours)', fontsize=14)
-        plt.xlabel('Time (UTC)', fontsize=12)
-        plt.ylabel('Price (USD)', fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.legend(fontsize=10)
-        
-        # Format x-axis to show readable timestamps
-        plt.gcf().autofmt_xdate()  # Angle and align the tick labels
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))  # Show hours:minutes
-        
-        # Add price annotations at start and end
-        if prices:
-            plt.annotate(f'${prices[-1]:,.2f}', 
-                        (timestamps[-1], prices[-1]),
-                        xytext=(10, 10), textcoords='offset points')
-            plt.annotate(f'${prices[0]:,.2f}',
-                        (timestamps[0], prices[0]),
-                        xytext=(-10, 10), textcoords='offset points',
-                        horizontalalignment='right')
-        
-        # Adjust layout to prevent label cutoff
-        plt.tight_layout()
-        
-        # Save plot to bytes buffer
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-        buf.seek(0)
-        plt.close()
-        
-        return buf.getvalue()
+        with stage('email.chart') as span:
+            timestamps, prices = rows_to_arrays(btc_data)
+            graph_data = get_chart_renderer().render(timestamps, prices)
+            span.set(points=len(prices), bytes=len(graph_data))
+            return graph_data
         
     except Exception as e:
         print(f"Error creating graph: {e}")
         return None
 
-def send_email(content, btc_data):
-    """Send email using Gmail SMTP with graph attachment"""
+def send_email(content, btc_data, graph_data=None, subscribers=None):
+    """Send the report to every subscriber over the pooled SMTP sessions
+    
+    The graph is rendered from btc_data unless graph_data is passed in, and
+    one body is rendered per (detail, timezone) segment of subscribers
+    (load_subscribers by default). Returns the fan-out stats, including
+    subscribers per second, or None on failure.
+    """
     try:
-        # Gmail SMTP configuration
-        smtp_server = "smtp.gmail.com"
-        port = 465  # For SSL
-        sender_email = "reachkga@gmail.com"
-        receiver_email = "kg@campaignconsultants.co"
+        sender_email = EMAIL_SENDER
+        subscribers = subscribers or load_subscribers(default_recipients=EMAIL_RECIPIENTS)
         password = os.getenv('GMAIL_APP_PASSWORD')
-
-        # Extract subject line
-        content_parts = content.split('\n', 1)
-        subject = content_parts[0].replace("Subject:", "").strip()
-        body = content_parts[1].strip()
+        start = time.perf_counter()
+        
+        # Analysis and price stats are shared by every variant
+        timestamps, prices = rows_to_arrays(btc_data)
+        report = build_report(content, compute_price_stats(timestamps, prices))
         
         print("\nEmail Content:")
         print("=" * 50)
-        print(f"Subject: {subject}")
+        print(f"Subject: {report['subject']}")
         print("-" * 50)
-        print(body)
+        print(report['body'])
         print("=" * 50)
         
-        # Create the email message
-        message = MIMEMultipart()
-        message["From"] = f"Finance Agent <{sender_email}>"
-        message["To"] = receiver_email
-        message["Subject"] = subject
-        
-        # Add body to email
-        message.attach(MIMEText(body, "plain"))
-        
-        # Create and attach the graph
-        graph_data = create_price_graph(btc_data)
+        # Create the graph once, every message shares the same attachment part
+        if graph_data is None:
+            graph_data = create_price_graph(btc_data)
+        attachments = []
         if graph_data:
-            image = MIMEImage(graph_data)
+            renderer = get_chart_renderer()
+            image = MIMEImage(graph_data, _subtype=renderer.mime_subtype)
             image.add_header('Content-ID', '<btc_graph>')
-            image.add_header('Content-Disposition', 'attachment', filename='btc_price_trend.png')
-            message.attach(image)
+            image.add_header('Content-Disposition', 'attachment', filename=f'btc_price_trend.{renderer.extension}')
+            attachments.append(image)
+        
+        with stage('email.fanout') as span:
+            messages, stats = build_messages(report, subscribers, sender_email, attachments)
+            span.set(subscribers=stats['subscribers'], segments=stats['segments'])
+        print(f"Built {len(messages)} message(s) from {stats['segments']} variant(s)")
+        
+        # Send over the pooled SMTP sessions
+        print(f"\nSending email to {len(messages)} recipient(s)...")
+        engine = get_delivery_engine(sender_email, password)
+        delivery = engine.deliver(messages)
+        print(f"Delivered {delivery['sent']}/{len(messages)}, SMTP stats: {engine.stats}")
         
-        # Create SSL SMTP session
-        print("\nSending email...")
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(smtp_server, port, context=context) as server:
-            server.login(sender_email, password)
-            server.send_message(message)
+        stats['fanout_seconds'] = time.perf_counter() - start
+        stats['subscribers_per_second'] = len(messages) / stats['fanout_seconds'] if stats['fanout_seconds'] > 0 else 0.0
+        
+        if delivery['failed']:
+            print(f"\nFailed to send {delivery['failed']} email(s)")
+            return None
         
         print("\nEmail sent successfully!")
-        print(f"Check your inbox (and spam folder) at {receiver_email}")
-        return True
+        print(f"Check your inbox (and spam folder) at {', '.join(subscriber['email'] for subscriber in subscribers[:10])}"
+              f"{f' and {len(subscribers) - 10} more' if len(subscribers) > 10 else ''}")
+        return stats
             
     except Exception as e:
         print(f"\nError sending email: {e}")
         print(f"Error type: {type(e)}")
-        return False
+        return None
 
-def run_email_agent():
-    """Main function to run the email agent"""
+def should_send_email(btc_data):
+    """Run the change detection gate, logging why the email fires or is skipped"""
+    timestamps, prices = rows_to_arrays(btc_data)
+    try:
+        fire, reasons = get_email_trigger().evaluate(timestamps, prices, count_news_since)
+    except Exception as e:
+        # Better an extra email than a missed move
+        print(f"Error checking email triggers, sending anyway: {e}")
+        return True
+    print(f"Email trigger {'fired' if fire else 'skipped'}: {'; '.join(reasons)}")
+    inc('email_triggers_total', result='fired' if fire else 'skipped')
+    return fire
+
+def run_email_agent(force=False):
+    """Main function to run the email agent
+    
+    The email is only created when the change detection gate fires, unless
+    force is set. With EMAIL_STREAMING enabled the analysis is streamed
+    while the chart renders in the background. Returns the stage timings on
+    success.
+    """
     print("Starting email agent...")
+    start = time.perf_counter()
     
     # Get latest data
     btc_data, news_data = get_latest_data()
-    if not btc_data or not news_data:
+    if not btc_data or news_data is None:
         print("Failed to fetch data from database")
         return
     
-    # Create analysis
-    print("Creating analysis...")
-    email_content = create_analysis(btc_data, news_data)
+    # Skip the completion, chart and send when nothing has changed enough
+    if not force and not should_send_email(btc_data):
+        return
+    
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='chart') as chart_pool:
+        # Render the chart while the analysis is generated
+        chart_start = time.perf_counter()
+        graph_future = chart_pool.submit(bind_context(create_price_graph), btc_data)
+        
+        # Create analysis
+        print("Creating analysis...")
+        with stage('email.generate'):
+            if EMAIL_STREAMING:
+                email_content, timings = stream_analysis(btc_data, news_data)
+            else:
+                generation_start = time.perf_counter()
+                email_content = create_analysis(btc_data, news_data)
+                timings = {"generation_seconds": time.perf_counter() - generation_start}
+        
+        graph_data = graph_future.result()
+        timings['chart_ready_seconds'] = time.perf_counter() - chart_start
+    
     if not email_content:
         print("Failed to create analysis")
         return
     
     # Send email with graph
     print("Sending email...")
-    success = send_email(email_content, btc_data)
-    if success:
+    send_start = time.perf_counter()
+    with stage('email.send'):
+        fanout = send_email(email_content, btc_data, graph_data)
+    timings['send_seconds'] = time.perf_counter() - send_start
+    if fanout:
+        timings['subscribers'] = fanout['subscribers']
+        timings['segments'] = fanout['segments']
+        timings['subscribers_per_second'] = fanout['subscribers_per_second']
+    timings['total_seconds'] = time.perf_counter() - start
+    
+    if fanout:
+        _, prices = rows_to_arrays(btc_data)
+        latest = get_news_index().latest
+        newest_news = datetime.fromtimestamp(latest, timezone.utc).isoformat() if latest else None
+        get_email_trigger().record_sent(prices[-1], newest_news)
         print("Email agent completed successfully!")
+        return timings
     else:
         print("Failed to send email")
 
 if __name__ == "__main__":
-    run_email_agent()
+    run_email_agent(force='--force' in sys.argv)
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+from datetime import datetime, timezone
+from price_analytics import compute_price_stats
+
+# Send only when one of the triggers below fires (false sends on every run)
+EMAIL_TRIGGER_ENABLED = os.getenv('EMAIL_TRIGGER_ENABLED', 'true').lower() == 'true'
+# Price change since the last email, in percent (0 disables)
+EMAIL_TRIGGER_MOVE_PCT = float(os.getenv('EMAIL_TRIGGER_MOVE_PCT', '1.0'))
+# Recent per-sample volatility since the last email, in percent (0 disables)
+EMAIL_TRIGGER_VOLATILITY_PCT = float(os.getenv('EMAIL_TRIGGER_VOLATILITY_PCT', '0.5'))
+# New eco_info rows since the last email (0 disables)
+EMAIL_TRIGGER_NEW_NEWS = int(os.getenv('EMAIL_TRIGGER_NEW_NEWS', '5'))
+# Always send after this many seconds without an email (0 disables)
+EMAIL_MAX_QUIET_SECONDS = float(os.getenv('EMAIL_MAX_QUIET_SECONDS', '21600'))
+
+class EmailTrigger:
+    """Decides whether a run has enough change to be worth an email
+
+    Keeps the time, price and latest news timestamp of the last email in a
+    small JSON file. Price and quiet-time checks run on data already in
+    memory; the new news count is only queried when neither of them fired.
+    """
+
+    def __init__(self, path='cache/email_trigger.json', enabled=EMAIL_TRIGGER_ENABLED,
+                 move_pct=EMAIL_TRIGGER_MOVE_PCT, volatility_pct=EMAIL_TRIGGER_VOLATILITY_PCT,
+                 new_news=EMAIL_TRIGGER_NEW_NEWS, max_quiet_seconds=EMAIL_MAX_QUIET_SECONDS):
+        self.path = path
+        self.enabled = enabled
+        self.move_pct = move_pct
+        self.volatility_pct = volatility_pct
+        self.new_news = new_news
+        self.max_quiet_seconds = max_quiet_seconds
+        self.state = {"last_sent_at": None, "last_price": None, "news_since": None}
+        self.stats = {"fired": 0, "skipped": 0}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.state.update(json.load(f))
+        except Exception as e:
+            print(f"Error loading email trigger state, starting fresh: {e}")
+
+    def save(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving email trigger state: {e}")
+
+    def evaluate(self, timestamps, prices, count_news_since=None, now=None):
+        """Check the triggers against time-sorted price arrays
+
+        count_news_since(iso_timestamp) returns the number of news rows
+        stored after the timestamp. Returns (fire, reasons), where reasons
+        lists the triggers that fired, or every check that didn't.
+        """
+        now = time.time() if now is None else now
+        last_sent = self.state['last_sent_at']
+        if not self.enabled:
+            fired, checked = ["triggers disabled"], []
+        elif last_sent is None:
+            fired, checked = ["no email sent yet"], []
+        else:
+            fired, checked = self._check(timestamps, prices, count_news_since, now, last_sent)
+
+        fire = bool(fired)
+        self.stats['fired' if fire else 'skipped'] += 1
+        return fire, fired if fire else checked
+
+    def _check(self, timestamps, prices, count_news_since, now, last_sent):
+        fired, checked = [], []
+
+        quiet = now - last_sent
+        if self.max_quiet_seconds:
+            hit = quiet >= self.max_quiet_seconds
+            (fired if hit else checked).append(f"quiet {quiet:.0f}s (max {self.max_quiet_seconds:.0f}s)")
+
+        last_price = self.state['last_price']
+        if self.move_pct and len(prices) and last_price:
+            move = (prices[-1] / last_price - 1) * 100
+            hit = abs(move) >= self.move_pct
+            (fired if hit else checked).append(f"price move {move:+.2f}% (threshold {self.move_pct:g}%)")
+
+        if self.volatility_pct:
+            recent = timestamps > last_sent
+            stats = compute_price_stats(timestamps[recent], prices[recent])
+            volatility = stats and stats['rolling_volatility_pct']
+            if volatility is None:
+                checked.append("volatility n/a (too few samples)")
+            else:
+                hit = volatility >= self.volatility_pct
+                (fired if hit else checked).append(f"volatility {volatility:.3f}% (threshold {self.volatility_pct:g}%)")
+
+        # The news count is the only check that costs a round trip
+        if not fired and self.new_news and count_news_since:
+            since = self.state['news_since'] or datetime.fromtimestamp(last_sent, timezone.utc).isoformat()
+            new_news = count_news_since(since)
+            hit = new_news >= self.new_news
+            (fired if hit else checked).append(f"{new_news} new stories (threshold {self.new_news})")
+
+        return fired, checked
+
+    def record_sent(self, price, news_timestamp=None, now=None):
+        """Remember the state an email was sent with"""
+        now = time.time() if now is None else now
+        self.state['last_sent_at'] = now
+        self.state['last_price'] = float(price) if price is not None else None
+        self.state['news_since'] = news_timestamp or datetime.fromtimestamp(now, timezone.utc).isoformat()
+        self.save()
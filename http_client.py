@@ -0,0 +1,132 @@
+import os
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import external_call, record_payload, inc
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (
+    float(os.getenv('HTTP_CONNECT_TIMEOUT', '5')),
+    float(os.getenv('HTTP_READ_TIMEOUT', '20'))
+)
+
+# Responses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HttpClient:
+    """Shared HTTP client with pooled keep-alive connections and retries
+
+    Retries connection errors, timeouts and RETRY_STATUSES with exponential
+    backoff and full jitter, honoring Retry-After when the server sends it.
+    """
+
+    def __init__(self, max_retries=3, backoff_base=0.5, backoff_max=30,
+                 timeout=DEFAULT_TIMEOUT, pool_connections=10, pool_maxsize=10):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        # Retries are handled here, so urllib3 must not retry on its own
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "retry_wait_seconds": 0.0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return max(0.0, min(float(retry_after), self.backoff_max))
+                except ValueError:
+                    try:
+                        until = parsedate_to_datetime(retry_after)
+                        delay = (until - datetime.now(timezone.utc)).total_seconds()
+                        return min(max(delay, 0), self.backoff_max)
+                    except (TypeError, ValueError):
+                        pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, service='http', operation=None, **kwargs):
+        """Send a request with retries, timed as one call to service/operation"""
+        operation = operation or method.lower()
+        with external_call(service, operation) as span:
+            response = self._request(method, url, service, **kwargs)
+            span.set(status=response.status_code)
+            if response.status_code >= 400:
+                span.outcome = 'error'
+            record_payload(service, operation, 'in', len(response.content))
+            return response
+
+    def _request(self, method, url, service, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self._count('requests')
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                delay = self._retry_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    if response.status_code >= 400:
+                        self._count('failures')
+                    return response
+                delay = self._retry_delay(attempt, response)
+                response.close()
+
+            attempt += 1
+            self._count('retries')
+            self._count('retry_wait_seconds', delay)
+            inc('retries_total', service=service)
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Request, retry and connection reuse counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        connections = 0
+        pooled_requests = 0
+        # Through the pool container's public mapping interface, the
+        # counters are best effort if urllib3 changes them
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            connections += getattr(pool, 'num_connections', 0)
+            pooled_requests += getattr(pool, 'num_requests', 0)
+        stats['connections_opened'] = connections
+        stats['connections_reused'] = max(0, pooled_requests - connections)
+        return stats
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client():
+    """Return the process-wide HTTP client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
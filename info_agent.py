@@ -1,28 +1,29 @@
 import os
 import json
+import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timezone
-from dotenv import dotenv_values
-from supabase import create_client
-from openai import OpenAI
+from config import load_config, get_supabase, get_openai
 
-# Load environment variables using dotenv_values
-config = dotenv_values(".env")
-os.environ.update(config)
+# Load environment variables before the helper modules below read their settings
+load_config()
 
-# Initialize clients
-openai_client = OpenAI(
-    api_key=config['OPENAI_API_KEY']
-)
+from http_client import get_http_client
+from llm_cache import cached_chat_completion
+from rate_limiter import RateLimiter
+from seen_urls import SeenUrlIndex
+from news_normalize import clean_url, canonicalize_url, cluster_id_for, StoryClusterer
+from metrics import external_call, stage, inc, bind_context
+from local_store import LOCAL_STORE_ENABLED, get_local_store, write_rows, sync_now
 
-supabase = create_client(
-    config['SUPABASE_URL'],
-    config['SUPABASE_KEY']
-)
+# Brave Search API base URL
+BRAVE_API_URL = os.getenv('BRAVE_API_URL', 'https://api.search.brave.com/res/v1')
 
 def search_brave(query, sites=None, use_site_filter=True):
     """Function to search using Brave Search API"""
-    url = "https://api.search.brave.com/res/v1/web/search"
+    url = f"{BRAVE_API_URL}/web/search"
     headers = {
         "Accept": "application/json",
         "Accept-Encoding": "gzip",
@@ -38,7 +39,7 @@ def search_brave(query, sites=None, use_site_filter=True):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = get_http_client().get(url, service='brave', operation='web_search', headers=headers, params=params)
         print(f"Search query: {params['q']}")  # Debug print
         
         if response.status_code == 200:
@@ -65,7 +66,8 @@ def store_news_in_db(news_info, url):
     """Store news in Supabase database if URL doesn't exist"""
     try:
         # Check if URL already exists in database
-        existing = supabase.table('eco_info').select('url').eq('url', url).execute()
+        with external_call('supabase', 'eco_info.select'):
+            existing = get_supabase().table('eco_info').select('url').eq('url', url).execute()
         
         # If URL already exists, skip insertion
         if existing.data and len(existing.data) > 0:
@@ -79,89 +81,339 @@ def store_news_in_db(news_info, url):
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table('eco_info').insert(data).execute()
+        with external_call('supabase', 'eco_info.insert'):
+            result = get_supabase().table('eco_info').insert(data).execute()
         print("Successfully stored news in database")
         return result
     except Exception as e:
         print(f"Error storing data in Supabase: {e}")
         return None
 
-def get_finance_news():
-    """Main function to get finance news using OpenAI function calling"""
-    
-    # Define the tools/functions available to the model
-    tools = [{
-        "type": "function",
-        "function": {
-            "name": "search_brave",
-            "description": "Search for latest finance news using Brave Search API",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The search query for finance news"
-                    }
-                },
-                "required": ["query"],
-                "additionalProperties": False
-            },
-            "strict": True
-        }
-    }]
+# Local index of stored URLs, loaded on first use and kept across runs
+seen_index = None
+
+# Near-duplicate story clusters, kept for as long as the process lives
+story_clusters = StoryClusterer()
+
+def fetch_stored_urls(page_size=1000):
+    """Fetch every URL stored in eco_info, as dedup keys (see canonicalize_url)"""
+    urls = []
+    while True:
+        # limit/offset rather than range(), whose end is exclusive in postgrest 0.13
+        with external_call('supabase', 'eco_info.select_urls'):
+            page = get_supabase().table('eco_info')\
+                .select('url')\
+                .order('url')\
+                .limit(page_size)\
+                .offset(len(urls))\
+                .execute()
+        urls.extend(canonicalize_url(row['url']) for row in page.data)
+        if len(page.data) < page_size:
+            return urls
+
+def get_seen_index():
+    """Load the seen URL index, rebuilding it from eco_info on a cold start"""
+    global seen_index
+    if seen_index is None:
+        seen_index = SeenUrlIndex()
+        if not seen_index.load():
+            print("No local seen URL index, rebuilding from database...")
+            seen_index.rebuild(fetch_stored_urls())
+            seen_index.save()
+    elif seen_index.bloom.count > seen_index.bloom.capacity:
+        # Past capacity the false positive rate climbs, so size it up again
+        print("Seen URL index is full, rebuilding from database...")
+        seen_index.rebuild(fetch_stored_urls())
+        seen_index.save()
+    return seen_index
+
+def store_news_batch(news_items):
+    """Store a batch of news in Supabase, skipping URLs that already exist
+    
+    news_items is a list of dicts with 'finance_info', 'url' and optionally
+    'key', 'title' and 'description' keys. URLs are deduplicated by key (the
+    canonical URL, computed when missing) and first checked against the local
+    seen URL index, only the ones it can't decide are looked up with a single
+    query, and near-duplicate stories are collapsed to one row per cluster.
+    All new rows are written with a single bulk insert. Returns a dict with
+    'inserted' and 'skipped' counts.
+    """
+    with stage('news.store') as span:
+        counts = _store_news_batch(news_items)
+        span.set(**counts)
+        return counts
 
-    # Define search configurations
-    searches = [
-        {
-            "prompt": "Search for today's stock market news, focusing on S&P 500, Dow Jones, Nasdaq, and major company earnings.",
-            "use_site_filter": False
+def _store_news_batch(news_items):
+    counts = {"inserted": 0, "skipped": 0}
+    inc('news_items_total', len(news_items), result='found')
+    
+    # Drop duplicates within the batch itself, keeping the first occurrence
+    unique_items = {}
+    for item in news_items:
+        key = item.get('key') or canonicalize_url(item['url'])
+        if key in unique_items:
+            counts['skipped'] += 1
+        else:
+            unique_items[key] = item
+    
+    if not unique_items:
+        return counts
+    
+    try:
+        index = get_seen_index()
+        seen, unsure, new = index.classify(unique_items)
+        existing_keys = set(seen)
+        # Stored rows hold the URL as published, so lookups go by that
+        unsure = {unique_items[key]['url']: key for key in unsure}
+        
+        # Rows written locally but not synced yet are only in the local store
+        if unsure and LOCAL_STORE_ENABLED:
+            found = get_local_store().existing_urls(unsure)
+            existing_keys.update(unsure.pop(url) for url in found)
+        
+        # Only URLs the local index can't decide need a round trip
+        if unsure:
+            with external_call('supabase', 'eco_info.select_in'):
+                existing = get_supabase().table('eco_info')\
+                    .select('url')\
+                    .in_('url', list(unsure))\
+                    .execute()
+            found = {row['url'] for row in existing.data or []} & unsure.keys()
+            index.record_false_positives(len(unsure) - len(found))
+            existing_keys.update(unsure[url] for url in found)
+        
+        timestamp = datetime.now(timezone.utc).isoformat()
+        rows = []
+        duplicate_urls = len(news_items) - len(unique_items)
+        duplicate_stories = 0
+        for key, item in unique_items.items():
+            # Stored stories are clustered too so later copies match them
+            text = f"{item.get('title', '')} {item.get('description', '')}"
+            cluster_id, is_new_cluster = story_clusters.assign(text, cluster_id_for(key))
+            if key in existing_keys:
+                duplicate_urls += 1
+                continue
+            if not is_new_cluster:
+                duplicate_stories += 1
+                continue
+            rows.append({
+                "finance_info": item['finance_info'],
+                "url": item['url'],
+                "cluster_id": cluster_id,
+                "timestamp": timestamp
+            })
+        counts['skipped'] += len(unique_items) - len(rows)
+        
+        # Write all new news at once, locally unless the local store is disabled
+        if rows:
+            try:
+                write_rows('eco_info', rows)
+            except Exception:
+                # Stories that weren't stored must not match as duplicates next run
+                for row in rows:
+                    story_clusters.forget(row['cluster_id'])
+                raise
+        counts['inserted'] = len(rows)
+        inc('news_items_total', len(rows), result='inserted')
+        inc('news_items_total', duplicate_urls, result='duplicate_url')
+        inc('news_items_total', duplicate_stories, result='duplicate_story')
+        
+        index.add(unique_items)
+        index.save()
+        
+        print(f"Stored news in database: {counts['inserted']} inserted, {counts['skipped']} skipped")
+        print(f"Seen URL index: {index.stats}")
+    except Exception as e:
+        print(f"Error storing data in Supabase: {e}")
+    
+    return counts
+
+# Define the tools/functions available to the model
+SEARCH_TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "search_brave",
+        "description": "Search for latest finance news using Brave Search API",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The search query for finance news"
+                }
+            },
+            "required": ["query"],
+            "additionalProperties": False
         },
-        {
-            "prompt": "Search for today's Bitcoin price news and major cryptocurrency market updates.",
-            "use_site_filter": False
-        }
+        "strict": True
+    }
+}]
+
+# Define search configurations
+SEARCHES = [
+    {
+        "prompt": "Search for today's stock market news, focusing on S&P 500, Dow Jones, Nasdaq, and major company earnings.",
+        "use_site_filter": False
+    },
+    {
+        "prompt": "Search for today's Bitcoin price news and major cryptocurrency market updates.",
+        "use_site_filter": False
+    }
+]
+
+# Limits for the concurrent search fan-out
+BRAVE_MAX_CONCURRENCY = int(os.getenv('BRAVE_MAX_CONCURRENCY', '4'))
+BRAVE_RATE_LIMIT = float(os.getenv('BRAVE_RATE_LIMIT', '1'))  # requests per second, 0 disables
+
+# How long planned search queries are reused (seconds, 0 disables the cache)
+PLANNING_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL_PLANNING', '3600'))
+
+def plan_searches(search_config):
+    """Ask the model which Brave queries to run for a search configuration"""
+    print(f"\nExecuting search: {search_config['prompt']}")
+    
+    # Get completion from OpenAI
+    with stage('news.plan'):
+        completion = cached_chat_completion(
+            get_openai(),
+            PLANNING_CACHE_TTL,
+            model="gpt-4",
+            messages=[{"role": "user", "content": search_config['prompt']}],
+            tools=SEARCH_TOOLS
+        )
+    
+    # Handle the model's response
+    tool_calls = completion.choices[0].message.tool_calls
+    if not tool_calls:
+        print("No tool calls made by the model")
+        return []
+    
+    return [
+        json.loads(tool_call.function.arguments)["query"]
+        for tool_call in tool_calls
+        if tool_call.function.name == "search_brave"
     ]
 
-    for search_config in searches:
+def search_news(query, rate_limiter=None):
+    """Run a Brave query and turn the top results into news items"""
+    if rate_limiter:
+        rate_limiter.wait()
+    with stage('news.search') as span:
+        search_results = search_brave(query, use_site_filter=False)
+        span.set(results=len(search_results['web']['results']) if search_results and 'web' in search_results else 0)
+    
+    if not search_results or 'web' not in search_results:
+        print("No results found in Brave search")
+        return []
+    
+    print(f"\nFound {len(search_results['web']['results'])} results")
+    news_items = []
+    # Process each news result
+    for result in search_results['web']['results'][:10]:  # Increased to top 10 results
+        url = clean_url(result['url'])
+        news_info = f"Title: {result['title']}\nDescription: {result['description']}\nSource: {url}"
+        print(f"\nProcessing news:\n{news_info}\n")
+        news_items.append({
+            "finance_info": news_info,
+            "url": url,
+            "key": canonicalize_url(url),
+            "title": result['title'],
+            "description": result['description']
+        })
+    return news_items
+
+def get_finance_news_serial(timings):
+    """Run the searches one after another and store the news in one batch"""
+    news_items = []
+    
+    for search_config in SEARCHES:
         try:
-            print(f"\nExecuting search: {search_config['prompt']}")
+            start = time.perf_counter()
+            queries = plan_searches(search_config)
+            timings['planning'] += time.perf_counter() - start
             
-            # Get completion from OpenAI
-            completion = openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": search_config['prompt']}],
-                tools=tools
-            )
-
-            # Handle the model's response
-            tool_calls = completion.choices[0].message.tool_calls
-            if tool_calls:
-                for tool_call in tool_calls:
-                    if tool_call.function.name == "search_brave":
-                        # Parse the arguments
-                        args = json.loads(tool_call.function.arguments)
-                        
-                        # Execute the search
-                        search_results = search_brave(
-                            args["query"], 
-                            use_site_filter=False
-                        )
-                        
-                        if search_results and 'web' in search_results:
-                            print(f"\nFound {len(search_results['web']['results'])} results")
-                            # Process each news result
-                            for result in search_results['web']['results'][:10]:  # Increased to top 10 results
-                                url = result['url']
-                                news_info = f"Title: {result['title']}\nDescription: {result['description']}\nSource: {url}"
-                                print(f"\nProcessing news:\n{news_info}\n")
-                                store_news_in_db(news_info, url)
-                        else:
-                            print("No results found in Brave search")
-            else:
-                print("No tool calls made by the model")
-
+            for query in queries:
+                start = time.perf_counter()
+                news_items.extend(search_news(query))
+                timings['search'] += time.perf_counter() - start
         except Exception as e:
             print(f"Error in get_finance_news: {e}")
+    
+    start = time.perf_counter()
+    counts = store_news_batch(news_items)
+    timings['storage'] += time.perf_counter() - start
+    return counts
+
+def get_finance_news_concurrent(timings):
+    """Plan and run the searches in parallel, storing results as they arrive
+    
+    Planning completions run in parallel, each returned query is searched as
+    soon as its completion arrives (bounded by BRAVE_MAX_CONCURRENCY and
+    BRAVE_RATE_LIMIT), and each finished search is stored straight away.
+    Storage stays on the calling thread.
+    """
+    counts = {"inserted": 0, "skipped": 0}
+    rate_limiter = RateLimiter(BRAVE_RATE_LIMIT)
+    
+    with ThreadPoolExecutor(max_workers=max(1, len(SEARCHES)), thread_name_prefix='plan') as planner, \
+         ThreadPoolExecutor(max_workers=BRAVE_MAX_CONCURRENCY, thread_name_prefix='search') as searcher:
+        timings_lock = threading.Lock()
+        
+        def timed(phase, func, *args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                with timings_lock:
+                    timings[phase] += time.perf_counter() - start
+        
+        pending = {
+            planner.submit(bind_context(timed), 'planning', plan_searches, search_config): 'planning'
+            for search_config in SEARCHES
+        }
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                phase = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error in get_finance_news: {e}")
+                    continue
+                
+                if phase == 'planning':
+                    for query in result:
+                        pending[searcher.submit(bind_context(timed), 'search', search_news, query, rate_limiter)] = 'search'
+                elif result:
+                    start = time.perf_counter()
+                    batch_counts = store_news_batch(result)
+                    timings['storage'] += time.perf_counter() - start
+                    counts['inserted'] += batch_counts['inserted']
+                    counts['skipped'] += batch_counts['skipped']
+    
+    return counts
+
+def get_finance_news(concurrent=True):
+    """Main function to get finance news using OpenAI function calling
+    
+    Returns the inserted/skipped counts along with a timing breakdown. The
+    planning and search timings are summed over calls, so with concurrent=True
+    they can add up to more than the total wall time.
+    """
+    timings = {"planning": 0.0, "search": 0.0, "storage": 0.0}
+    start = time.perf_counter()
+    
+    if concurrent:
+        counts = get_finance_news_concurrent(timings)
+    else:
+        counts = get_finance_news_serial(timings)
+    
+    timings['total'] = time.perf_counter() - start
+    counts['timings'] = timings
+    return counts
 
 if __name__ == "__main__":
     get_finance_news()
+    # Push this run's rows (and any earlier backlog) before exiting
+    sync_now()
@@ -0,0 +1,137 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from metrics import stage, inc, observe
+
+class Job:
+    """A function run on a fixed interval, with its scheduling statistics"""
+
+    def __init__(self, name, func, interval, deadline=None, jitter=0.0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.deadline = deadline
+        self.jitter = jitter
+        self.scheduled_at = None
+        self.due_at = None
+        self.running = False
+        self.started_at = None
+        self.deadline_reported = False
+        self.stats = {
+            "runs": 0, "failures": 0, "skipped": 0, "deadline_exceeded": 0,
+            "last_lag": None, "max_lag": 0.0, "last_duration": None, "max_duration": 0.0
+        }
+
+    def schedule_first(self, now, run_immediately=True):
+        """Set the first slot, now or one interval away, delayed by jitter
+
+        The first run is jittered too, so jobs started together don't all
+        fire at once.
+        """
+        self.scheduled_at = now if run_immediately else now + self.interval
+        self.due_at = self.scheduled_at + random.uniform(0, self.jitter)
+
+    def schedule_next(self, now):
+        """Move to the next slot on the interval grid after now, without drift
+
+        Slots are start + k * interval, so a slow run or a late wake-up never
+        shifts later runs. Slots that were missed entirely are skipped.
+        """
+        self.scheduled_at += self.interval
+        if self.scheduled_at <= now:
+            missed = int((now - self.scheduled_at) // self.interval) + 1
+            self.scheduled_at += missed * self.interval
+        self.due_at = self.scheduled_at + random.uniform(0, self.jitter)
+
+class JobScheduler:
+    """Runs jobs on independent monotonic-clock cadences in worker threads
+
+    A job whose previous run is still going is skipped for that slot rather
+    than queued. Runs that go past their deadline are logged and counted;
+    Python threads can't be killed, so a job that must be stopped hard has
+    to enforce the deadline itself (e.g. a subprocess timeout), and the
+    overlap protection keeps an overrunning job from piling up meanwhile.
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.executor = None
+
+    def add_job(self, name, func, interval, deadline=None, jitter=0.0):
+        job = Job(name, func, interval, deadline, jitter)
+        self.jobs.append(job)
+        return job
+
+    def _run(self, job):
+        start = time.monotonic()
+        try:
+            with stage(f"job.{job.name}"):
+                job.func()
+        except Exception as e:
+            job.stats['failures'] += 1
+            logging.error(f"Job {job.name} failed: {str(e)}")
+        finally:
+            duration = time.monotonic() - start
+            with self.lock:
+                job.running = False
+                job.stats['runs'] += 1
+                job.stats['last_duration'] = duration
+                job.stats['max_duration'] = max(job.stats['max_duration'], duration)
+            logging.info(f"Job {job.name} finished in {duration:.2f}s (lag {job.stats['last_lag']:.2f}s)")
+
+    def _check_deadlines(self, now):
+        for job in self.jobs:
+            if job.running and job.deadline and not job.deadline_reported and now - job.started_at > job.deadline:
+                job.deadline_reported = True
+                job.stats['deadline_exceeded'] += 1
+                inc('job_deadline_exceeded_total', job=job.name)
+                logging.error(f"Job {job.name} exceeded its {job.deadline:g}s deadline, later runs are skipped until it returns")
+
+    def run_pending(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._check_deadlines(now)
+        for job in self.jobs:
+            if now < job.due_at:
+                continue
+            with self.lock:
+                if job.running:
+                    job.stats['skipped'] += 1
+                    inc('job_skipped_total', job=job.name)
+                    logging.warning(f"Skipping job {job.name}, previous run is still going")
+                else:
+                    lag = now - job.due_at
+                    job.running = True
+                    job.started_at = now
+                    job.deadline_reported = False
+                    job.stats['last_lag'] = lag
+                    job.stats['max_lag'] = max(job.stats['max_lag'], lag)
+                    observe('job_lag_seconds', lag, job=job.name)
+                    self.executor.submit(self._run, job)
+                job.schedule_next(now)
+
+    def run_forever(self, run_immediately=True):
+        """Run the jobs until stop() is called"""
+        start = time.monotonic()
+        for job in self.jobs:
+            job.schedule_first(start, run_immediately)
+
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.jobs)), thread_name_prefix='job')
+        try:
+            while not self.stop_event.is_set():
+                self.run_pending()
+                next_due = min(job.due_at for job in self.jobs)
+                self.stop_event.wait(min(1.0, max(0.0, next_due - time.monotonic())))
+        finally:
+            self.executor.shutdown(wait=False)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def status(self):
+        """Per-job statistics: runs, failures, skips, lag and duration"""
+        with self.lock:
+            return {job.name: dict(job.stats, running=job.running) for job in self.jobs}
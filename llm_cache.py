@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from metrics import external_call, record_tokens, inc
+
+class LLMCache:
+    """Content-addressed on-disk cache for LLM responses
+
+    Entries are JSON files named by a hash of the request and carry their own
+    expiry time. Hits refresh the file's modification time, and the least
+    recently used entries are removed once the cache grows past max_entries
+    or max_bytes.
+    """
+
+    def __init__(self, directory='cache/llm', max_entries=1000, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(**request):
+        """Hash of the request, e.g. model, messages and tools"""
+        payload = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+        inc('llm_cache_requests_total', result=stat)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+        if entry['expires_at'] < time.time():
+            self._count('expired')
+            self._count('misses')
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return entry['value']
+
+    def put(self, key, value, ttl):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"expires_at": time.time() + ttl, "value": value}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing LLM cache entry: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries beyond the size limits"""
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+                _, size, name = entries.pop(0)
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                total_bytes -= size
+                self.stats['evictions'] += 1
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Return the process-wide LLM cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000')),
+                max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+            )
+        return _cache
+
+def chat_completion(client, **request):
+    """chat.completions.create, timed and with its token usage recorded"""
+    with external_call('openai', 'chat.completions') as span:
+        completion = client.chat.completions.create(**request)
+        usage = completion.usage
+        if usage:
+            record_tokens(usage.prompt_tokens, usage.completion_tokens)
+            span.set(model=request.get('model'), prompt_tokens=usage.prompt_tokens,
+                     completion_tokens=usage.completion_tokens)
+        return completion
+
+def cached_chat_completion(client, ttl, **request):
+    """chat.completions.create with a cache in front, ttl of 0 bypasses it"""
+    if ttl <= 0:
+        return chat_completion(client, **request)
+
+    cache = get_llm_cache()
+    key = cache.make_key(**request)
+    cached = cache.get(key)
+    if cached is not None:
+        # Imported here so loading this module doesn't import openai
+        from openai.types.chat import ChatCompletion
+        return ChatCompletion.model_validate(cached)
+
+    completion = chat_completion(client, **request)
+    cache.put(key, completion.model_dump(mode='json'), ttl)
+    return completion
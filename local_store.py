@@ -0,0 +1,371 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from datetime import datetime
+from config import get_supabase
+from metrics import external_call, inc
+
+# Write prices and news to the local store first and sync them in the
+# background (false writes straight to Supabase)
+LOCAL_STORE_ENABLED = os.getenv('LOCAL_STORE_ENABLED', 'true').lower() == 'true'
+LOCAL_STORE_PATH = os.getenv('LOCAL_STORE_PATH', 'cache/local_store.db')
+# Serve get_latest_data from the local store when it covers the request
+LOCAL_STORE_READS = os.getenv('LOCAL_STORE_READS', 'true').lower() == 'true'
+SYNC_INTERVAL_SECONDS = float(os.getenv('SYNC_INTERVAL_SECONDS', '5'))
+SYNC_BATCH_SIZE = int(os.getenv('SYNC_BATCH_SIZE', '500'))
+SYNC_MAX_BACKOFF_SECONDS = float(os.getenv('SYNC_MAX_BACKOFF_SECONDS', '300'))
+# Synced rows older than this are deleted locally, 0 keeps everything
+LOCAL_STORE_RETENTION_HOURS = float(os.getenv('LOCAL_STORE_RETENTION_HOURS', '168'))
+PRUNE_INTERVAL_SECONDS = 3600
+
+# Synced tables: local columns, the Supabase column upserts deduplicate on,
+# and the column holding the row's time
+TABLES = {
+    "btc_price": {"columns": ("price", "created_at"), "conflict": "created_at", "time": "created_at"},
+    "eco_info": {"columns": ("finance_info", "url", "cluster_id", "timestamp"), "conflict": "url", "time": "timestamp"}
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS btc_price (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    price REAL NOT NULL,
+    created_at TEXT NOT NULL UNIQUE,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS btc_price_ts ON btc_price (ts);
+CREATE TABLE IF NOT EXISTS eco_info (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    finance_info TEXT NOT NULL,
+    url TEXT NOT NULL UNIQUE,
+    cluster_id TEXT,
+    timestamp TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS eco_info_ts ON eco_info (ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    high_water INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+class LocalStore:
+    """Embedded SQLite store (WAL mode) that agents write to before Supabase
+
+    Every row gets a local sequence number. The syncer pushes rows past each
+    table's high-water mark to Supabase and only then moves the mark, so an
+    outage just leaves a backlog that is sent once Supabase is back.
+    """
+
+    def __init__(self, path=LOCAL_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL only risks the last commits on power loss, not corruption
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA busy_timeout=5000')
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('created_at', ?)", (str(time.time()),))
+        self.created_at = float(self.conn.execute("SELECT value FROM meta WHERE key = 'created_at'").fetchone()[0])
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'pruned_before'").fetchone()
+        self.pruned_before = float(row[0]) if row else 0.0
+
+    def insert(self, table, rows):
+        """Insert rows, ignoring ones already stored; returns the number added"""
+        spec = TABLES[table]
+        columns = spec['columns']
+        values = [
+            tuple(row.get(column) for column in columns) + (parse_timestamp(row[spec['time']]),)
+            for row in rows
+        ]
+        sql = f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}, ts) VALUES ({', '.join('?' * (len(columns) + 1))})"
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany(sql, values)
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            return self.conn.total_changes - before
+
+    def high_water(self, table):
+        with self.lock:
+            return self._high_water(table)
+
+    def _high_water(self, table):
+        # Callers hold self.lock
+        row = self.conn.execute("SELECT high_water FROM sync_state WHERE table_name = ?", (table,)).fetchone()
+        return row[0] if row else 0
+
+    def pending(self, table, limit=SYNC_BATCH_SIZE):
+        """Up to limit unsynced rows as (last_seq, rows)"""
+        columns = TABLES[table]['columns']
+        with self.lock:
+            cursor = self.conn.execute(
+                f"SELECT seq, {', '.join(columns)} FROM {table} WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self._high_water(table), limit)
+            )
+            records = cursor.fetchall()
+        if not records:
+            return None, []
+        return records[-1][0], [dict(zip(columns, record[1:])) for record in records]
+
+    def mark_synced(self, table, seq):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO sync_state (table_name, high_water) VALUES (?, ?) "
+                "ON CONFLICT (table_name) DO UPDATE SET high_water = excluded.high_water",
+                (table, seq)
+            )
+
+    def backlog(self):
+        """Unsynced row count per table"""
+        with self.lock:
+            return {
+                table: self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE seq > ?",
+                                         (self._high_water(table),)).fetchone()[0]
+                for table in TABLES
+            }
+
+    def prune(self, before):
+        """Delete synced rows older than `before` (a unix time), returns the number deleted
+
+        Unsynced rows are kept whatever their age. Afterwards the store no
+        longer covers reads from before the cutoff.
+        """
+        deleted = 0
+        with self.lock:
+            self.conn.execute('BEGIN')
+            try:
+                for table in TABLES:
+                    deleted += self.conn.execute(
+                        f"DELETE FROM {table} WHERE ts < ? AND seq <= ?", (before, self._high_water(table))
+                    ).rowcount
+                self.pruned_before = max(self.pruned_before, before)
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('pruned_before', ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    (str(self.pruned_before),)
+                )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return deleted
+
+    def covers(self, since):
+        """Whether every row written since `since` (a unix time) is local
+
+        True once the store has existed since then and nothing from then on
+        was pruned, as long as the agents using it are the only writers to
+        Supabase.
+        """
+        return max(self.created_at, self.pruned_before) <= since
+
+    def prices_since(self, since):
+        """btc_price rows with created_at at or after the ISO timestamp, oldest first"""
+        with self.lock:
+            records = self.conn.execute(
+                "SELECT price, created_at FROM btc_price WHERE ts >= ? ORDER BY ts",
+                (parse_timestamp(since),)
+            ).fetchall()
+        return [{"price": price, "created_at": created_at} for price, created_at in records]
+
+    def news_since(self, since, unsynced=False):
+        """eco_info rows with a timestamp at or after the ISO timestamp, oldest first
+
+        With unsynced only the rows not yet pushed to Supabase.
+        """
+        columns = TABLES['eco_info']['columns']
+        with self.lock:
+            records = self.conn.execute(
+                f"SELECT {', '.join(columns)} FROM eco_info WHERE ts >= ? AND seq > ? ORDER BY ts",
+                (parse_timestamp(since), self._high_water('eco_info') if unsynced else 0)
+            ).fetchall()
+        return [dict(zip(columns, record)) for record in records]
+
+    def count_news_since(self, since, unsynced=False):
+        """Number of eco_info rows with a timestamp after the ISO timestamp, or only unsynced ones"""
+        with self.lock:
+            after_seq = self._high_water('eco_info') if unsynced else 0
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM eco_info WHERE ts > ? AND seq > ?", (parse_timestamp(since), after_seq)
+            ).fetchone()[0]
+
+    def existing_urls(self, urls):
+        """The subset of urls already in the local eco_info table"""
+        urls = list(urls)
+        found = set()
+        with self.lock:
+            # Stay under SQLite's bound parameter limit
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                cursor = self.conn.execute(
+                    f"SELECT url FROM eco_info WHERE url IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                found.update(url for (url,) in cursor)
+        return found
+
+class StoreSyncer:
+    """Pushes unsynced local rows to Supabase in batches
+
+    Rows are sent with upserts that ignore conflicts on each table's natural
+    key, so a batch sent twice (e.g. after a crash between the upsert and
+    the high-water update) doesn't create duplicates. Failures back off
+    exponentially up to SYNC_MAX_BACKOFF_SECONDS. Once an hour synced rows
+    past the retention period are pruned.
+    """
+
+    def __init__(self, store, client, interval=SYNC_INTERVAL_SECONDS, batch_size=SYNC_BATCH_SIZE,
+                 max_backoff=SYNC_MAX_BACKOFF_SECONDS, retention_hours=LOCAL_STORE_RETENTION_HOURS):
+        self.store = store
+        self.client = client
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.retention_hours = retention_hours
+        self.next_prune = 0.0
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {"synced": 0, "batches": 0, "errors": 0, "pruned": 0}
+
+    def sync_table(self, table):
+        """Push every pending row of one table, returns the number sent"""
+        sent = 0
+        while True:
+            last_seq, rows = self.store.pending(table, self.batch_size)
+            if not rows:
+                return sent
+            with external_call('supabase', f'{table}.upsert') as span:
+                span.set(rows=len(rows))
+                self.client.table(table)\
+                    .upsert(rows, on_conflict=TABLES[table]['conflict'], ignore_duplicates=True)\
+                    .execute()
+            self.store.mark_synced(table, last_seq)
+            sent += len(rows)
+            self.stats['batches'] += 1
+            inc('sync_rows_total', len(rows), table=table)
+
+    def sync(self):
+        """Push all pending rows, returns the number sent; raises on failure"""
+        sent = sum(self.sync_table(table) for table in TABLES)
+        self.stats['synced'] += sent
+        now = time.time()
+        if self.retention_hours > 0 and now >= self.next_prune:
+            self.stats['pruned'] += self.store.prune(now - self.retention_hours * 3600)
+            self.next_prune = now + PRUNE_INTERVAL_SECONDS
+        return sent
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sync()
+                self.failures = 0
+                delay = self.interval
+            except Exception as e:
+                self.failures += 1
+                self.stats['errors'] += 1
+                delay = min(self.max_backoff, self.interval * 2 ** self.failures) * random.uniform(0.5, 1)
+                print(f"Error syncing local store to Supabase, retrying in {delay:.0f}s "
+                      f"(backlog {self.store.backlog()}): {e}")
+            self.stop_event.wait(delay)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='store-sync', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_local_store():
+    """Return the process-wide local store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LocalStore()
+        return _store
+
+def read_prices_since(since):
+    """Local btc_price rows since the ISO timestamp, None if the store doesn't cover it"""
+    if not (LOCAL_STORE_ENABLED and LOCAL_STORE_READS):
+        return None
+    store = get_local_store()
+    if not store.covers(parse_timestamp(since)):
+        return None
+    return store.prices_since(since)
+
+def read_news_since(since):
+    """Local eco_info rows since the ISO timestamp, None if the store doesn't cover it"""
+    if not (LOCAL_STORE_ENABLED and LOCAL_STORE_READS):
+        return None
+    store = get_local_store()
+    if not store.covers(parse_timestamp(since)):
+        return None
+    return store.news_since(since)
+
+def read_unsynced_news_since(since):
+    """Local eco_info rows since the ISO timestamp not yet pushed to Supabase"""
+    if not LOCAL_STORE_ENABLED:
+        return []
+    return get_local_store().news_since(since, unsynced=True)
+
+def count_local_news_since(since):
+    """Local eco_info rows after the ISO timestamp, None if the store doesn't cover it"""
+    if not (LOCAL_STORE_ENABLED and LOCAL_STORE_READS):
+        return None
+    store = get_local_store()
+    if not store.covers(parse_timestamp(since)):
+        return None
+    return store.count_news_since(since)
+
+def count_unsynced_news_since(since):
+    """Local eco_info rows after the ISO timestamp not yet pushed to Supabase"""
+    if not LOCAL_STORE_ENABLED:
+        return 0
+    return get_local_store().count_news_since(since, unsynced=True)
+
+def write_rows(table, rows):
+    """Write rows to the local store, or straight to Supabase when it's disabled"""
+    if LOCAL_STORE_ENABLED:
+        return get_local_store().insert(table, rows)
+    with external_call('supabase', f'{table}.insert') as span:
+        span.set(rows=len(rows))
+        get_supabase().table(table).insert(rows).execute()
+    return len(rows)
+
+def sync_now():
+    """Push the local backlog once, for agents run as standalone scripts
+
+    Returns the number of rows sent; on failure the rows stay local for the
+    next run or the scheduler's syncer.
+    """
+    if not LOCAL_STORE_ENABLED:
+        return 0
+    try:
+        return StoreSyncer(get_local_store(), get_supabase()).sync()
+    except Exception as e:
+        print(f"Error syncing local store to Supabase, rows kept locally: {e}")
+        return 0
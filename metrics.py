@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local Prometheus endpoint for the scheduler (0 disables it)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# One JSON line per span and external call (empty disables it)
+TRACE_LOG = os.getenv('TRACE_LOG', 'logs/trace.jsonl')
+
+PREFIX = 'agents_'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# name: (type, help, buckets)
+METRICS = {
+    "external_call_seconds": ("histogram", "Duration of calls to external services", DURATION_BUCKETS),
+    "external_calls_total": ("counter", "Calls to external services by outcome", None),
+    "retries_total": ("counter", "Retried external calls", None),
+    "payload_bytes": ("histogram", "Request and response payload sizes", SIZE_BUCKETS),
+    "stage_seconds": ("histogram", "Duration of pipeline stages", DURATION_BUCKETS),
+    "stage_runs_total": ("counter", "Pipeline stage runs by outcome", None),
+    "llm_tokens": ("histogram", "Prompt and completion tokens per LLM call", TOKEN_BUCKETS),
+    "llm_cache_requests_total": ("counter", "LLM cache lookups by result", None),
+    "news_items_total": ("counter", "News items by result (found, inserted, duplicate_url, duplicate_story)", None),
+    "emails_total": ("counter", "Emails by result (sent, failed)", None),
+    "report_variants_total": ("counter", "Report bodies by result (rendered per segment, shared with the segment)", None),
+    "email_triggers_total": ("counter", "Email trigger decisions (fired, skipped)", None),
+    "sync_rows_total": ("counter", "Rows pushed from the local store to Supabase", None),
+    "local_reads_total": ("counter", "get_latest_data reads by source (local, supabase)", None),
+    "chart_renders_total": ("counter", "Chart renders by result (rendered, cached)", None),
+    "job_lag_seconds": ("histogram", "Delay between a job's due time and its start", DURATION_BUCKETS),
+    "job_skipped_total": ("counter", "Job runs skipped because the previous run was still going", None),
+    "job_deadline_exceeded_total": ("counter", "Job runs that went past their deadline", None)
+}
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms with Prometheus text output
+
+    Recording is a dict lookup and a few additions under one lock, so it
+    is cheap enough for every external call.
+    """
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.metrics[name][2])
+            histogram.observe(value)
+
+    def value(self, name, **labels):
+        """Current counter value, mostly for tests and status logs"""
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = [(key, h.buckets, list(h.counts), h.sum, h.count) for key, h in sorted(self.histograms.items())]
+
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, help_text, _ = self.metrics[name]
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{PREFIX}{name}{format_labels(labels)} {value:g}")
+
+        for (name, labels), buckets, counts, total, count in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {total:g}")
+            lines.append(f"{PREFIX}{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+registry = MetricsRegistry()
+inc = registry.inc
+observe = registry.observe
+
+# Tracing
+
+_trace_id = contextvars.ContextVar('trace_id', default=None)
+_span_name = contextvars.ContextVar('span_name', default=None)
+trace_logger = logging.getLogger('trace')
+trace_logger.propagate = False
+_trace_enabled = False
+
+def configure_trace_log(path=TRACE_LOG):
+    """Write spans as JSON lines to path, returns whether tracing is on"""
+    global _trace_enabled
+    if not path or _trace_enabled:
+        return _trace_enabled
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+    _trace_enabled = True
+    return True
+
+class Span:
+    """A timed unit of work; fields set on it end up in its JSON log line"""
+    __slots__ = ('kind', 'name', 'labels', 'fields', 'outcome', 'started', 'duration')
+
+    def __init__(self, kind, name, labels):
+        self.kind = kind
+        self.name = name
+        self.labels = labels
+        self.fields = {}
+        self.outcome = 'ok'
+        self.started = time.time()
+        self.duration = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+def _emit(span, parent):
+    if not _trace_enabled:
+        return
+    record = {
+        "ts": span.started,
+        "trace_id": _trace_id.get(),
+        "kind": span.kind,
+        "name": span.name,
+        "parent": parent,
+        "duration_ms": round(span.duration * 1000, 3),
+        "outcome": span.outcome
+    }
+    record.update(span.labels)
+    record.update(span.fields)
+    trace_logger.info(json.dumps(record, default=str))
+
+@contextmanager
+def _traced(kind, name, labels, record):
+    span = Span(kind, name, labels)
+    trace_token = _trace_id.set(os.urandom(8).hex()) if _trace_id.get() is None else None
+    parent = _span_name.get()
+    name_token = _span_name.set(name)
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span.outcome = 'error'
+        raise
+    finally:
+        span.duration = time.perf_counter() - start
+        _span_name.reset(name_token)
+        record(span)
+        _emit(span, parent)
+        if trace_token is not None:
+            _trace_id.reset(trace_token)
+
+def _record_stage(span):
+    observe('stage_seconds', span.duration, stage=span.name)
+    inc('stage_runs_total', stage=span.name, outcome=span.outcome)
+
+def _record_call(span):
+    service, operation = span.labels['service'], span.labels['operation']
+    observe('external_call_seconds', span.duration, service=service, operation=operation)
+    inc('external_calls_total', service=service, operation=operation, outcome=span.outcome)
+
+def stage(name, **labels):
+    """Time a pipeline stage, the outermost stage in a context starts a trace"""
+    return _traced('stage', name, labels, _record_stage)
+
+def external_call(service, operation):
+    """Time a call to an external service
+
+    Set span.outcome for failures that don't raise (e.g. an HTTP error
+    status); exceptions are recorded as 'error' automatically.
+    """
+    return _traced('call', f"{service}.{operation}", {"service": service, "operation": operation}, _record_call)
+
+def record_payload(service, operation, direction, size):
+    if size:
+        observe('payload_bytes', size, service=service, operation=operation, direction=direction)
+
+def record_tokens(prompt_tokens=None, completion_tokens=None):
+    if prompt_tokens:
+        observe('llm_tokens', prompt_tokens, kind='prompt')
+    if completion_tokens:
+        observe('llm_tokens', completion_tokens, kind='completion')
+
+def bind_context(func):
+    """Wrap func to run in a copy of the current context, so work handed to a
+    thread pool stays in the caller's trace"""
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so every call
+    # runs in its own copy
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+# Endpoint
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics from a daemon thread, returns the server or None"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,199 @@
+import os
+import re
+import math
+import bisect
+import time
+from array import array
+from datetime import datetime, timezone
+import numpy as np
+
+# Terms news is ranked against (comma or space separated)
+NEWS_QUERY_TERMS = os.getenv(
+    'NEWS_QUERY_TERMS',
+    'bitcoin,btc,crypto,cryptocurrency,etf,halving,miners,stablecoin,fed,federal,reserve,fomc,'
+    'powell,rate,rates,inflation,cpi,treasury,yields,dollar,liquidity,recession,macro,sec,regulation'
+)
+# Stories lose half their weight every NEWS_HALF_LIFE_MINUTES
+NEWS_HALF_LIFE_MINUTES = float(os.getenv('NEWS_HALF_LIFE_MINUTES', '60'))
+# Stories older than this are neither indexed nor returned
+NEWS_MAX_AGE_HOURS = float(os.getenv('NEWS_MAX_AGE_HOURS', '48'))
+NEWS_TOP_K = int(os.getenv('NEWS_TOP_K', '10'))
+# Stories scoring below this after decay are left out (one strong match
+# scores a few points when new, a twentieth of that after ~4 half-lives)
+NEWS_MIN_SCORE = float(os.getenv('NEWS_MIN_SCORE', '0.1'))
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it',
+    'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'were', 'will', 'with'
+}
+# Title terms count this many times, headlines say what a story is about
+TITLE_WEIGHT = 2
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords, with a plural 's' stripped"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token[-1] == 's' and token[-2] not in 'su':
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+def document_terms(row):
+    """Term frequencies for an eco_info row
+
+    Uses the title and description when present, otherwise the
+    "Title: ...\\nDescription: ..." text in finance_info (the Source line is
+    skipped so URLs don't match query terms).
+    """
+    if 'title' in row or 'description' in row:
+        title, description = row.get('title') or '', row.get('description') or ''
+    else:
+        title, description = '', []
+        for line in (row.get('finance_info') or '').splitlines():
+            label, _, value = line.partition(': ')
+            if label == 'Title':
+                title = value
+            elif label != 'Source':
+                description.append(value or label)
+        description = ' '.join(description)
+    frequencies = {}
+    for token in tokenize(title):
+        frequencies[token] = frequencies.get(token, 0) + TITLE_WEIGHT
+    for token in tokenize(description):
+        frequencies[token] = frequencies.get(token, 0) + 1
+    return frequencies
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+class NewsIndex:
+    """Incremental BM25 inverted index over stored news, ranked with recency decay
+
+    Documents get increasing ids as they are added and every term's postings
+    are appended to typed arrays in id order, so a query can bisect past
+    stories older than max_age and score the rest with numpy without
+    copying. Only documents containing at least one query term are
+    candidates: BM25 times 0.5 ** (age / half_life).
+    """
+
+    def __init__(self, k1=1.2, b=0.75, half_life_minutes=NEWS_HALF_LIFE_MINUTES,
+                 max_age_hours=NEWS_MAX_AGE_HOURS, overlap_seconds=120):
+        self.k1 = k1
+        self.b = b
+        self.half_life = half_life_minutes * 60
+        self.max_age = max_age_hours * 3600
+        self.overlap_seconds = overlap_seconds
+        # term -> (document ids, term frequencies), both in id order
+        self.postings = {}
+        self.rows = []
+        self.timestamps = array('d')
+        # Latest timestamp up to each document, non-decreasing so it can be bisected
+        self.timestamp_floor = array('d')
+        self.lengths = array('d')
+        self.total_length = 0
+        self.urls = set()
+        self.latest = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, rows):
+        """Index rows not seen before (by URL), returns the number added"""
+        added = 0
+        for row in rows:
+            url = row.get('url')
+            if url in self.urls:
+                continue
+            frequencies = document_terms(row)
+            doc_id = len(self.rows)
+            for term, frequency in frequencies.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array('i'), array('d'))
+                postings[0].append(doc_id)
+                postings[1].append(frequency)
+            timestamp = parse_timestamp(row['timestamp'])
+            length = sum(frequencies.values())
+            self.rows.append(row)
+            self.timestamps.append(timestamp)
+            self.timestamp_floor.append(max(timestamp, self.timestamp_floor[-1]) if self.timestamp_floor else timestamp)
+            self.lengths.append(length)
+            self.total_length += length
+            if url:
+                self.urls.add(url)
+            if self.latest is None or timestamp > self.latest:
+                self.latest = timestamp
+            added += 1
+        return added
+
+    def update(self, fetch_rows_since, now=None):
+        """Add rows stored since the newest indexed one (or within max_age on first use)
+
+        fetch_rows_since takes an ISO timestamp and returns eco_info rows at
+        or after it. A small overlap catches rows stored out of order, and
+        rows already indexed are skipped by URL.
+        """
+        now = now or time.time()
+        since = now - self.max_age
+        self.compact(since)
+        if self.latest is not None:
+            since = max(since, self.latest - self.overlap_seconds)
+        return self.add(fetch_rows_since(datetime.fromtimestamp(since, timezone.utc).isoformat()))
+
+    def compact(self, cutoff):
+        """Rebuild without stories older than cutoff once they are most of the index"""
+        expired = bisect.bisect_left(self.timestamp_floor, cutoff)
+        if expired and expired * 2 >= len(self.rows):
+            rows = self.rows[expired:]
+            self.__init__(self.k1, self.b, self.half_life / 60, self.max_age / 3600, self.overlap_seconds)
+            self.add(rows)
+
+    def search(self, terms, top_k=NEWS_TOP_K, now=None, min_score=NEWS_MIN_SCORE):
+        """The top_k rows by recency-weighted BM25 for the query terms, best first
+
+        Each returned row is a copy with its 'score' added.
+        """
+        now = now or time.time()
+        count = len(self.rows)
+        if not count:
+            return []
+        cutoff = now - self.max_age
+        # Documents before this id are all older than the cutoff
+        first_id = bisect.bisect_left(self.timestamp_floor, cutoff)
+        if first_id == count:
+            return []
+        k1, b = self.k1, self.b
+        # Views over the live part of the arrays, indexed by doc_id - first_id
+        lengths = np.frombuffer(self.lengths, dtype=np.float64)[first_id:]
+        timestamps = np.frombuffer(self.timestamps, dtype=np.float64)[first_id:]
+        # Documents without terms leave total_length at 0
+        norms = k1 * (1 - b + b * lengths / max(self.total_length / count, 1))
+
+        scores = np.zeros(count - first_id)
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            ids, frequencies = postings
+            start = bisect.bisect_left(ids, first_id)
+            if start == len(ids):
+                continue
+            idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            live_ids = np.frombuffer(ids, dtype=np.int32)[start:] - first_id
+            tf = np.frombuffer(frequencies, dtype=np.float64)[start:]
+            # A term has one posting per document, so ids don't repeat
+            scores[live_ids] += idf * tf * (k1 + 1) / (tf + norms[live_ids])
+
+        scores *= np.exp(-math.log(2) / self.half_life * np.maximum(now - timestamps, 0))
+        scores[timestamps < cutoff] = 0
+        candidates = np.flatnonzero(scores >= max(min_score, 1e-12))
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(scores[candidates], -top_k)[-top_k:]]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [dict(self.rows[first_id + int(i)], score=round(float(scores[i]), 4)) for i in ranked]
+
+def query_terms(text=NEWS_QUERY_TERMS):
+    return tokenize(text.replace(',', ' '))
@@ -0,0 +1,168 @@
+import re
+import zlib
+import hashlib
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote_plus
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    'ref', 'ref_src', 'ref_url', 'referrer',
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', 'cmpid', 'ocid', 'smid', 'taid', 'guccounter',
+    'amp', 'outputtype', '_ga', '_gl'
+}
+
+# Host prefixes used for mobile and AMP copies of the same page
+MOBILE_HOST_PREFIXES = ('www.', 'm.', 'mobile.', 'amp.')
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+def is_tracking_param(key):
+    key = key.lower()
+    return key.startswith('utm_') or key in TRACKING_PARAMS
+
+def strip_amp_path(path):
+    path = re.sub(r'^/amp(?=/)', '', path)
+    path = re.sub(r'/amp/?$', '/', path)
+    return re.sub(r'\.amp(?=\.html?$|$)', '', path)
+
+def clean_url(url):
+    """Return the URL to store and link to for a news result
+
+    Lowercases the scheme and host and drops fragments, tracking parameters
+    and AMP paths; everything else is kept as published.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url
+
+    netloc = parts.netloc.rsplit('@', 1)
+    netloc[-1] = netloc[-1].lower()
+    # Filter the raw parameters so the rest (encoding, bare flags) stay as published
+    query = '&'.join(
+        param for param in parts.query.split('&')
+        if param and not is_tracking_param(unquote_plus(param.split('=', 1)[0]))
+    )
+    return urlunsplit((parts.scheme.lower(), '@'.join(netloc), strip_amp_path(parts.path), query, ''))
+
+def canonicalize_url(url):
+    """Return the key used to recognise copies of the same news URL
+
+    On top of clean_url, maps http to https, drops mobile/AMP host prefixes,
+    default ports and trailing slashes and sorts the query parameters. Only
+    for deduplication; the key isn't necessarily a working link.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower() or 'https'
+    if scheme == 'http':
+        scheme = 'https'
+
+    host = (parts.hostname or '').lower()
+    for prefix in MOBILE_HOST_PREFIXES:
+        if host.startswith(prefix) and host.count('.') > 1:
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = strip_amp_path(parts.path or '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(key)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+def shingles(text, size=3):
+    """Word shingles of the text, falling back to single words for short text"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return set(words)
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class StoryClusterer:
+    """Groups near-duplicate stories using MinHash signatures and LSH banding
+
+    Stories whose shingle sets have a Jaccard similarity above roughly
+    (1 / bands) ** (1 / rows) end up in the same cluster. Only the most recent
+    max_clusters clusters are remembered.
+    """
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, bands=16, rows=4, max_clusters=5000, seed=1):
+        self.bands = bands
+        self.rows = rows
+        num_perm = bands * rows
+        # Deterministic hash coefficients so signatures are stable across runs
+        coefficients = hashlib.shake_256(str(seed).encode()).digest(num_perm * 16)
+        self.perms = [
+            (int.from_bytes(coefficients[i * 16:i * 16 + 8], 'little') % self.PRIME | 1,
+             int.from_bytes(coefficients[i * 16 + 8:i * 16 + 16], 'little') % self.PRIME)
+            for i in range(num_perm)
+        ]
+        self.max_clusters = max_clusters
+        self.buckets = {}
+        self.clusters = OrderedDict()
+
+    def signature(self, text):
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)]
+        if not hashes:
+            return None
+        prime = self.PRIME
+        return [min((a * h + b) % prime for h in hashes) for a, b in self.perms]
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def assign(self, text, cluster_id):
+        """Return (cluster_id, is_new) for the text
+
+        If the text matches a known cluster its id is returned, otherwise a
+        new cluster is created with the given id.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return cluster_id, True
+
+        keys = self._band_keys(signature)
+        for key in keys:
+            existing = self.buckets.get(key)
+            if existing is not None and existing in self.clusters:
+                self.clusters.move_to_end(existing)
+                return existing, False
+
+        self.clusters[cluster_id] = keys
+        for key in keys:
+            self.buckets[key] = cluster_id
+
+        # Forget the oldest clusters once we're over the limit
+        while len(self.clusters) > self.max_clusters:
+            self.forget(next(iter(self.clusters)))
+
+        return cluster_id, True
+
+    def forget(self, cluster_id):
+        """Drop a cluster so later copies of its story count as new again"""
+        for key in self.clusters.pop(cluster_id, ()):
+            if self.buckets.get(key) == cluster_id:
+                del self.buckets[key]
+
+def cluster_id_for(url):
+    """Stable cluster id derived from the representative's canonical URL (see canonicalize_url)"""
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
@@ -0,0 +1,141 @@
+import numpy as np
+from datetime import datetime, timezone
+
+def rows_to_arrays(btc_data):
+    """Turn btc_price rows (any order) into time-sorted timestamp and price arrays"""
+    timestamps = np.fromiter(
+        (datetime.fromisoformat(row['created_at'].replace('Z', '+00:00')).timestamp() for row in btc_data),
+        dtype=np.float64, count=len(btc_data)
+    )
+    prices = np.fromiter((row['price'] for row in btc_data), dtype=np.float64, count=len(btc_data))
+    order = np.argsort(timestamps, kind='stable')
+    return timestamps[order], prices[order]
+
+def rolling_mean(values, window):
+    """Trailing mean over `window` samples, computed with cumulative sums"""
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+def rolling_std(values, window):
+    """Trailing population standard deviation over `window` samples"""
+    mean = rolling_mean(values, window)
+    mean_sq = rolling_mean(values * values, window)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+def rolling_extreme(values, window, func):
+    """Trailing max/min over `window` samples as `window` shifted passes
+
+    For the short windows used here this beats a strided window view, which
+    reduces every window separately.
+    """
+    out = values[window - 1:].copy()
+    for shift in range(1, window):
+        func(out, values[window - 1 - shift:len(values) - shift], out=out)
+    return out
+
+def compute_price_stats(timestamps, prices, short_window=6, long_window=24, breakout_window=12):
+    """Summary statistics for a time-sorted price series
+
+    Windows are in samples. Returns None for an empty series. Breakouts are
+    samples that close above the highest (or below the lowest) price of the
+    preceding breakout_window samples.
+    """
+    count = len(prices)
+    if count == 0:
+        return None
+
+    first, last = prices[0], prices[-1]
+    low_index = int(np.argmin(prices))
+    high_index = int(np.argmax(prices))
+
+    # Largest peak-to-trough fall
+    running_peak = np.maximum.accumulate(prices)
+    drawdowns = (prices - running_peak) / running_peak
+    trough_index = int(np.argmin(drawdowns))
+
+    stats = {
+        "samples": count,
+        "start_time": timestamps[0],
+        "end_time": timestamps[-1],
+        "first": first,
+        "last": last,
+        "change": last - first,
+        "change_pct": (last / first - 1) * 100 if first else 0.0,
+        "low": prices[low_index],
+        "low_time": timestamps[low_index],
+        "high": prices[high_index],
+        "high_time": timestamps[high_index],
+        "max_drawdown_pct": drawdowns[trough_index] * 100,
+        "volatility_pct": None,
+        "rolling_volatility_pct": None,
+        "sma_short": None,
+        "sma_long": None,
+        "breakouts_up": 0,
+        "breakouts_down": 0,
+        "last_breakout": None
+    }
+
+    if count > 1:
+        returns = np.diff(prices) / prices[:-1]
+        stats["volatility_pct"] = float(np.std(returns)) * 100
+        if len(returns) >= short_window:
+            stats["rolling_volatility_pct"] = float(rolling_std(returns, short_window)[-1]) * 100
+
+    if count >= short_window:
+        stats["sma_short"] = float(rolling_mean(prices, short_window)[-1])
+    if count >= long_window:
+        stats["sma_long"] = float(rolling_mean(prices, long_window)[-1])
+
+    if count > breakout_window:
+        following = prices[breakout_window:]
+        ups = np.flatnonzero(following > rolling_extreme(prices[:-1], breakout_window, np.maximum))
+        downs = np.flatnonzero(following < rolling_extreme(prices[:-1], breakout_window, np.minimum))
+        stats["breakouts_up"] = len(ups)
+        stats["breakouts_down"] = len(downs)
+        last_up = ups[-1] if len(ups) else -1
+        last_down = downs[-1] if len(downs) else -1
+        if max(last_up, last_down) >= 0:
+            index = max(last_up, last_down) + breakout_window
+            stats["last_breakout"] = {
+                "direction": "up" if last_up > last_down else "down",
+                "price": float(prices[index]),
+                "time": float(timestamps[index])
+            }
+
+    # Plain floats so the stats can be formatted and serialized
+    return {
+        key: float(value) if isinstance(value, np.floating) else value
+        for key, value in stats.items()
+    }
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%H:%M UTC')
+
+def format_price_summary(stats):
+    """Compact text summary of compute_price_stats output for the prompt"""
+    if not stats:
+        return "No price data available.\n"
+
+    lines = [
+        f"- Samples: {stats['samples']} from {format_time(stats['start_time'])} to {format_time(stats['end_time'])}",
+        f"- Latest: ${stats['last']:,.2f} (open ${stats['first']:,.2f}, change {stats['change']:+,.2f} / {stats['change_pct']:+.2f}%)",
+        f"- Range: low ${stats['low']:,.2f} at {format_time(stats['low_time'])}, high ${stats['high']:,.2f} at {format_time(stats['high_time'])}",
+        f"- Max drawdown: {stats['max_drawdown_pct']:.2f}%"
+    ]
+    if stats['volatility_pct'] is not None:
+        line = f"- Volatility per sample: {stats['volatility_pct']:.3f}%"
+        if stats['rolling_volatility_pct'] is not None:
+            line += f" (recent {stats['rolling_volatility_pct']:.3f}%)"
+        lines.append(line)
+    if stats['sma_short'] is not None:
+        line = f"- Moving averages: short ${stats['sma_short']:,.2f}"
+        if stats['sma_long'] is not None:
+            line += f", long ${stats['sma_long']:,.2f}"
+        lines.append(line)
+    if stats['breakouts_up'] or stats['breakouts_down']:
+        breakout = stats['last_breakout']
+        lines.append(
+            f"- Breakouts: {stats['breakouts_up']} up, {stats['breakouts_down']} down; "
+            f"last {breakout['direction']} at ${breakout['price']:,.2f} ({format_time(breakout['time'])})"
+        )
+    return "\n".join(lines) + "\n"
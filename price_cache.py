@@ -0,0 +1,101 @@
+import os
+import time
+import numpy as np
+from datetime import datetime, timezone
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+class PriceHistoryCache:
+    """Local columnar cache of btc_price rows for the current UTC day
+
+    Timestamps and prices are kept in two NumPy arrays and saved to an .npz
+    file. Each update only asks the database for rows newer than the last
+    cached timestamp (minus a small overlap for rows that land late), drops
+    rows from before UTC midnight, and falls back to a full resync when the
+    cache is empty or hasn't been updated for max_gap_seconds.
+    """
+
+    def __init__(self, path='cache/btc_price.npz', overlap_seconds=120, max_gap_seconds=3600):
+        self.path = path
+        self.overlap_seconds = overlap_seconds
+        self.max_gap_seconds = max_gap_seconds
+        self.timestamps = np.empty(0, dtype=np.float64)
+        self.prices = np.empty(0, dtype=np.float64)
+        self.updated_at = 0.0
+        self.stats = {"full_syncs": 0, "delta_syncs": 0, "rows_fetched": 0}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                self.timestamps = data['timestamps']
+                self.prices = data['prices']
+                self.updated_at = float(data['updated_at'])
+        except Exception as e:
+            print(f"Error loading price cache, starting empty: {e}")
+
+    def save(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp.npz'
+            np.savez(tmp_path, timestamps=self.timestamps, prices=self.prices,
+                     updated_at=np.float64(self.updated_at))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving price cache: {e}")
+
+    def evict_before(self, timestamp):
+        keep = self.timestamps >= timestamp
+        self.timestamps = self.timestamps[keep]
+        self.prices = self.prices[keep]
+
+    def merge(self, rows):
+        if not rows:
+            return
+        timestamps = np.fromiter((parse_timestamp(row['created_at']) for row in rows), dtype=np.float64, count=len(rows))
+        prices = np.fromiter((row['price'] for row in rows), dtype=np.float64, count=len(rows))
+        timestamps = np.concatenate([self.timestamps, timestamps])
+        prices = np.concatenate([self.prices, prices])
+        # Sort by time and drop rows fetched twice because of the overlap
+        timestamps, index = np.unique(timestamps, return_index=True)
+        self.timestamps = timestamps
+        self.prices = prices[index]
+
+    def update(self, fetch_rows_since, window_start=None):
+        """Bring the cache up to date and return it as btc_price-style rows
+
+        fetch_rows_since(iso_timestamp) must return the rows with created_at
+        at or after the timestamp.
+        """
+        if window_start is None:
+            window_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+        self.evict_before(window_start)
+        now = time.time()
+        if not len(self.timestamps) or now - self.updated_at > self.max_gap_seconds:
+            since = window_start
+            self.timestamps = self.timestamps[:0]
+            self.prices = self.prices[:0]
+            self.stats['full_syncs'] += 1
+        else:
+            since = max(window_start, self.timestamps[-1] - self.overlap_seconds)
+            self.stats['delta_syncs'] += 1
+
+        rows = fetch_rows_since(datetime.fromtimestamp(since, timezone.utc).isoformat())
+        self.stats['rows_fetched'] += len(rows)
+        self.merge(rows)
+        self.updated_at = now
+        self.save()
+        return self.rows()
+
+    def rows(self):
+        """Cached rows as dicts with price and created_at, newest first"""
+        return [
+            {"price": float(price), "created_at": datetime.fromtimestamp(timestamp, timezone.utc).isoformat()}
+            for timestamp, price in zip(self.timestamps[::-1].tolist(), self.prices[::-1].tolist())
+        ]
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import threading
+from array import array
+from datetime import datetime, timezone
+
+class RingBuffer:
+    """Fixed-capacity buffer of (timestamp, price) samples backed by arrays"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.prices = array('d', bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, price):
+        with self.lock:
+            index = (self.start + self.size) % self.capacity
+            self.timestamps[index] = timestamp
+            self.prices[index] = price
+            if self.size < self.capacity:
+                self.size += 1
+            else:
+                self.start = (self.start + 1) % self.capacity
+
+    def since(self, timestamp):
+        """Samples at or after the given unix timestamp, oldest first"""
+        with self.lock:
+            samples = []
+            for i in range(self.size):
+                index = (self.start + i) % self.capacity
+                if self.timestamps[index] >= timestamp:
+                    samples.append((self.timestamps[index], self.prices[index]))
+            return samples
+
+    def __len__(self):
+        return self.size
+
+class WriteAheadLog:
+    """Append-only file of closed bars that haven't been flushed yet"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def append(self, bar):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(bar) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        bars = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    bars.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+        return bars
+
+    def clear(self):
+        with open(self.path, 'w') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+class PriceSampler:
+    """Polls a price at a sub-minute interval and flushes aggregated bars
+
+    Samples go into an in-memory ring buffer and are folded into bars of
+    bar_seconds. Each closed bar is written to the write-ahead log straight
+    away and the log is flushed with store_bars every flush_seconds, so a
+    crash only loses the bar still being built. store_bars must be
+    idempotent on period_start because a crash between storing and clearing
+    the log replays those bars.
+    """
+
+    def __init__(self, fetch_price, store_bars, sample_seconds=15, bar_seconds=60,
+                 flush_seconds=300, buffer_seconds=86400, wal_path='cache/price_bars.wal'):
+        self.fetch_price = fetch_price
+        self.store_bars = store_bars
+        self.sample_seconds = sample_seconds
+        self.bar_seconds = bar_seconds
+        self.flush_seconds = flush_seconds
+        self.buffer = RingBuffer(max(1, int(buffer_seconds / sample_seconds)))
+        self.wal = WriteAheadLog(wal_path)
+        self.bar = None
+        self.last_flush = time.monotonic()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def add_sample(self, timestamp, price):
+        self.buffer.append(timestamp, price)
+
+        period_start = timestamp - timestamp % self.bar_seconds
+        if self.bar and self.bar['start'] != period_start:
+            self.wal.append(self.close_bar())
+        if not self.bar:
+            self.bar = {
+                "start": period_start, "open": price, "high": price, "low": price,
+                "close": price, "last_time": timestamp, "weighted_sum": 0.0,
+                "weight": 0.0, "samples": 0
+            }
+
+        bar = self.bar
+        # Time-weight each price by how long it was the latest observation
+        elapsed = timestamp - bar['last_time']
+        if elapsed > 0:
+            bar['weighted_sum'] += bar['close'] * elapsed
+            bar['weight'] += elapsed
+        bar['high'] = max(bar['high'], price)
+        bar['low'] = min(bar['low'], price)
+        bar['close'] = price
+        bar['last_time'] = timestamp
+        bar['samples'] += 1
+
+    def close_bar(self):
+        bar, self.bar = self.bar, None
+        # The closing price holds until the end of the period
+        remaining = bar['start'] + self.bar_seconds - bar['last_time']
+        if remaining > 0:
+            bar['weighted_sum'] += bar['close'] * remaining
+            bar['weight'] += remaining
+        average = bar['weighted_sum'] / bar['weight'] if bar['weight'] else bar['close']
+        return {
+            "period_start": datetime.fromtimestamp(bar['start'], timezone.utc).isoformat(),
+            "period_seconds": self.bar_seconds,
+            "open": bar['open'],
+            "high": bar['high'],
+            "low": bar['low'],
+            "close": bar['close'],
+            "twap": average,
+            "samples": bar['samples']
+        }
+
+    def flush(self):
+        """Store every bar in the write-ahead log with one call"""
+        bars = self.wal.read()
+        self.last_flush = time.monotonic()
+        if not bars:
+            return 0
+        try:
+            self.store_bars(bars)
+        except Exception as e:
+            print(f"Error flushing price bars, will retry: {e}")
+            return 0
+        self.wal.clear()
+        print(f"Flushed {len(bars)} price bars")
+        return len(bars)
+
+    def sample_once(self):
+        try:
+            price = self.fetch_price()
+        except Exception as e:
+            print(f"Error sampling price: {e}")
+            return None
+        if price is not None:
+            self.add_sample(time.time(), price)
+        if time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+        return price
+
+    def recent(self, seconds):
+        """Samples from the last `seconds` as btc_price-style rows, newest first"""
+        samples = self.buffer.since(time.time() - seconds)
+        return [
+            {"price": price, "created_at": datetime.fromtimestamp(timestamp, timezone.utc).isoformat()}
+            for timestamp, price in reversed(samples)
+        ]
+
+    def run(self):
+        """Sample until stopped, on a fixed monotonic cadence"""
+        # Bars left over from a previous crash go out first
+        self.flush()
+        next_time = time.monotonic()
+        while not self.stop_event.is_set():
+            self.sample_once()
+            next_time += self.sample_seconds
+            self.stop_event.wait(max(0, next_time - time.monotonic()))
+        if self.bar:
+            self.wal.append(self.close_bar())
+        self.flush()
+
+    def start(self):
+        global active_sampler
+        self.thread = threading.Thread(target=self.run, name='price-sampler', daemon=True)
+        self.thread.start()
+        active_sampler = self
+        return self
+
+    def stop(self):
+        global active_sampler
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        if active_sampler is self:
+            active_sampler = None
+
+# Sampler running in this process, if any, so other stages can read its buffer
+active_sampler = None
@@ -0,0 +1,132 @@
+import os
+import numpy as np
+from datetime import datetime, timezone
+
+# Input token budget for the analysis prompt (system + user message)
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '1500'))
+
+_encoding = None
+_tiktoken_unavailable = False
+
+def get_encoding():
+    """The gpt-4 encoding, or None without tiktoken (imported on first use)"""
+    global _encoding, _tiktoken_unavailable
+    if _encoding is None and not _tiktoken_unavailable:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model('gpt-4')
+        except ImportError:
+            _tiktoken_unavailable = True
+        except Exception as e:
+            # The encoding is downloaded on first use, so fall back when offline
+            print(f"Error loading tiktoken encoding, estimating tokens instead: {e}")
+            _tiktoken_unavailable = True
+    return _encoding
+
+def count_tokens(text):
+    """Token count with tiktoken, or a ~4 characters per token estimate without it"""
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def truncate_tokens(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens - 1]).rstrip() + '…'
+    return text[:max(0, max_tokens * 4 - 1)].rstrip() + '…'
+
+def lttb(x, y, threshold):
+    """Largest-triangle-three-buckets downsampling, returns the kept indices
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket.
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = count - 1
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else count
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        indices[i + 1] = previous
+    return indices
+
+def format_series_point(timestamp, price):
+    return f"- {datetime.fromtimestamp(timestamp, timezone.utc).strftime('%H:%M')} ${price:,.2f}\n"
+
+def build_analysis_context(price_summary, timestamps, prices, news_items, reserved_tokens=0,
+                           token_budget=None, news_share=0.6, max_news_item_tokens=120):
+    """Assemble the analysis context within a token budget
+
+    The price summary is always included. Of the tokens left after
+    reserved_tokens (system prompt and framing), up to news_share goes to
+    news, in the given order (most useful first) and each truncated to
+    max_news_item_tokens, and the rest to the price series, downsampled with
+    LTTB to as many points as fit. news_items are eco_info rows. Returns
+    (context, report).
+    """
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    report = {"budget": token_budget, "reserved_tokens": reserved_tokens}
+
+    context = "Bitcoin Price Summary (today):\n" + price_summary
+    report['summary_tokens'] = count_tokens(context)
+    remaining = token_budget - reserved_tokens - report['summary_tokens']
+
+    # News in priority order until its share of the budget is used
+    news_section = ""
+    news_budget = int(max(remaining, 0) * news_share)
+    ranked = list(news_items)
+    header = "\nRecent Financial News:\n"
+    used = count_tokens(header)
+    included = 0
+    for news in ranked:
+        line = f"- {truncate_tokens(news['finance_info'], max_news_item_tokens)}\n"
+        line_tokens = count_tokens(line)
+        if used + line_tokens > news_budget:
+            break
+        news_section += line
+        used += line_tokens
+        included += 1
+    if included:
+        news_section = header + news_section
+    report['news_items'] = included
+    report['news_dropped'] = len(ranked) - included
+    report['news_tokens'] = count_tokens(news_section) if included else 0
+    remaining -= report['news_tokens']
+
+    # Price series, downsampled to the points that still fit
+    series_section = ""
+    series_header = "\nPrice Series (UTC):\n"
+    if len(prices) and remaining > 0:
+        point_tokens = count_tokens(format_series_point(timestamps[-1], prices[-1]))
+        max_points = (remaining - count_tokens(series_header)) // point_tokens
+        if max_points >= min(3, len(prices)):
+            kept = lttb(timestamps, prices, max_points)
+            series_section = series_header + "".join(
+                format_series_point(timestamps[i], prices[i]) for i in kept
+            )
+            report['series_points'] = len(kept)
+    report.setdefault('series_points', 0)
+    report['series_source_points'] = len(prices)
+    report['series_tokens'] = count_tokens(series_section) if series_section else 0
+
+    context += series_section + news_section
+    report['total_tokens'] = reserved_tokens + report['summary_tokens'] + report['series_tokens'] + report['news_tokens']
+    return context, report
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+from io import BytesIO
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from email.generator import BytesGenerator
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from smtp_pool import RawMessage
+from metrics import inc, bind_context
+
+# Subscribers with their own timezone and detail level; without the file the
+# report goes to EMAIL_RECIPIENTS with the defaults below
+REPORT_SUBSCRIBERS_FILE = os.getenv('REPORT_SUBSCRIBERS_FILE', 'subscribers.json')
+REPORT_DEFAULT_TIMEZONE = os.getenv('REPORT_DEFAULT_TIMEZONE', 'UTC')
+REPORT_DEFAULT_DETAIL = os.getenv('REPORT_DEFAULT_DETAIL', 'full')
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '4'))
+
+# full: the whole analysis with a price snapshot in local time
+# brief: the snapshot and the analysis' key paragraph
+DETAIL_LEVELS = ('full', 'brief')
+
+def valid_timezone(name):
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+def make_subscriber(email, timezone_name=None, detail=None):
+    """Subscriber dict with defaults filled in and unknown settings replaced"""
+    timezone_name = timezone_name or REPORT_DEFAULT_TIMEZONE
+    detail = detail or REPORT_DEFAULT_DETAIL
+    if not valid_timezone(timezone_name):
+        print(f"Unknown timezone {timezone_name!r} for {email}, using UTC")
+        timezone_name = 'UTC'
+    if detail not in DETAIL_LEVELS:
+        print(f"Unknown detail level {detail!r} for {email}, using full")
+        detail = 'full'
+    return {"email": email, "timezone": timezone_name, "detail": detail}
+
+def load_subscribers(path=REPORT_SUBSCRIBERS_FILE, default_recipients=()):
+    """Subscribers from the JSON file, or default_recipients when it doesn't exist
+
+    The file holds a list of {"email", "timezone", "detail"} objects; only
+    email is required.
+    """
+    if not path or not os.path.exists(path):
+        return [make_subscriber(email) for email in default_recipients]
+    with open(path) as f:
+        entries = json.load(f)
+    return [
+        make_subscriber(entry['email'], entry.get('timezone'), entry.get('detail'))
+        for entry in entries
+        if entry.get('email')
+    ]
+
+def segment_key(subscriber):
+    """Subscribers with the same key get the same message body"""
+    return subscriber['detail'], subscriber['timezone']
+
+def build_report(content, stats):
+    """Shared part of the tick's report: subject, analysis body and price stats"""
+    parts = content.split('\n', 1)
+    return {
+        "subject": parts[0].replace("Subject:", "").strip(),
+        "body": parts[1].strip() if len(parts) > 1 else "",
+        "stats": stats,
+        "generated_at": time.time()
+    }
+
+def format_local_time(timestamp, timezone_name):
+    return datetime.fromtimestamp(timestamp, ZoneInfo(timezone_name)).strftime('%H:%M %Z')
+
+def price_snapshot(stats, timezone_name):
+    if not stats:
+        return ""
+    return (
+        f"Bitcoin at {format_local_time(stats['end_time'], timezone_name)}: ${stats['last']:,.2f} "
+        f"({stats['change_pct']:+.2f}% today)\n"
+        f"Range: low ${stats['low']:,.2f} at {format_local_time(stats['low_time'], timezone_name)}, "
+        f"high ${stats['high']:,.2f} at {format_local_time(stats['high_time'], timezone_name)}"
+    )
+
+def key_paragraph(body):
+    """The first substantial paragraph of the analysis, skipping the greeting"""
+    paragraphs = [paragraph.strip() for paragraph in body.split('\n\n') if paragraph.strip()]
+    for paragraph in paragraphs:
+        if len(paragraph) >= 80 and not paragraph.startswith("Best Regards,"):
+            return paragraph
+    return paragraphs[0] if paragraphs else ""
+
+def render_variant(report, detail, timezone_name):
+    """Message body for one segment"""
+    snapshot = price_snapshot(report['stats'], timezone_name)
+    if detail == 'brief':
+        body = report['body']
+        closing = body[body.index("Best Regards,"):] if "Best Regards," in body else ""
+        sections = [snapshot, key_paragraph(body), closing]
+    else:
+        sections = [report['body'], snapshot]
+    return "\n\n".join(section for section in sections if section)
+
+def flatten(message):
+    """Serialize a message the way smtplib's send_message does"""
+    buffer = BytesIO()
+    BytesGenerator(buffer).flatten(message, linesep='\r\n')
+    return buffer.getvalue()
+
+def build_messages(report, subscribers, sender, attachments=(), workers=REPORT_WORKERS):
+    """One RawMessage per subscriber, with each segment's body rendered once
+
+    Segments are rendered in a thread pool. Each segment's body and the
+    attachments are serialized once, and only the From/To/Subject headers
+    are built per subscriber. Serializing a large attachment for every
+    message would otherwise cost far more than rendering. Returns
+    (messages, stats).
+    """
+    start = time.perf_counter()
+    segments = {}
+    for subscriber in subscribers:
+        segments.setdefault(segment_key(subscriber), []).append(subscriber['email'])
+
+    def build_segment(key, recipients):
+        body = MIMEMultipart()
+        body.attach(MIMEText(render_variant(report, *key), "plain"))
+        for attachment in attachments:
+            body.attach(attachment)
+        shared = flatten(body)
+        messages = []
+        for recipient in recipients:
+            headers = Message()
+            headers["From"] = f"Finance Agent <{sender}>"
+            headers["To"] = recipient
+            headers["Subject"] = report['subject']
+            # The header block ends with a blank line, the shared part starts
+            # with its own Content-Type header
+            messages.append(RawMessage(sender, recipient, flatten(headers).rstrip(b'\r\n') + b'\r\n', shared))
+        return messages
+
+    messages = []
+    if segments:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(segments))), thread_name_prefix='report') as pool:
+            futures = [pool.submit(bind_context(build_segment), key, recipients) for key, recipients in segments.items()]
+            for future in futures:
+                messages.extend(future.result())
+
+    seconds = time.perf_counter() - start
+    inc('report_variants_total', len(segments), result='rendered')
+    inc('report_variants_total', len(subscribers) - len(segments), result='shared')
+    stats = {
+        "subscribers": len(subscribers),
+        "segments": len(segments),
+        "deduplicated": len(subscribers) - len(segments),
+        "build_seconds": seconds,
+        "build_subscribers_per_second": len(subscribers) / seconds if seconds > 0 else 0.0
+    }
+    return messages, stats
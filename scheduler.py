@@ -1,10 +1,40 @@
-import schedule
 import time
 import subprocess
 import logging
 import os
 import sys
+import asyncio
 from datetime import datetime
+from config import load_config, get_supabase
+
+# Load environment variables before the helper modules below read their settings
+load_config()
+
+from job_scheduler import JobScheduler
+import local_store
+from metrics import stage, start_metrics_server, configure_trace_log, METRICS_HOST, METRICS_PORT
+
+# "inprocess" keeps the agents imported and their clients alive between ticks,
+# "subprocess" starts a fresh interpreter per agent like before
+RUN_MODE = os.getenv('SCHEDULER_MODE', 'inprocess')
+
+# "jobs" gives every agent its own cadence, "pipeline" runs price, news and
+# then email together every PIPELINE_INTERVAL_SECONDS
+SCHEDULER_CADENCE = os.getenv('SCHEDULER_CADENCE', 'jobs')
+
+# Job intervals in seconds
+PRICE_INTERVAL = float(os.getenv('PRICE_INTERVAL_SECONDS', '60'))
+NEWS_INTERVAL = float(os.getenv('NEWS_INTERVAL_SECONDS', '900'))
+EMAIL_INTERVAL = float(os.getenv('EMAIL_INTERVAL_SECONDS', '300'))
+PIPELINE_INTERVAL = float(os.getenv('PIPELINE_INTERVAL_SECONDS', '600'))
+STATUS_INTERVAL = float(os.getenv('STATUS_INTERVAL_SECONDS', '300'))
+
+# Random delay added to each run so jobs don't fire in lockstep
+JOB_JITTER = float(os.getenv('JOB_JITTER_SECONDS', '5'))
+
+def job_deadline(name, interval):
+    """Per-job deadline in seconds, 90% of the interval unless overridden"""
+    return float(os.getenv(f'{name.upper()}_DEADLINE_SECONDS', interval * 0.9))
 
 # Create logs directory if it doesn't exist
 if not os.path.exists('logs'):
@@ -39,50 +69,222 @@ except Exception as e:
     print(f"Error setting up logging: {e}")
     raise
 
-def run_agents():
+def run_agents_subprocess(deadline=None):
+    """Run the agents one after another, killing any still running at the deadline (seconds)"""
+    end = time.monotonic() + deadline if deadline else None
+    
+    def remaining():
+        # The time left for the next agent, None without a deadline
+        if end is None:
+            return None
+        return max(end - time.monotonic(), 0.001)
+    
     try:
         # Log start time
         logging.info("Starting agent sequence...")
         
         # Run btc_agent.py
         logging.info("Running BTC agent...")
-        result = subprocess.run(['python', 'btc_agent.py'], check=True)
-        if result.returncode == 0:
-            logging.info("BTC agent completed successfully")
+        with stage("BTC agent"):
+            run_agent_subprocess('btc_agent.py', remaining())
+        logging.info("BTC agent completed successfully")
         
         # Run info_agent.py
         logging.info("Running Info agent...")
-        result = subprocess.run(['python', 'info_agent.py'], check=True)
-        if result.returncode == 0:
-            logging.info("Info agent completed successfully")
+        with stage("Info agent"):
+            run_agent_subprocess('info_agent.py', remaining())
+        logging.info("Info agent completed successfully")
         
         # Run email_agent.py
         logging.info("Running Email agent...")
-        result = subprocess.run(['python', 'email_agent.py'], check=True)
-        if result.returncode == 0:
-            logging.info("Email agent completed successfully")
+        with stage("Email agent"):
+            run_agent_subprocess('email_agent.py', remaining())
+        logging.info("Email agent completed successfully")
         
         logging.info("All agents completed successfully\n")
         
+    except subprocess.TimeoutExpired as e:
+        logging.error(f"Agent sequence hit its {deadline:g}s deadline, killed {e.cmd[-1]}")
     except subprocess.CalledProcessError as e:
         logging.error(f"Error running agents: {str(e)}")
     except Exception as e:
         logging.error(f"Unexpected error: {str(e)}")
 
+# Agent modules, event loop and local store syncer shared by every in-process tick
+_agents = None
+_loop = None
+_syncer = None
+
+def load_agents():
+    """Import the agent modules once so their clients are reused across ticks"""
+    global _agents, _syncer
+    if _agents is None:
+        # Charts are rendered off the main thread, so never pick a GUI backend
+        os.environ.setdefault('MPLBACKEND', 'Agg')
+        with stage('agents.import'):
+            import btc_agent
+            import info_agent
+            import email_agent
+        _agents = (btc_agent, info_agent, email_agent)
+        
+        if btc_agent.PRICE_SAMPLE_SECONDS > 0:
+            btc_agent.create_price_sampler().start()
+            logging.info(f"Price sampler started ({btc_agent.PRICE_SAMPLE_SECONDS}s samples)")
+        
+        # Push locally written prices and news to Supabase in the background
+        if local_store.LOCAL_STORE_ENABLED:
+            _syncer = local_store.StoreSyncer(local_store.get_local_store(), get_supabase()).start()
+            logging.info(f"Local store sync started (every {_syncer.interval:.0f}s)")
+    return _agents
+
+async def run_stage(name, func):
+    """Run a blocking agent function in a worker thread, timed as a stage"""
+    logging.info(f"Running {name}...")
+    try:
+        with stage(name):
+            result = await asyncio.to_thread(func)
+        logging.info(f"{name} completed")
+        return result
+    except Exception as e:
+        logging.error(f"{name} failed: {str(e)}")
+        return None
+
+async def run_pipeline():
+    """Collect price and news concurrently, then run the email agent"""
+    btc_agent, info_agent, email_agent = load_agents()
+    
+    stages = [
+        run_stage("BTC agent", btc_agent.get_and_store_btc_price),
+        run_stage("Info agent", info_agent.get_finance_news)
+    ]
+    if btc_agent.PRICE_WATCHLIST:
+        stages.append(run_stage("Watchlist prices", btc_agent.collect_watchlist_prices))
+    await asyncio.gather(*stages)
+    await run_stage("Email agent", email_agent.run_email_agent)
+
+def run_agents_in_process():
+    global _loop
+    try:
+        logging.info("Starting agent sequence (in-process)...")
+        
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+        _loop.run_until_complete(run_pipeline())
+        
+        from http_client import get_http_client
+        from llm_cache import get_llm_cache
+        logging.info(f"HTTP client: {get_http_client().stats()}")
+        llm_cache = get_llm_cache()
+        logging.info(f"LLM cache: {llm_cache.stats}, hit rate {llm_cache.hit_rate():.0%}")
+        logging.info("All agents completed\n")
+        
+    except Exception as e:
+        logging.error(f"Unexpected error: {str(e)}")
+
+def run_agents(deadline=None):
+    global RUN_MODE
+    if RUN_MODE == 'subprocess':
+        run_agents_subprocess(deadline)
+        return
+    
+    try:
+        load_agents()
+    except Exception as e:
+        # Fall back to the subprocess mode if the agents can't be imported here
+        logging.error(f"Could not load agents in-process, falling back to subprocesses: {str(e)}")
+        RUN_MODE = 'subprocess'
+        run_agents_subprocess(deadline)
+        return
+    
+    run_agents_in_process()
+
+def run_agent_subprocess(script, timeout):
+    """Run one agent script in its own interpreter, killed after timeout seconds"""
+    subprocess.run(['python', script], check=True, timeout=timeout)
+
+def log_status(scheduler):
+    """Log scheduling health and shared client statistics"""
+    for name, stats in scheduler.status().items():
+        logging.info(f"Job {name}: {stats}")
+    if RUN_MODE != 'subprocess':
+        from http_client import get_http_client
+        from llm_cache import get_llm_cache
+        logging.info(f"HTTP client: {get_http_client().stats()}")
+        llm_cache = get_llm_cache()
+        logging.info(f"LLM cache: {llm_cache.stats}, hit rate {llm_cache.hit_rate():.0%}")
+    if _syncer:
+        logging.info(f"Local store sync: {_syncer.stats}, backlog {_syncer.store.backlog()}")
+
+def build_scheduler():
+    """Create the job scheduler for the configured cadence and run mode"""
+    global RUN_MODE
+    scheduler = JobScheduler()
+    
+    if SCHEDULER_CADENCE == 'pipeline':
+        pipeline_deadline = job_deadline('pipeline', PIPELINE_INTERVAL)
+        # In subprocess mode the agents are killed at the deadline
+        scheduler.add_job('pipeline', lambda: run_agents(pipeline_deadline), PIPELINE_INTERVAL,
+                          pipeline_deadline, JOB_JITTER)
+        scheduler.add_job('status', lambda: log_status(scheduler), STATUS_INTERVAL)
+        return scheduler
+    
+    if RUN_MODE != 'subprocess':
+        try:
+            btc_agent, info_agent, email_agent = load_agents()
+        except Exception as e:
+            # Fall back to the subprocess mode if the agents can't be imported here
+            logging.error(f"Could not load agents in-process, falling back to subprocesses: {str(e)}")
+            RUN_MODE = 'subprocess'
+    
+    price_deadline = job_deadline('price', PRICE_INTERVAL)
+    news_deadline = job_deadline('news', NEWS_INTERVAL)
+    email_deadline = job_deadline('email', EMAIL_INTERVAL)
+    
+    if RUN_MODE == 'subprocess':
+        # Subprocesses are killed at the deadline
+        # btc_agent.py also collects the watchlist when one is configured
+        scheduler.add_job('price', lambda: run_agent_subprocess('btc_agent.py', price_deadline),
+                          PRICE_INTERVAL, price_deadline, JOB_JITTER)
+        scheduler.add_job('news', lambda: run_agent_subprocess('info_agent.py', news_deadline),
+                          NEWS_INTERVAL, news_deadline, JOB_JITTER)
+        scheduler.add_job('email', lambda: run_agent_subprocess('email_agent.py', email_deadline),
+                          EMAIL_INTERVAL, email_deadline, JOB_JITTER)
+    else:
+        scheduler.add_job('price', btc_agent.get_and_store_btc_price, PRICE_INTERVAL, price_deadline, JOB_JITTER)
+        if btc_agent.PRICE_WATCHLIST:
+            scheduler.add_job('watchlist', btc_agent.collect_watchlist_prices, PRICE_INTERVAL, price_deadline, JOB_JITTER)
+        scheduler.add_job('news', info_agent.get_finance_news, NEWS_INTERVAL, news_deadline, JOB_JITTER)
+        scheduler.add_job('email', email_agent.run_email_agent, EMAIL_INTERVAL, email_deadline, JOB_JITTER)
+    
+    scheduler.add_job('status', lambda: log_status(scheduler), STATUS_INTERVAL)
+    return scheduler
+
 def main():
-    logging.info("Scheduler started")
-    print("Scheduler started - Check logs/crypto_agents.log for details")
+    global RUN_MODE
+    if '--subprocess' in sys.argv:
+        RUN_MODE = 'subprocess'
     
-    # Schedule the job every 10 minutes
-    schedule.every(10).minutes.do(run_agents)
+    logging.info(f"Scheduler started ({RUN_MODE} mode, {SCHEDULER_CADENCE} cadence)")
     
-    # Run once immediately on startup
-    run_agents()
+    # Prometheus endpoint and JSON span log
+    try:
+        if start_metrics_server():
+            logging.info(f"Metrics served at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        logging.error(f"Could not start the metrics endpoint: {str(e)}")
+    if configure_trace_log():
+        logging.info("Writing spans to the trace log")
+    print("Scheduler started - Check logs/crypto_agents.log for details")
     
-    # Keep the script running
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    scheduler = build_scheduler()
+    for job in scheduler.jobs:
+        logging.info(f"Job {job.name}: every {job.interval:.0f}s, deadline {job.deadline or 0:.0f}s")
+    
+    # Runs every job once immediately, then keeps the script running
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        logging.info("Scheduler stopped")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
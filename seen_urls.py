@@ -0,0 +1,128 @@
+import os
+import json
+import math
+import base64
+import hashlib
+from collections import OrderedDict
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "count": self.count,
+            "bits": base64.b64encode(bytes(self.bits)).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls(data['capacity'], data['error_rate'])
+        bloom.bits = bytearray(base64.b64decode(data['bits']))
+        bloom.count = data['count']
+        return bloom
+
+class SeenUrlIndex:
+    """Local index of URLs already stored in eco_info
+
+    An exact LRU of recent URLs answers the common "already stored" case, and a
+    bloom filter over every stored URL tells us which URLs are certainly new.
+    Only URLs the bloom filter has seen but the LRU no longer holds need to be
+    confirmed against Supabase.
+    """
+
+    def __init__(self, path='cache/seen_urls.json', capacity=100000, error_rate=0.001, lru_size=5000):
+        self.path = path
+        self.lru_size = lru_size
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.lru = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "lookups": 0, "false_positives": 0}
+
+    def load(self):
+        """Load the index from disk, returns False if there is nothing to load"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.bloom = BloomFilter.from_dict(data['bloom'])
+            self.lru = OrderedDict((url, None) for url in data['lru'][-self.lru_size:])
+            return True
+        except Exception as e:
+            print(f"Error loading seen URL index: {e}")
+            return False
+
+    def save(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({"bloom": self.bloom.to_dict(), "lru": list(self.lru)}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving seen URL index: {e}")
+
+    def rebuild(self, urls):
+        """Reset the index from the full list of stored URLs"""
+        urls = list(urls)
+        capacity = max(self.bloom.capacity, len(urls) * 2)
+        self.bloom = BloomFilter(capacity, self.bloom.error_rate)
+        self.lru = OrderedDict()
+        self.add(urls)
+
+    def add(self, urls):
+        for url in urls:
+            if url not in self.lru:
+                self.bloom.add(url)
+            self.lru[url] = None
+            self.lru.move_to_end(url)
+        while len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def classify(self, urls):
+        """Split URLs into (seen, unsure, new)
+
+        seen URLs are known to be stored, new URLs are known not to be, and
+        unsure URLs have to be checked against the database.
+        """
+        seen, unsure, new = [], [], []
+        for url in urls:
+            if url in self.lru:
+                self.lru.move_to_end(url)
+                seen.append(url)
+            elif url in self.bloom:
+                unsure.append(url)
+            else:
+                new.append(url)
+        self.stats['hits'] += len(seen)
+        self.stats['misses'] += len(new)
+        self.stats['lookups'] += len(unsure)
+        return seen, unsure, new
+
+    def record_false_positives(self, count):
+        self.stats['false_positives'] += count
@@ -0,0 +1,231 @@
+import os
+import ssl
+import time
+import queue
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import RateLimiter
+from metrics import external_call, inc, bind_context
+
+# SMTP server settings, point these at a local stand-in for testing, e.g.
+# python -m aiosmtpd -n -l localhost:1025 with SMTP_USE_SSL=false
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '465'))
+SMTP_USE_SSL = os.getenv('SMTP_USE_SSL', 'true').lower() == 'true'
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'false').lower() == 'true'
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+SMTP_RATE_LIMIT = float(os.getenv('SMTP_RATE_LIMIT', '5'))  # messages per second, 0 disables
+SMTP_MAX_MESSAGES_PER_SESSION = int(os.getenv('SMTP_MAX_MESSAGES_PER_SESSION', '100'))
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '30'))
+
+class RawMessage:
+    """A message serialized ahead of time, sent with sendmail as is
+
+    Lets a fan-out flatten a body and attachments shared by many recipients
+    once instead of once per message: only the per-recipient header block is
+    stored per message and joined with the shared body at send time. Both
+    must use CRLF line endings.
+    """
+    __slots__ = ('sender', 'recipient', 'headers', 'body')
+
+    def __init__(self, sender, recipient, headers, body):
+        self.sender = sender
+        self.recipient = recipient
+        self.headers = headers
+        self.body = body
+
+    def __getitem__(self, name):
+        return {"From": self.sender, "To": self.recipient}.get(name)
+
+    def as_bytes(self):
+        return self.headers + self.body
+
+class DataTracking:
+    """Remembers whether the current message reached DATA
+
+    Once DATA is sent the server may have accepted the message even if the
+    reply never arrives, so a failed send can't safely be retried.
+    """
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+class TrackedSMTP(DataTracking, smtplib.SMTP):
+    pass
+
+class TrackedSMTP_SSL(DataTracking, smtplib.SMTP_SSL):
+    pass
+
+class SMTPSession:
+    """One authenticated SMTP connection that reconnects when it goes stale"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.server = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    def connect(self):
+        self.close()
+        engine = self.engine
+        if engine.use_ssl:
+            server = TrackedSMTP_SSL(engine.host, engine.port, timeout=engine.timeout,
+                                      context=ssl.create_default_context())
+        else:
+            server = TrackedSMTP(engine.host, engine.port, timeout=engine.timeout)
+            if engine.starttls:
+                server.starttls(context=ssl.create_default_context())
+        if engine.password:
+            server.login(engine.username, engine.password)
+        self.server = server
+        self.sent = 0
+        engine._count('sessions_opened')
+
+    def ensure_connected(self):
+        """Reuse the connection if it still answers NOOP, otherwise reconnect
+
+        Sessions used within the last idle_check_seconds are trusted without
+        a NOOP so back-to-back messages don't pay an extra round trip.
+        """
+        if self.server is not None and self.sent < self.engine.max_messages_per_session:
+            if time.monotonic() - self.last_used < self.engine.idle_check_seconds:
+                return
+            try:
+                if self.server.noop()[0] == 250:
+                    return
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.engine._count('reconnects')
+        self.connect()
+
+    def _transmit(self, message):
+        self.server.data_started = False
+        if isinstance(message, RawMessage):
+            self.server.sendmail(message.sender, [message.recipient], message.as_bytes())
+        else:
+            self.server.send_message(message)
+
+    def send(self, message):
+        """Send one message, retrying once on a fresh connection if that's safe
+
+        Only failures before DATA are retried: connecting or logging in, the
+        server dropping us before the message went out, or a 421 to MAIL.
+        Anything later may already have been delivered.
+        """
+        try:
+            self.ensure_connected()
+        except OSError:
+            self.engine._count('reconnects')
+            self.connect()
+        try:
+            self._transmit(message)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused) as e:
+            if self.server.data_started:
+                raise
+            if isinstance(e, smtplib.SMTPSenderRefused) and e.smtp_code != 421:
+                raise
+            self.engine._count('reconnects')
+            self.connect()
+            self._transmit(message)
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+class DeliveryEngine:
+    """Delivers messages over a small pool of long-lived SMTP sessions
+
+    Sessions are kept open between deliveries (and between scheduler ticks
+    in the in-process mode), checked with NOOP before reuse and recycled
+    after max_messages_per_session messages. A shared rate limiter spaces
+    out sends across all sessions.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, username=None, password=None,
+                 use_ssl=SMTP_USE_SSL, starttls=SMTP_STARTTLS, pool_size=SMTP_POOL_SIZE,
+                 rate_limit=SMTP_RATE_LIMIT, max_messages_per_session=SMTP_MAX_MESSAGES_PER_SESSION,
+                 timeout=SMTP_TIMEOUT, idle_check_seconds=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_check_seconds = idle_check_seconds
+        self.max_messages_per_session = max_messages_per_session
+        self.pool_size = max(1, pool_size)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.sessions = queue.Queue()
+        for _ in range(self.pool_size):
+            self.sessions.put(SMTPSession(self))
+        self.lock = threading.Lock()
+        self.stats = {"sent": 0, "failed": 0, "sessions_opened": 0, "reconnects": 0}
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _send_one(self, message):
+        self.rate_limiter.wait()
+        session = self.sessions.get()
+        try:
+            with external_call('smtp', 'send'):
+                session.send(message)
+            self._count('sent')
+            inc('emails_total', result='sent')
+            return True
+        except Exception as e:
+            print(f"Error sending email to {message['To']}: {e}")
+            self._count('failed')
+            inc('emails_total', result='failed')
+            session.close()
+            return False
+        finally:
+            self.sessions.put(session)
+
+    def deliver(self, messages):
+        """Send every message, returns a report with counts and throughput"""
+        messages = list(messages)
+        start = time.perf_counter()
+        workers = min(self.pool_size, len(messages)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='smtp') as pool:
+            results = list(pool.map(bind_context(self._send_one), messages))
+        elapsed = time.perf_counter() - start
+        sent = sum(results)
+        return {
+            "sent": sent,
+            "failed": len(results) - sent,
+            "seconds": elapsed,
+            "messages_per_second": sent / elapsed if elapsed > 0 else 0.0
+        }
+
+    def close(self):
+        sessions = [self.sessions.get() for _ in range(self.pool_size)]
+        for session in sessions:
+            session.close()
+            self.sessions.put(session)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_delivery_engine(username, password):
+    """Return the process-wide delivery engine for these credentials"""
+    global _engine
+    with _engine_lock:
+        if _engine is None or (_engine.username, _engine.password) != (username, password):
+            if _engine is not None:
+                _engine.close()
+            _engine = DeliveryEngine(username=username, password=password)
+        return _engine
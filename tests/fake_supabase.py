@@ -0,0 +1,85 @@
+"""In-memory stand-in for the parts of the Supabase client the agents use
+
+Queries return at most max_rows rows, as PostgREST does, so code that
+forgets to page through results loses rows here too.
+"""
+import operator
+
+FILTERS = {'eq': operator.eq, 'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+
+class Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = '*'
+        self.filters = []
+        self.ordering = None
+        self.start = 0
+        self.end = None
+        self.count_limit = None
+        self.want_count = False
+
+    def select(self, columns='*', count=None):
+        self.columns = columns
+        self.want_count = count == 'exact'
+        return self
+
+    def __getattr__(self, name):
+        if name not in FILTERS:
+            raise AttributeError(name)
+        def add_filter(column, value):
+            self.filters.append(lambda row: row.get(column) is not None and FILTERS[name](row[column], value))
+            return self
+        return add_filter
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering = (column, desc)
+        return self
+
+    def range(self, start, end):
+        # postgrest 0.13 sends Range: start-(end - 1)
+        self.start, self.end = start, end - 1
+        return self
+
+    def limit(self, count):
+        self.count_limit = count
+        return self
+
+    def offset(self, start):
+        self.start = start
+        return self
+
+    def execute(self):
+        self.client.requests.append(self.table)
+        rows = [row for row in self.client.tables.get(self.table, []) if all(check(row) for check in self.filters)]
+        if self.ordering:
+            column, desc = self.ordering
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        total = len(rows)
+        end = len(rows) - 1 if self.end is None else self.end
+        if self.count_limit is not None:
+            end = min(end, self.start + self.count_limit - 1)
+        rows = rows[self.start:min(end, self.start + self.client.max_rows - 1) + 1]
+        if self.columns != '*':
+            names = [name.strip() for name in self.columns.split(',')]
+            rows = [{name: row.get(name) for name in names} for row in rows]
+        return Result(rows, total if self.want_count else None)
+
+class FakeSupabase:
+    def __init__(self, tables=None, max_rows=1000):
+        self.tables = tables or {}
+        self.max_rows = max_rows
+        self.requests = []
+
+    def table(self, name):
+        return Query(self, name)
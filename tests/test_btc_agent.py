@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+import btc_agent
+from fake_supabase import FakeSupabase
+
+def price_rows(count):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        {"price": 60000.0 + i, "created_at": (start + timedelta(minutes=i)).isoformat()}
+        for i in range(count)
+    ]
+
+def test_fetch_prices_pages_past_the_row_limit(monkeypatch):
+    client = FakeSupabase({"btc_price": price_rows(1440)})
+    monkeypatch.setattr(btc_agent, 'get_supabase', lambda: client)
+    monkeypatch.setattr(btc_agent, 'read_prices_since', lambda since: None)
+
+    rows = btc_agent.fetch_btc_prices_since("2026-01-01T00:00:00+00:00")
+    assert len(rows) == 1440
+    # The newest price is the one a truncated read would lose
+    assert rows[-1]['price'] == 61439.0
+    assert len(client.requests) == 2
+
+def test_fetch_prices_reads_locally_when_covered(monkeypatch):
+    client = FakeSupabase()
+    monkeypatch.setattr(btc_agent, 'get_supabase', lambda: client)
+    monkeypatch.setattr(btc_agent, 'read_prices_since', lambda since: price_rows(3))
+
+    assert len(btc_agent.fetch_btc_prices_since("2026-01-01T00:00:00+00:00")) == 3
+    assert client.requests == []
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+import email_agent
+from fake_supabase import FakeSupabase
+
+def news_rows(count):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        {"url": f"https://example.com/{i}", "finance_info": f"Title: Story {i}",
+         "timestamp": (start + timedelta(minutes=2 * i)).isoformat()}
+        for i in range(count)
+    ]
+
+def test_fetch_news_pages_past_the_row_limit(monkeypatch):
+    client = FakeSupabase({"eco_info": news_rows(2100)})
+    unsynced = [{"url": "https://example.com/local", "finance_info": "Title: Local",
+                 "timestamp": "2026-01-04T00:00:00+00:00"}]
+    monkeypatch.setattr(email_agent, 'get_supabase', lambda: client)
+    monkeypatch.setattr(email_agent, 'read_news_since', lambda since: None)
+    monkeypatch.setattr(email_agent, 'read_unsynced_news_since', lambda since: unsynced)
+
+    rows = email_agent.fetch_news_since("2026-01-01T00:00:00+00:00")
+    assert len(rows) == 2101
+    # The newest stored story survives, followed by the unsynced one
+    assert [row['url'] for row in rows[-2:]] == ["https://example.com/2099", "https://example.com/local"]
+    assert len(client.requests) == 3
+
+def test_count_news_adds_unsynced_rows_to_the_supabase_count(monkeypatch):
+    client = FakeSupabase({"eco_info": news_rows(30)})
+    monkeypatch.setattr(email_agent, 'get_supabase', lambda: client)
+    monkeypatch.setattr(email_agent, 'count_local_news_since', lambda since: None)
+    monkeypatch.setattr(email_agent, 'count_unsynced_news_since', lambda since: 2)
+
+    # Rows 1 to 29 are strictly after the first story
+    assert email_agent.count_news_since("2026-01-01T00:00:00+00:00") == 31
+
+def test_count_news_uses_the_local_store_when_it_covers_the_window(monkeypatch):
+    client = FakeSupabase()
+    monkeypatch.setattr(email_agent, 'get_supabase', lambda: client)
+    monkeypatch.setattr(email_agent, 'count_local_news_since', lambda since: 4)
+
+    assert email_agent.count_news_since("2026-01-01T00:00:00+00:00") == 4
+    assert client.requests == []
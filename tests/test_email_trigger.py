@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from email_trigger import EmailTrigger
+
+NOW = 1_800_000_000.0
+
+def make_trigger(tmp_path, **kwargs):
+    settings = dict(enabled=True, move_pct=1.0, volatility_pct=0.5, new_news=5, max_quiet_seconds=21600)
+    settings.update(kwargs)
+    return EmailTrigger(path=str(tmp_path / "email_trigger.json"), **settings)
+
+def minute_prices(prices, end=NOW):
+    prices = np.asarray(prices, dtype=float)
+    return end - 60.0 * np.arange(len(prices))[::-1], prices
+
+@pytest.fixture
+def trigger(tmp_path):
+    trigger = make_trigger(tmp_path)
+    trigger.record_sent(100.0, "2026-01-01T00:00:00+00:00", now=NOW - 600)
+    return trigger
+
+def no_news(since):
+    return 0
+
+def test_first_run_always_fires(tmp_path):
+    fire, reasons = make_trigger(tmp_path).evaluate(*minute_prices([100.0] * 10), now=NOW)
+    assert fire and reasons == ["no email sent yet"]
+
+def test_disabled_triggers_always_fire(tmp_path):
+    trigger = make_trigger(tmp_path, enabled=False)
+    trigger.record_sent(100.0, now=NOW - 60)
+    assert trigger.evaluate(*minute_prices([100.0] * 10), now=NOW) == (True, ["triggers disabled"])
+
+def test_quiet_market_is_skipped(trigger):
+    fire, reasons = trigger.evaluate(*minute_prices([100.0] * 10), no_news, now=NOW)
+    assert not fire
+    assert [reason.split()[0] for reason in reasons] == ["quiet", "price", "volatility", "0"]
+    assert trigger.stats == {"fired": 0, "skipped": 1}
+
+def test_long_quiet_period_fires(trigger):
+    fire, reasons = trigger.evaluate(*minute_prices([100.0] * 10), no_news, now=NOW - 600 + 21600)
+    assert fire and reasons[0].startswith("quiet")
+
+def test_price_move_fires_both_ways(trigger):
+    for last in (101.5, 98.5):
+        fire, reasons = trigger.evaluate(*minute_prices([100.0] * 9 + [last]), no_news, now=NOW)
+        assert fire
+        assert any(reason.startswith("price move") for reason in reasons)
+
+def test_volatility_fires_without_a_net_move(tmp_path):
+    trigger = make_trigger(tmp_path, move_pct=0)
+    trigger.record_sent(100.0, now=NOW - 600)
+    fire, reasons = trigger.evaluate(*minute_prices([100.0, 101.0] * 5), no_news, now=NOW)
+    assert fire and reasons[0].startswith("volatility")
+
+def test_volatility_only_counts_samples_since_the_last_email(trigger):
+    # Swings from before the last email (10 minutes ago) don't count
+    fire, reasons = trigger.evaluate(*minute_prices([100.0, 103.0] * 10 + [100.0] * 12), no_news, now=NOW)
+    assert not fire
+    assert "volatility 0.000% (threshold 0.5%)" in reasons
+
+def test_volatility_needs_enough_samples(trigger):
+    fire, reasons = trigger.evaluate(*minute_prices([100.0, 100.5, 100.0]), no_news, now=NOW)
+    assert not fire
+    assert "volatility n/a (too few samples)" in reasons
+
+def test_news_count_fires_from_the_recorded_timestamp(trigger):
+    calls = []
+
+    def count_news_since(since):
+        calls.append(since)
+        return 5
+
+    fire, reasons = trigger.evaluate(*minute_prices([100.0] * 10), count_news_since, now=NOW)
+    assert fire and reasons == ["5 new stories (threshold 5)"]
+    assert calls == ["2026-01-01T00:00:00+00:00"]
+
+def test_news_is_not_counted_once_another_trigger_fired(trigger):
+    def count_news_since(since):
+        raise AssertionError("news counted")
+
+    fire, _ = trigger.evaluate(*minute_prices([100.0] * 9 + [105.0]), count_news_since, now=NOW)
+    assert fire
+
+def test_record_sent_resets_the_baseline_and_persists(tmp_path, trigger):
+    trigger.record_sent(105.0, now=NOW)
+    # The move is measured from the new price, and the quiet timer restarts
+    fire, _ = trigger.evaluate(*minute_prices([105.0] * 10, end=NOW + 300), no_news, now=NOW + 300)
+    assert not fire
+
+    reloaded = make_trigger(tmp_path)
+    assert reloaded.state['last_price'] == 105.0
+    assert reloaded.state['last_sent_at'] == NOW
+    assert reloaded.state['news_since'] == "2027-01-15T08:00:00+00:00"
+
+def test_corrupt_state_starts_fresh(tmp_path):
+    (tmp_path / "email_trigger.json").write_text("{not json")
+    trigger = make_trigger(tmp_path)
+    assert trigger.state['last_sent_at'] is None
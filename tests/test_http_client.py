@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+import requests
+import http_client
+from http_client import HttpClient
+
+class ScriptedServer:
+    """Local HTTP server answering with a scripted list of (status, headers)"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests += 1
+                status, headers = server.responses.pop(0) if server.responses else (200, {})
+                body = b'{"ok": true}'
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}/"
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+@pytest.fixture
+def server():
+    server = ScriptedServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_client.time, 'sleep', sleeps.append)
+    return sleeps
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+def test_success_reuses_one_connection(server, sleeps):
+    client = HttpClient()
+    for _ in range(3):
+        assert client.get(server.url).json() == {"ok": True}
+    stats = client.stats()
+    assert stats['requests'] == 3 and stats['retries'] == 0
+    assert stats['connections_opened'] == 1
+    assert stats['connections_reused'] == 2
+    assert sleeps == []
+
+def test_retryable_statuses_are_retried(server, sleeps):
+    server.responses = [(503, {}), (429, {"Retry-After": "2"})]
+    client = HttpClient(max_retries=3, backoff_base=0.5)
+    assert client.get(server.url).status_code == 200
+    assert server.requests == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5
+    assert sleeps[1] == 2.0
+    assert client.stats()['retries'] == 2
+
+def test_gives_up_after_max_retries(server, sleeps):
+    server.responses = [(500, {})] * 5
+    client = HttpClient(max_retries=2)
+    assert client.get(server.url).status_code == 500
+    assert server.requests == 3
+    assert client.stats()['failures'] == 1
+
+def test_client_errors_are_not_retried(server, sleeps):
+    server.responses = [(404, {})]
+    client = HttpClient()
+    assert client.get(server.url).status_code == 404
+    assert server.requests == 1 and sleeps == []
+
+def test_connection_errors_are_retried_then_raised(sleeps):
+    client = HttpClient(max_retries=2, timeout=(0.5, 0.5))
+    with pytest.raises(requests.ConnectionError):
+        # Nothing listens on port 9 locally
+        client.get("http://127.0.0.1:9/")
+    assert len(sleeps) == 2
+    assert client.stats()['failures'] == 1
+
+def test_backoff_is_capped_full_jitter():
+    client = HttpClient(backoff_base=1, backoff_max=5)
+    for attempt in range(10):
+        delay = client._retry_delay(attempt)
+        assert 0 <= delay <= min(5, 2 ** attempt)
+
+@pytest.mark.parametrize("value, expected", [
+    ("3", 3.0),
+    ("0", 0.0),
+    ("-5", 0.0),
+    ("120", 30.0),
+])
+def test_retry_after_seconds_are_clamped(value, expected):
+    assert HttpClient(backoff_max=30)._retry_delay(0, Response({"Retry-After": value})) == expected
+
+def test_retry_after_http_date():
+    client = HttpClient(backoff_max=30)
+    soon = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    assert 8 <= client._retry_delay(0, Response({"Retry-After": soon})) <= 10
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(hours=1), usegmt=True)
+    assert client._retry_delay(0, Response({"Retry-After": past})) == 0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(hours=1), usegmt=True)
+    assert client._retry_delay(0, Response({"Retry-After": later})) == 30
+
+def test_unparseable_retry_after_falls_back_to_backoff():
+    client = HttpClient(backoff_base=0.5, backoff_max=30)
+    assert 0 <= client._retry_delay(1, Response({"Retry-After": "soon"})) <= 1.0
@@ -0,0 +1,13 @@
+import info_agent
+from fake_supabase import FakeSupabase
+
+def test_fetch_stored_urls_reads_every_page(monkeypatch):
+    rows = [{"url": f"http://www.example.com/{i:05d}"} for i in range(2500)]
+    client = FakeSupabase({"eco_info": rows})
+    monkeypatch.setattr(info_agent, 'get_supabase', lambda: client)
+
+    urls = info_agent.fetch_stored_urls()
+    assert len(urls) == 2500
+    # Returned as dedup keys
+    assert urls[0] == "https://example.com/00000"
+    assert len(client.requests) == 3
@@ -0,0 +1,107 @@
+from job_scheduler import Job, JobScheduler
+
+class RecordingExecutor:
+    """Collects submitted runs instead of starting threads"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, *args):
+        self.submitted.append((func, args))
+
+    def run_all(self):
+        submitted, self.submitted = self.submitted, []
+        for func, args in submitted:
+            func(*args)
+
+def make_scheduler(*jobs):
+    scheduler = JobScheduler()
+    scheduler.executor = RecordingExecutor()
+    for name, interval, deadline, jitter in jobs:
+        job = scheduler.add_job(name, lambda: None, interval, deadline, jitter)
+        job.scheduled_at = job.due_at = 0.0
+    return scheduler
+
+def test_schedule_next_stays_on_the_grid():
+    job = Job('price', None, 60)
+    job.scheduled_at = 0.0
+    job.schedule_next(5.0)
+    assert job.scheduled_at == job.due_at == 60.0
+    # A late wake-up doesn't shift later slots
+    job.schedule_next(61.5)
+    assert job.scheduled_at == 120.0
+
+def test_schedule_next_skips_missed_slots():
+    job = Job('price', None, 60)
+    job.scheduled_at = 0.0
+    job.schedule_next(200.0)
+    assert job.scheduled_at == 240.0
+
+def test_jitter_delays_within_bounds():
+    job = Job('news', None, 60, jitter=10)
+    job.scheduled_at = 0.0
+    for _ in range(50):
+        job.schedule_next(job.scheduled_at)
+        assert job.scheduled_at <= job.due_at <= job.scheduled_at + 10
+    assert job.scheduled_at == 50 * 60.0
+
+def test_first_run_is_jittered():
+    jobs = [Job(f"job{i}", None, 60, jitter=10) for i in range(20)]
+    for job in jobs:
+        job.schedule_first(100.0)
+        assert job.scheduled_at == 100.0
+        assert 100.0 <= job.due_at <= 110.0
+    # Jobs started together don't all fire at the same moment
+    assert len({job.due_at for job in jobs}) > 1
+
+def test_first_run_can_wait_an_interval():
+    job = Job('email', None, 60)
+    job.schedule_first(100.0, run_immediately=False)
+    assert job.scheduled_at == job.due_at == 160.0
+
+def test_run_pending_runs_due_jobs_and_records_lag():
+    scheduler = make_scheduler(('price', 60, None, 0), ('news', 300, None, 0))
+    scheduler.jobs[1].due_at = 100.0
+    scheduler.run_pending(now=2.5)
+    scheduler.executor.run_all()
+
+    status = scheduler.status()
+    assert status['price']['runs'] == 1
+    assert status['price']['last_lag'] == 2.5
+    assert status['news']['runs'] == 0
+    assert scheduler.jobs[0].due_at == 60.0
+
+def test_overlapping_run_is_skipped():
+    scheduler = make_scheduler(('email', 60, None, 0))
+    scheduler.run_pending(now=0.0)
+    # The first run hasn't finished when the next slot comes up
+    scheduler.run_pending(now=60.0)
+    assert len(scheduler.executor.submitted) == 1
+    assert scheduler.status()['email']['skipped'] == 1
+    assert scheduler.status()['email']['running']
+
+def test_deadline_is_reported_once_per_run():
+    scheduler = make_scheduler(('email', 60, 30, 0))
+    scheduler.run_pending(now=0.0)
+    scheduler._check_deadlines(20.0)
+    assert scheduler.status()['email']['deadline_exceeded'] == 0
+    scheduler._check_deadlines(31.0)
+    scheduler._check_deadlines(45.0)
+    assert scheduler.status()['email']['deadline_exceeded'] == 1
+
+    scheduler.executor.run_all()
+    scheduler.run_pending(now=60.0)
+    scheduler._check_deadlines(95.0)
+    assert scheduler.status()['email']['deadline_exceeded'] == 2
+
+def test_failures_are_counted():
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler = make_scheduler()
+    job = scheduler.add_job('info', fail, 60)
+    job.scheduled_at = job.due_at = 0.0
+    scheduler.run_pending(now=0.0)
+    scheduler.executor.run_all()
+    assert scheduler.status()['info']['failures'] == 1
+    assert not scheduler.status()['info']['running']
@@ -0,0 +1,97 @@
+import os
+import pytest
+import llm_cache
+from llm_cache import LLMCache, cached_chat_completion
+
+MESSAGES = [{"role": "user", "content": "Summarize the Bitcoin market"}]
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 1700000000,
+    "model": "gpt-4",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "Bitcoin is flat."}}],
+    "usage": {"prompt_tokens": 12, "completion_tokens": 4, "total_tokens": 16}
+}
+
+class FakeOpenAI:
+    """Just chat.completions.create, counting calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, **request):
+        from openai.types.chat import ChatCompletion
+        self.calls += 1
+        return ChatCompletion.model_validate(COMPLETION)
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(directory=str(tmp_path / "llm"), max_entries=3)
+
+def test_key_is_stable_and_order_independent():
+    first = LLMCache.make_key(model="gpt-4", messages=MESSAGES, temperature=0)
+    assert first == LLMCache.make_key(temperature=0, messages=MESSAGES, model="gpt-4")
+    assert len(first) == 64
+
+def test_key_changes_with_the_request():
+    key = LLMCache.make_key(model="gpt-4", messages=MESSAGES)
+    assert key != LLMCache.make_key(model="gpt-4", messages=MESSAGES, stream=True)
+    assert key != LLMCache.make_key(model="gpt-4o", messages=MESSAGES)
+    assert key != LLMCache.make_key(model="gpt-4", messages=[{"role": "user", "content": "Other"}])
+
+def test_put_and_get(cache):
+    cache.put("k", {"text": "hello"}, ttl=60)
+    assert cache.get("k") == {"text": "hello"}
+    assert cache.get("missing") is None
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+    assert cache.hit_rate() == 0.5
+
+def test_expired_entries_are_removed(cache, monkeypatch):
+    cache.put("k", "value", ttl=60)
+    now = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now + 61)
+    assert cache.get("k") is None
+    assert cache.stats['expired'] == 1
+    assert not os.path.exists(cache._path("k"))
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for i, key in enumerate("abc"):
+        cache.put(key, key, ttl=60)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    # Reading "a" makes it the most recently used
+    cache.get("a")
+    cache.put("d", "d", ttl=60)
+    assert sorted(name[0] for name in os.listdir(cache.directory)) == ["a", "c", "d"]
+    assert cache.stats['evictions'] == 1
+
+def test_eviction_by_size(tmp_path):
+    cache = LLMCache(directory=str(tmp_path / "llm"), max_bytes=300)
+    for i in range(5):
+        cache.put(f"k{i}", "x" * 100, ttl=60)
+    total = sum(os.path.getsize(os.path.join(cache.directory, name)) for name in os.listdir(cache.directory))
+    assert total <= 300
+    assert cache.get("k4") == "x" * 100
+
+def test_cached_chat_completion_round_trip(cache, monkeypatch):
+    monkeypatch.setattr(llm_cache, '_cache', cache)
+    client = FakeOpenAI()
+
+    first = cached_chat_completion(client, 60, model="gpt-4", messages=MESSAGES)
+    second = cached_chat_completion(client, 60, model="gpt-4", messages=MESSAGES)
+    assert client.calls == 1
+    assert type(second) is type(first)
+    assert second.choices[0].message.content == "Bitcoin is flat."
+    assert second.usage.total_tokens == 16
+    assert second.model_dump() == first.model_dump()
+
+def test_zero_ttl_bypasses_the_cache(cache, monkeypatch):
+    monkeypatch.setattr(llm_cache, '_cache', cache)
+    client = FakeOpenAI()
+    cached_chat_completion(client, 0, model="gpt-4", messages=MESSAGES)
+    cached_chat_completion(client, 0, model="gpt-4", messages=MESSAGES)
+    assert client.calls == 2
+    assert os.listdir(cache.directory) == []
@@ -0,0 +1,142 @@
+import time
+import pytest
+from local_store import LocalStore, StoreSyncer, parse_timestamp
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.rows = None
+
+    def upsert(self, rows, on_conflict, ignore_duplicates):
+        self.rows = rows
+        self.conflict = on_conflict
+        return self
+
+    def execute(self):
+        if self.client.fail:
+            raise ConnectionError("supabase unavailable")
+        stored = self.client.tables.setdefault(self.name, {})
+        for row in self.rows:
+            stored.setdefault(row[self.conflict], row)
+        self.client.batches.append((self.name, len(self.rows)))
+        return self
+
+class FakeClient:
+    """The part of the Supabase client the syncer uses, keeping rows in memory"""
+
+    def __init__(self):
+        self.tables = {}
+        self.batches = []
+        self.fail = False
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+def price(minute, value=100.0):
+    return {"price": value, "created_at": f"2026-01-01T00:{minute:02d}:00+00:00"}
+
+def news(i, minute=0):
+    return {"finance_info": f"story {i}", "url": f"https://example.com/{i}", "cluster_id": None,
+            "timestamp": f"2026-01-01T00:{minute:02d}:00+00:00"}
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalStore(str(tmp_path / "cache" / "local_store.db"))
+
+def test_insert_ignores_rows_already_stored(store):
+    assert store.insert('btc_price', [price(0), price(1)]) == 2
+    assert store.insert('btc_price', [price(1), price(2)]) == 1
+    assert [row['created_at'][14:16] for row in store.prices_since("2026-01-01T00:01:00+00:00")] == ["01", "02"]
+
+def test_news_reads_and_counts(store):
+    store.insert('eco_info', [news(1, minute=5), news(2, minute=10)])
+    assert [row['url'] for row in store.news_since("2026-01-01T00:05:00+00:00")] == \
+        ["https://example.com/1", "https://example.com/2"]
+    # Counting is strictly after the timestamp
+    assert store.count_news_since("2026-01-01T00:05:00+00:00") == 1
+    assert store.existing_urls(["https://example.com/2", "https://example.com/3"]) == {"https://example.com/2"}
+
+def test_sync_moves_the_high_water_mark(store):
+    client = FakeClient()
+    syncer = StoreSyncer(store, client, batch_size=2)
+    store.insert('btc_price', [price(i) for i in range(5)])
+    store.insert('eco_info', [news(1)])
+
+    assert syncer.sync() == 6
+    assert client.batches == [('btc_price', 2), ('btc_price', 2), ('btc_price', 1), ('eco_info', 1)]
+    assert store.high_water('btc_price') == 5
+    assert store.backlog() == {"btc_price": 0, "eco_info": 0}
+    assert syncer.sync() == 0
+
+    store.insert('btc_price', [price(10)])
+    assert store.backlog()['btc_price'] == 1
+    assert syncer.sync() == 1
+    assert len(client.tables['btc_price']) == 6
+
+def test_failed_sync_keeps_the_backlog(store):
+    client = FakeClient()
+    syncer = StoreSyncer(store, client)
+    store.insert('eco_info', [news(1), news(2)])
+
+    client.fail = True
+    with pytest.raises(ConnectionError):
+        syncer.sync()
+    assert store.high_water('eco_info') == 0
+    assert store.backlog()['eco_info'] == 2
+    assert store.count_news_since("2025-12-31T00:00:00+00:00", unsynced=True) == 2
+
+    client.fail = False
+    assert syncer.sync() == 2
+    assert store.count_news_since("2025-12-31T00:00:00+00:00", unsynced=True) == 0
+
+def test_resent_batch_does_not_duplicate(store):
+    client = FakeClient()
+    # Keep the synced row, which is older than any retention period
+    syncer = StoreSyncer(store, client, retention_hours=0)
+    store.insert('eco_info', [news(1)])
+    syncer.sync()
+    # As if the process died between the upsert and the high-water update
+    store.mark_synced('eco_info', 0)
+    assert syncer.sync() == 1
+    assert len(client.tables['eco_info']) == 1
+
+def test_high_water_and_created_at_survive_reopening(tmp_path):
+    path = str(tmp_path / "local_store.db")
+    store = LocalStore(path)
+    store.insert('btc_price', [price(0)])
+    store.mark_synced('btc_price', 1)
+
+    reopened = LocalStore(path)
+    assert reopened.high_water('btc_price') == 1
+    assert reopened.created_at == store.created_at
+    assert reopened.covers(store.created_at + 1)
+    assert not reopened.covers(store.created_at - 1)
+
+def test_prune_deletes_only_old_synced_rows(store):
+    store.insert('btc_price', [price(minute) for minute in range(4)])
+    store.insert('eco_info', [news(1, minute=0)])
+    store.mark_synced('btc_price', 2)
+    cutoff = parse_timestamp("2026-01-01T00:02:00+00:00")
+
+    # Prices at minutes 0 and 1 are synced and old, the news row isn't synced yet
+    assert store.prune(cutoff) == 2
+    assert [row['created_at'][14:16] for row in store.prices_since("2026-01-01T00:00:00+00:00")] == ["02", "03"]
+    assert store.count_news_since("2025-12-31T00:00:00+00:00", unsynced=True) == 1
+    assert not store.covers(cutoff - 1)
+    assert LocalStore(store.path).pruned_before == cutoff
+
+def test_syncer_prunes_past_the_retention_period(store):
+    syncer = StoreSyncer(store, FakeClient(), retention_hours=1)
+    store.insert('btc_price', [price(0)])
+    assert syncer.sync() == 1
+    assert syncer.stats['pruned'] == 1
+    assert store.prices_since("2026-01-01T00:00:00+00:00") == []
+    assert store.pruned_before == pytest.approx(time.time() - 3600, abs=60)
+    assert not store.covers(time.time() - 7200)
+
+def test_retention_zero_keeps_everything(store):
+    syncer = StoreSyncer(store, FakeClient(), retention_hours=0)
+    store.insert('btc_price', [price(0)])
+    syncer.sync()
+    assert len(store.prices_since("2026-01-01T00:00:00+00:00")) == 1
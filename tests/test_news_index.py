@@ -0,0 +1,100 @@
+import warnings
+from datetime import datetime, timezone
+from news_index import NewsIndex, tokenize, document_terms, query_terms
+
+NOW = 1_800_000_000.0
+
+def row(i, title, description="", age_minutes=0.0):
+    return {
+        "url": f"https://example.com/{i}",
+        "finance_info": f"Title: {title}\nDescription: {description}\nSource: https://example.com/{i}",
+        "timestamp": datetime.fromtimestamp(NOW - age_minutes * 60, timezone.utc).isoformat()
+    }
+
+def make_index(rows, **kwargs):
+    index = NewsIndex(half_life_minutes=60, max_age_hours=48, **kwargs)
+    index.add(rows)
+    return index
+
+def urls(results):
+    return [result['url'].rsplit('/', 1)[1] for result in results]
+
+def test_tokenize_drops_stopwords_and_plurals():
+    assert tokenize("The Bitcoin ETFs and rates") == ['bitcoin', 'etf', 'rate']
+    # Short words and words ending in -ss/-us keep their s
+    assert tokenize("gas stress bonus") == ['gas', 'stress', 'bonus']
+
+def test_document_terms_weight_titles_and_skip_the_source():
+    terms = document_terms(row(1, "Bitcoin rallies", "bitcoin demand"))
+    assert terms['bitcoin'] == 3
+    assert 'example' not in terms
+
+def test_query_terms_split_on_commas():
+    assert query_terms("bitcoin,fed rates") == ['bitcoin', 'fed', 'rate']
+
+def test_matching_stories_rank_above_others():
+    index = make_index([
+        row(1, "Oil prices climb", "OPEC output"),
+        row(2, "Bitcoin jumps as ETF inflows grow", "Bitcoin demand"),
+        row(3, "Fed holds rates", "Inflation cools"),
+    ])
+    results = index.search(['bitcoin', 'etf', 'fed'], top_k=5, now=NOW, min_score=0)
+    assert urls(results) == ['2', '3']
+    assert results[0]['score'] > results[1]['score'] > 0
+
+def test_recency_decay_halves_the_score():
+    index = make_index([row(1, "Bitcoin news", age_minutes=0), row(2, "Bitcoin news", age_minutes=60)])
+    fresh, old = index.search(['bitcoin'], now=NOW, min_score=0)
+    assert urls([fresh, old]) == ['1', '2']
+    assert abs(old['score'] / fresh['score'] - 0.5) < 0.01
+
+def test_top_k_and_min_score():
+    index = make_index([row(i, "Bitcoin news", age_minutes=i * 60) for i in range(6)])
+    assert urls(index.search(['bitcoin'], top_k=2, now=NOW, min_score=0)) == ['0', '1']
+    best = index.search(['bitcoin'], top_k=1, now=NOW, min_score=0)[0]['score']
+    # Scores halve every hour, so a quarter of the best keeps three stories
+    assert len(index.search(['bitcoin'], top_k=10, now=NOW, min_score=best / 4 - 1e-6)) == 3
+
+def test_stories_past_max_age_are_not_returned():
+    index = make_index([row(1, "Bitcoin old", age_minutes=49 * 60), row(2, "Bitcoin new")])
+    assert urls(index.search(['bitcoin'], now=NOW, min_score=0)) == ['2']
+    assert index.search(['bitcoin'], now=NOW + 49 * 3600, min_score=0) == []
+
+def test_documents_without_terms_do_not_break_scoring():
+    index = make_index([{"url": "u", "finance_info": "Source: https://example.com", "timestamp": row(0, "")['timestamp']}])
+    assert index.total_length == 0
+    # numpy only warns on 0 / 0, so turn that into a failure
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert index.search(['bitcoin'], now=NOW) == []
+
+def test_update_fetches_from_the_newest_story_with_overlap():
+    stored = [row(1, "Bitcoin one", age_minutes=10), row(2, "Bitcoin two", age_minutes=5)]
+    calls = []
+
+    def fetch_rows_since(since):
+        calls.append(since)
+        return [item for item in stored if item['timestamp'] >= since]
+
+    index = NewsIndex(half_life_minutes=60, max_age_hours=48, overlap_seconds=120)
+    assert index.update(fetch_rows_since, now=NOW) == 2
+    assert calls[0] == datetime.fromtimestamp(NOW - 48 * 3600, timezone.utc).isoformat()
+
+    stored.append(row(3, "Bitcoin three"))
+    assert index.update(fetch_rows_since, now=NOW) == 1
+    assert calls[1] == datetime.fromtimestamp(NOW - 5 * 60 - 120, timezone.utc).isoformat()
+    assert len(index) == 3
+
+def test_compaction_drops_expired_stories_once_they_are_half():
+    index = make_index([row(i, "Bitcoin story", age_minutes=age) for i, age in enumerate((2900, 2890, 10, 5))])
+    index.compact(NOW - 48 * 3600)
+    assert len(index) == 2
+    assert index.urls == {"https://example.com/2", "https://example.com/3"}
+    assert urls(index.search(['bitcoin'], now=NOW, min_score=0)) == ['3', '2']
+
+def test_compaction_waits_until_most_stories_expired():
+    index = make_index([row(i, "Bitcoin story", age_minutes=age) for i, age in enumerate((2900, 10, 5))])
+    index.compact(NOW - 48 * 3600)
+    assert len(index) == 3
+    # The expired story is still skipped by search
+    assert urls(index.search(['bitcoin'], now=NOW, min_score=0)) == ['2', '1']
@@ -0,0 +1,93 @@
+from news_normalize import clean_url, canonicalize_url, cluster_id_for, StoryClusterer
+
+STORY = "Bitcoin climbs above 70,000 as spot ETF inflows accelerate and treasury yields ease"
+
+def test_clean_url_keeps_the_published_link():
+    url = "http://WWW.Example.com/Markets/Story/?id=7&utm_source=x&fbclid=abc#comments"
+    assert clean_url(url) == "http://www.example.com/Markets/Story/?id=7"
+
+def test_clean_url_keeps_bare_flags_and_encoding():
+    assert clean_url("https://example.com/story?flag&utm_source=x") == "https://example.com/story?flag"
+    assert clean_url("https://example.com/search?q=btc%20etf&empty=&utm_medium=y") == \
+        "https://example.com/search?q=btc%20etf&empty="
+
+def test_clean_url_drops_amp_paths():
+    assert clean_url("https://example.com/amp/news/story") == "https://example.com/news/story"
+    assert clean_url("https://example.com/news/story.amp.html") == "https://example.com/news/story.html"
+    assert clean_url("https://example.com/news/story/amp?amp=1") == "https://example.com/news/story/"
+
+def test_canonicalize_url_matches_copies_of_the_same_page():
+    variants = [
+        "https://example.com/news/story?a=1&b=2",
+        "http://www.example.com/news/story/?b=2&a=1",
+        "https://m.example.com:443/news/story?a=1&b=2&utm_campaign=feed",
+        "https://amp.example.com/amp/news/story?a=1&b=2#top",
+    ]
+    assert {canonicalize_url(url) for url in variants} == {"https://example.com/news/story?a=1&b=2"}
+
+def test_canonicalize_url_keeps_meaningful_differences():
+    assert canonicalize_url("https://example.com/news?id=1") != canonicalize_url("https://example.com/news?id=2")
+    assert canonicalize_url("https://example.com:8080/a") == "https://example.com:8080/a"
+    # A bare second-level domain keeps its only label
+    assert canonicalize_url("https://m.io/a") == "https://m.io/a"
+
+def test_canonicalize_url_of_a_cleaned_url_is_unchanged():
+    url = "http://WWW.Example.com/News/amp/?utm_source=x&b=2&a=1#top"
+    assert canonicalize_url(clean_url(url)) == canonicalize_url(url)
+
+def test_urls_without_host_are_returned_as_is():
+    assert clean_url("not a url") == "not a url"
+    assert canonicalize_url("/relative/path") == "/relative/path"
+
+def test_cluster_id_is_stable():
+    assert cluster_id_for("https://example.com/a") == cluster_id_for("https://example.com/a")
+    assert cluster_id_for("https://example.com/a") != cluster_id_for("https://example.com/b")
+    assert len(cluster_id_for("https://example.com/a")) == 16
+
+def test_near_duplicate_stories_share_a_cluster():
+    clusters = StoryClusterer()
+    assert clusters.assign(STORY, "first") == ("first", True)
+    assert clusters.assign(STORY + " on Monday", "second") == ("first", False)
+    assert clusters.assign("Oil falls as OPEC agrees to raise output next quarter", "third") == ("third", True)
+
+def test_stories_without_words_are_always_new():
+    clusters = StoryClusterer()
+    assert clusters.assign("", "a") == ("a", True)
+    assert clusters.assign("", "b") == ("b", True)
+
+def test_forget_lets_a_story_cluster_again():
+    clusters = StoryClusterer()
+    clusters.assign(STORY, "first")
+    clusters.forget("first")
+    assert clusters.assign(STORY, "second") == ("second", True)
+    assert not any(cluster_id == "first" for cluster_id in clusters.buckets.values())
+
+def test_oldest_clusters_are_evicted():
+    clusters = StoryClusterer(max_clusters=2)
+    stories = [
+        STORY,
+        "Oil falls as OPEC agrees to raise output next quarter",
+        "Tech shares slide after a weak earnings outlook from chip makers",
+    ]
+    for i, story in enumerate(stories):
+        clusters.assign(story, str(i))
+    assert list(clusters.clusters) == ["1", "2"]
+    assert set(clusters.buckets.values()) == {"1", "2"}
+    assert clusters.assign(STORY, "again") == ("again", True)
+
+def test_failed_write_forgets_the_new_clusters(monkeypatch, tmp_path):
+    import info_agent
+    from seen_urls import SeenUrlIndex
+
+    def failing_write(table, rows):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(info_agent, 'seen_index', SeenUrlIndex(path=str(tmp_path / "seen.json")))
+    monkeypatch.setattr(info_agent, 'story_clusters', StoryClusterer())
+    monkeypatch.setattr(info_agent, 'LOCAL_STORE_ENABLED', False)
+    monkeypatch.setattr(info_agent, 'write_rows', failing_write)
+    item = {"finance_info": STORY, "url": "https://example.com/story", "title": STORY, "description": ""}
+
+    assert info_agent.store_news_batch([item])['inserted'] == 0
+    # The next run sees the story as new instead of a duplicate of the lost row
+    assert info_agent.story_clusters.assign(STORY, "retry") == ("retry", True)
@@ -0,0 +1,92 @@
+import math
+import numpy as np
+import pytest
+from price_analytics import rows_to_arrays, rolling_mean, rolling_std, rolling_extreme, compute_price_stats, \
+    format_price_summary
+
+def random_walk(count, seed=7):
+    rng = np.random.default_rng(seed)
+    timestamps = 1_800_000_000.0 + 60.0 * np.arange(count)
+    prices = 60000 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    return timestamps, prices
+
+def reference_stats(prices, short_window=6, long_window=24, breakout_window=12):
+    """The same statistics computed one sample at a time"""
+    prices = [float(price) for price in prices]
+    peak, drawdown = prices[0], 0.0
+    for price in prices:
+        peak = max(peak, price)
+        drawdown = min(drawdown, (price - peak) / peak)
+    returns = [b / a - 1 for a, b in zip(prices, prices[1:])]
+    recent = returns[-short_window:]
+    recent_mean = sum(recent) / len(recent)
+    ups = [i for i in range(breakout_window, len(prices)) if prices[i] > max(prices[i - breakout_window:i])]
+    downs = [i for i in range(breakout_window, len(prices)) if prices[i] < min(prices[i - breakout_window:i])]
+    return {
+        "max_drawdown_pct": drawdown * 100,
+        "rolling_volatility_pct": math.sqrt(sum((r - recent_mean) ** 2 for r in recent) / len(recent)) * 100,
+        "sma_short": sum(prices[-short_window:]) / short_window,
+        "sma_long": sum(prices[-long_window:]) / long_window,
+        "breakouts_up": len(ups),
+        "breakouts_down": len(downs),
+        "last_breakout_index": max(ups + downs),
+    }
+
+def test_rows_to_arrays_sorts_by_time():
+    rows = [
+        {"price": 2.0, "created_at": "2026-01-01T00:02:00Z"},
+        {"price": 1.0, "created_at": "2026-01-01T00:01:00+00:00"},
+    ]
+    timestamps, prices = rows_to_arrays(rows)
+    assert list(prices) == [1.0, 2.0]
+    assert timestamps[1] - timestamps[0] == 60
+
+def test_rolling_helpers_match_direct_windows():
+    _, prices = random_walk(50)
+    window = 5
+    windows = [prices[i - window + 1:i + 1] for i in range(window - 1, len(prices))]
+    assert np.allclose(rolling_mean(prices, window), [w.mean() for w in windows])
+    assert np.allclose(rolling_std(prices, window), [w.std() for w in windows])
+    assert np.array_equal(rolling_extreme(prices, window, np.maximum), [w.max() for w in windows])
+    assert np.array_equal(rolling_extreme(prices, window, np.minimum), [w.min() for w in windows])
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_stats_match_the_reference(seed):
+    timestamps, prices = random_walk(1440, seed)
+    stats = compute_price_stats(timestamps, prices)
+    expected = reference_stats(prices)
+
+    assert stats['samples'] == 1440
+    assert stats['first'] == prices[0] and stats['last'] == prices[-1]
+    assert stats['change_pct'] == pytest.approx((prices[-1] / prices[0] - 1) * 100)
+    assert stats['low'] == prices.min() and stats['low_time'] == timestamps[prices.argmin()]
+    assert stats['high'] == prices.max() and stats['high_time'] == timestamps[prices.argmax()]
+    assert stats['volatility_pct'] == pytest.approx(np.std(np.diff(prices) / prices[:-1]) * 100)
+    for key in ("max_drawdown_pct", "rolling_volatility_pct", "sma_short", "sma_long"):
+        assert stats[key] == pytest.approx(expected[key], rel=1e-6, abs=1e-9)
+    assert stats['breakouts_up'] == expected['breakouts_up']
+    assert stats['breakouts_down'] == expected['breakouts_down']
+    assert stats['last_breakout']['time'] == timestamps[expected['last_breakout_index']]
+
+def test_short_series_leave_windowed_stats_empty():
+    stats = compute_price_stats(np.array([0.0, 60.0]), np.array([100.0, 101.0]))
+    assert stats['rolling_volatility_pct'] is None
+    assert stats['sma_short'] is None and stats['sma_long'] is None
+    assert stats['breakouts_up'] == stats['breakouts_down'] == 0
+    assert stats['last_breakout'] is None
+
+def test_single_sample_and_empty_series():
+    stats = compute_price_stats(np.array([0.0]), np.array([100.0]))
+    assert stats['change'] == 0 and stats['max_drawdown_pct'] == 0
+    assert stats['volatility_pct'] is None
+    assert compute_price_stats(np.array([]), np.array([])) is None
+
+def test_stats_are_plain_floats():
+    stats = compute_price_stats(*random_walk(100))
+    assert all(not isinstance(value, np.generic) for value in stats.values() if not isinstance(value, dict))
+
+def test_summary_lists_the_available_stats():
+    summary = format_price_summary(compute_price_stats(*random_walk(100)))
+    assert summary.startswith("- Samples: 100 from")
+    assert "Moving averages: short $" in summary and ", long $" in summary
+    assert format_price_summary(None) == "No price data available.\n"
@@ -0,0 +1,76 @@
+from price_sampler import RingBuffer, WriteAheadLog, PriceSampler
+
+def make_sampler(tmp_path, stored, bar_seconds=60):
+    return PriceSampler(
+        fetch_price=lambda: None,
+        store_bars=stored.extend,
+        sample_seconds=15,
+        bar_seconds=bar_seconds,
+        buffer_seconds=60,
+        wal_path=str(tmp_path / "cache" / "price_bars.wal")
+    )
+
+def test_ring_buffer_keeps_the_latest_samples():
+    buffer = RingBuffer(3)
+    for i in range(5):
+        buffer.append(float(i), 100.0 + i)
+    assert len(buffer) == 3
+    assert buffer.since(0) == [(2.0, 102.0), (3.0, 103.0), (4.0, 104.0)]
+    assert buffer.since(3.5) == [(4.0, 104.0)]
+
+def test_ring_buffer_before_it_wraps():
+    buffer = RingBuffer(4)
+    buffer.append(1.0, 10.0)
+    buffer.append(2.0, 20.0)
+    assert len(buffer) == 2
+    assert buffer.since(0) == [(1.0, 10.0), (2.0, 20.0)]
+
+def test_closed_bars_are_time_weighted(tmp_path):
+    sampler = make_sampler(tmp_path, [])
+    sampler.add_sample(0, 100.0)
+    sampler.add_sample(15, 110.0)
+    sampler.add_sample(45, 90.0)
+    # The first sample of the next period closes the bar
+    sampler.add_sample(60, 95.0)
+
+    (bar,) = sampler.wal.read()
+    assert bar['period_start'] == "1970-01-01T00:00:00+00:00"
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (100.0, 110.0, 90.0, 90.0)
+    assert bar['samples'] == 3
+    # 100 for 15s, 110 for 30s, 90 for the last 15s
+    assert bar['twap'] == (100 * 15 + 110 * 30 + 90 * 15) / 60
+
+def test_flush_stores_and_clears_the_log(tmp_path):
+    stored = []
+    sampler = make_sampler(tmp_path, stored)
+    for timestamp in (0, 60, 120):
+        sampler.add_sample(timestamp, 100.0)
+    assert sampler.flush() == 2
+    assert [bar['period_start'] for bar in stored] == ["1970-01-01T00:00:00+00:00", "1970-01-01T00:01:00+00:00"]
+    assert sampler.wal.read() == []
+    assert sampler.flush() == 0
+
+def test_failed_flush_keeps_bars_for_replay(tmp_path):
+    def failing_store(bars):
+        raise RuntimeError("offline")
+
+    sampler = make_sampler(tmp_path, [])
+    sampler.store_bars = failing_store
+    sampler.add_sample(0, 100.0)
+    sampler.add_sample(60, 101.0)
+    assert sampler.flush() == 0
+
+    # A new sampler (e.g. after a restart) replays the logged bar
+    stored = []
+    restarted = make_sampler(tmp_path, stored)
+    assert restarted.flush() == 1
+    assert stored[0]['close'] == 100.0
+
+def test_wal_skips_a_torn_last_line(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / "bars.wal"))
+    wal.append({"period_start": "a"})
+    with open(wal.path, 'a') as f:
+        f.write('{"period_start": "b"')
+    assert wal.read() == [{"period_start": "a"}]
+    wal.clear()
+    assert wal.read() == []
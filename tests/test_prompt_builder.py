@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import prompt_builder
+from prompt_builder import lttb, count_tokens, truncate_tokens, build_analysis_context
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # The ~4 characters per token estimate, so results don't depend on tiktoken
+    monkeypatch.setattr(prompt_builder, 'get_encoding', lambda: None)
+
+def reference_lttb(x, y, threshold):
+    """Textbook LTTB with Python loops, using the same bucket edges"""
+    count = len(x)
+    edges = [int(edge) for edge in np.linspace(1, count - 1, threshold - 1)]
+    kept = [0]
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else count
+        bucket = range(end, next_end)
+        next_x = sum(x[j] for j in bucket) / len(bucket) if bucket else x[-1]
+        next_y = sum(y[j] for j in bucket) / len(bucket) if bucket else y[-1]
+        a = kept[-1]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+    return kept + [count - 1]
+
+def random_walk(count, seed=5):
+    rng = np.random.default_rng(seed)
+    return 1_800_000_000.0 + 60.0 * np.arange(count), 60000 + np.cumsum(rng.normal(0, 50, count))
+
+@pytest.mark.parametrize("count, threshold", [(1440, 100), (1440, 7), (100, 99), (50, 3)])
+def test_lttb_matches_the_reference(count, threshold):
+    x, y = random_walk(count)
+    kept = lttb(x, y, threshold)
+    assert list(kept) == reference_lttb(list(x), list(y), threshold)
+    assert len(kept) == threshold
+    assert np.all(np.diff(kept) > 0)
+
+def test_lttb_keeps_spikes():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb(x, y, 20)
+
+def test_lttb_returns_everything_when_no_downsampling_is_needed():
+    x, y = random_walk(10)
+    assert list(lttb(x, y, 10)) == list(range(10))
+    assert list(lttb(x, y, 2)) == list(range(10))
+
+def test_token_estimate_and_truncation():
+    assert count_tokens("x" * 40) == 10
+    assert truncate_tokens("short", 10) == "short"
+    truncated = truncate_tokens("word " * 100, 10)
+    assert truncated.endswith("…")
+    assert count_tokens(truncated) <= 10
+
+def news(i, length=200):
+    return {"finance_info": f"Title: Story {i} " + "x" * length}
+
+def test_context_stays_within_budget():
+    timestamps, prices = random_walk(1440)
+    context, report = build_analysis_context("- Latest: $60,000\n", timestamps, prices,
+                                             [news(i) for i in range(20)], reserved_tokens=200, token_budget=1500)
+    assert report['total_tokens'] <= 1500
+    assert count_tokens(context) <= 1500 - 200
+    assert 3 <= report['series_points'] < 1440
+    assert report['news_items'] + report['news_dropped'] == 20
+    assert report['news_dropped'] > 0
+
+def test_news_keeps_the_given_order_and_is_truncated():
+    context, report = build_analysis_context("", np.array([]), np.array([]),
+                                             [news(1, 5000), news(2)], token_budget=2000, max_news_item_tokens=50)
+    assert report['news_items'] == 2
+    assert context.index("Story 1") < context.index("Story 2")
+    assert "…" in context
+    assert report['series_points'] == 0
+
+def test_small_budget_keeps_only_the_summary():
+    timestamps, prices = random_walk(100)
+    summary = "- Latest: $60,000\n"
+    context, report = build_analysis_context(summary, timestamps, prices, [news(1)], token_budget=10)
+    assert context == "Bitcoin Price Summary (today):\n" + summary
+    assert report['news_items'] == 0 and report['series_points'] == 0
+
+def test_short_series_is_sent_whole():
+    timestamps, prices = random_walk(5)
+    context, report = build_analysis_context("", timestamps, prices, [], token_budget=1500)
+    assert report['series_points'] == 5
+    assert context.count("\n- ") == 5
@@ -0,0 +1,96 @@
+import json
+from email import message_from_bytes
+from email.mime.application import MIMEApplication
+from report_fanout import make_subscriber, load_subscribers, segment_key, build_report, build_messages, \
+    render_variant, key_paragraph
+
+BODY = (
+    "Dear Investor,\n\n"
+    "Bitcoin held steady today as spot ETF inflows offset selling from miners, keeping the price in a narrow range.\n\n"
+    "Other news was quiet.\n\n"
+    "Best Regards,\nFinance Agent"
+)
+
+STATS = {
+    "last": 60123.45, "change_pct": 1.5, "end_time": 1_800_000_000.0,
+    "low": 59000.0, "low_time": 1_799_990_000.0, "high": 60500.0, "high_time": 1_799_995_000.0
+}
+
+def make_report():
+    return build_report("Subject: Bitcoin Daily\n" + BODY, STATS)
+
+def parse(message):
+    return message_from_bytes(message.as_bytes())
+
+def text_of(message):
+    return parse(message).get_payload()[0].get_payload(decode=True).decode()
+
+def test_unknown_settings_fall_back_to_defaults():
+    subscriber = make_subscriber("a@example.com", "Mars/Olympus", "verbose")
+    assert subscriber == {"email": "a@example.com", "timezone": "UTC", "detail": "full"}
+
+def test_load_subscribers(tmp_path):
+    path = tmp_path / "subscribers.json"
+    path.write_text(json.dumps([
+        {"email": "a@example.com", "timezone": "Asia/Tokyo", "detail": "brief"},
+        {"email": "b@example.com"},
+        {"timezone": "UTC"},
+    ]))
+    subscribers = load_subscribers(str(path))
+    assert [segment_key(s) for s in subscribers] == [("brief", "Asia/Tokyo"), ("full", "UTC")]
+    assert load_subscribers(str(tmp_path / "missing.json"), ["c@example.com"]) == [make_subscriber("c@example.com")]
+
+def test_one_body_per_segment():
+    subscribers = [
+        make_subscriber("a@example.com", "UTC", "full"),
+        make_subscriber("b@example.com", "UTC", "full"),
+        make_subscriber("c@example.com", "Asia/Tokyo", "full"),
+        make_subscriber("d@example.com", "UTC", "brief"),
+    ]
+    messages, stats = build_messages(make_report(), subscribers, "agent@example.com", workers=2)
+    assert [m.recipient for m in messages] == ["a@example.com", "b@example.com", "c@example.com", "d@example.com"]
+    assert stats['segments'] == 3 and stats['deduplicated'] == 1
+    # Subscribers in one segment share the serialized body
+    assert messages[0].body is messages[1].body
+    assert len({id(m.body) for m in messages}) == 3
+
+def test_messages_are_well_formed():
+    messages, _ = build_messages(make_report(), [make_subscriber("a@example.com")], "agent@example.com")
+    message = parse(messages[0])
+    assert message["From"] == "Finance Agent <agent@example.com>"
+    assert message["To"] == "a@example.com"
+    assert message["Subject"] == "Bitcoin Daily"
+    assert message.get_content_type() == "multipart/mixed"
+    assert b"\r\n\r\n" in messages[0].as_bytes()
+    assert b"\n" not in messages[0].as_bytes().replace(b"\r\n", b"")
+    assert messages[0]["To"] == "a@example.com"
+
+def test_full_and_brief_variants():
+    report = make_report()
+    full = render_variant(report, "full", "UTC")
+    brief = render_variant(report, "brief", "UTC")
+    assert full.startswith("Dear Investor,") and "Other news was quiet." in full
+    assert "Bitcoin at " in full and "Bitcoin at " in brief
+    assert "Other news was quiet." not in brief
+    assert key_paragraph(BODY) in brief and brief.endswith("Best Regards,\nFinance Agent")
+
+def test_snapshot_uses_the_subscriber_timezone():
+    messages, _ = build_messages(make_report(), [
+        make_subscriber("utc@example.com", "UTC"),
+        make_subscriber("tokyo@example.com", "Asia/Tokyo"),
+    ], "agent@example.com")
+    # 1_800_000_000 is 08:00 UTC
+    assert "Bitcoin at 08:00 UTC: $60,123.45 (+1.50% today)" in text_of(messages[0])
+    assert "Bitcoin at 17:00 JST: $60,123.45 (+1.50% today)" in text_of(messages[1])
+
+def test_attachments_are_shared():
+    attachment = MIMEApplication(b"\x89PNG" + bytes(2048), Name="chart.png")
+    subscribers = [make_subscriber(f"{i}@example.com") for i in range(3)]
+    messages, _ = build_messages(make_report(), subscribers, "agent@example.com", attachments=[attachment])
+    parts = parse(messages[2]).get_payload()
+    assert len(parts) == 2
+    assert parts[1].get_payload(decode=True) == b"\x89PNG" + bytes(2048)
+
+def test_no_subscribers():
+    messages, stats = build_messages(make_report(), [], "agent@example.com")
+    assert messages == [] and stats['segments'] == 0
@@ -0,0 +1,63 @@
+from seen_urls import BloomFilter, SeenUrlIndex
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f"https://example.com/{i}" for i in range(1000)]
+    for url in urls:
+        bloom.add(url)
+    assert all(url in bloom for url in urls)
+    assert bloom.count == 1000
+
+def test_bloom_filter_false_positive_rate_near_target():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"https://example.com/{i}")
+    false_positives = sum(f"https://other.example.com/{i}" in bloom for i in range(10000))
+    assert false_positives / 10000 < 0.03
+
+def test_bloom_filter_round_trips_through_dict():
+    bloom = BloomFilter(capacity=100, error_rate=0.01)
+    bloom.add("https://example.com/a")
+    restored = BloomFilter.from_dict(bloom.to_dict())
+    assert "https://example.com/a" in restored
+    assert restored.count == 1
+    assert restored.num_bits == bloom.num_bits
+
+def test_classify_splits_seen_unsure_and_new():
+    index = SeenUrlIndex(path=None, capacity=100, lru_size=2)
+    index.add(["a", "b", "c"])
+    # "a" fell out of the LRU but is still in the bloom filter
+    seen, unsure, new = index.classify(["a", "b", "c", "d"])
+    assert seen == ["b", "c"]
+    assert unsure == ["a"]
+    assert new == ["d"]
+    assert index.stats == {"hits": 2, "misses": 1, "lookups": 1, "false_positives": 0}
+
+def test_classify_refreshes_lru_order():
+    index = SeenUrlIndex(path=None, capacity=100, lru_size=2)
+    index.add(["a", "b"])
+    index.classify(["a"])
+    index.add(["c"])
+    assert list(index.lru) == ["a", "c"]
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "cache" / "seen_urls.json")
+    index = SeenUrlIndex(path=path, capacity=100)
+    index.add(["a", "b"])
+    index.save()
+
+    loaded = SeenUrlIndex(path=path, capacity=100)
+    assert loaded.load()
+    assert loaded.classify(["a", "b", "z"]) == (["a", "b"], [], ["z"])
+
+def test_load_without_file(tmp_path):
+    assert not SeenUrlIndex(path=str(tmp_path / "missing.json")).load()
+
+def test_rebuild_grows_capacity():
+    index = SeenUrlIndex(path=None, capacity=10, lru_size=5)
+    urls = [f"u{i}" for i in range(50)]
+    index.rebuild(urls)
+    assert index.bloom.capacity == 100
+    assert len(index.lru) == 5
+    seen, unsure, new = index.classify(urls)
+    assert len(seen) == 5 and len(unsure) == 45 and not new
@@ -0,0 +1,162 @@
+import socketserver
+import threading
+from email.message import EmailMessage
+import pytest
+from smtp_pool import DeliveryEngine, RawMessage
+
+class ScriptedSMTPServer:
+    """Local SMTP server that drops the connection at scripted points
+
+    drops is a list of 'connect', 'MAIL' or 'DATA', consumed one at a time:
+    'connect' closes a new connection before the greeting, 'MAIL' closes it
+    instead of answering MAIL, and 'DATA' reads the whole message, counts it
+    as delivered and closes without replying.
+    """
+
+    def __init__(self):
+        self.drops = []
+        self.sessions = 0
+        self.delivered = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def drop(self, point):
+                with server.lock:
+                    if server.drops and server.drops[0] == point:
+                        server.drops.pop(0)
+                        return True
+                return False
+
+            def handle(self):
+                with server.lock:
+                    server.sessions += 1
+                if self.drop('connect'):
+                    return
+                self.reply("220 localhost scripted ESMTP")
+                recipients = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode().strip().split(' ', 1)[0].upper()
+                    if command == 'EHLO':
+                        self.reply("250-localhost\r\n250 8BITMIME")
+                    elif command == 'MAIL':
+                        if self.drop('MAIL'):
+                            return
+                        recipients = []
+                        self.reply("250 OK")
+                    elif command == 'RCPT':
+                        recipients.append(line.decode().split(':', 1)[1].strip().strip('<>'))
+                        self.reply("250 OK")
+                    elif command == 'DATA':
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b""):
+                            pass
+                        with server.lock:
+                            server.delivered.extend(recipients)
+                        if self.drop('DATA'):
+                            return
+                        self.reply("250 Queued")
+                    elif command == 'QUIT':
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.tcp = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.tcp.daemon_threads = True
+        self.port = self.tcp.server_address[1]
+        threading.Thread(target=self.tcp.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.tcp.shutdown()
+        self.tcp.server_close()
+
+@pytest.fixture
+def server():
+    server = ScriptedSMTPServer()
+    yield server
+    server.close()
+
+def make_engine(server, **kwargs):
+    settings = dict(host='127.0.0.1', port=server.port, use_ssl=False, pool_size=1, rate_limit=0, timeout=5)
+    settings.update(kwargs)
+    return DeliveryEngine(**settings)
+
+def raw(recipient):
+    return RawMessage("agent@example.com", recipient,
+                      b"From: agent@example.com\r\nTo: " + recipient.encode() + b"\r\nSubject: Report\r\n",
+                      b"\r\nBitcoin is flat.\r\n")
+
+def test_session_is_reused_across_messages_and_deliveries(server):
+    engine = make_engine(server)
+    assert engine.deliver([raw("a@example.com"), raw("b@example.com")])['sent'] == 2
+    assert engine.deliver([raw("c@example.com")])['sent'] == 1
+    assert server.delivered == ["a@example.com", "b@example.com", "c@example.com"]
+    assert engine.stats['sessions_opened'] == 1
+    engine.close()
+
+def test_sessions_are_recycled_after_max_messages(server):
+    engine = make_engine(server, max_messages_per_session=2)
+    assert engine.deliver([raw(f"{i}@example.com") for i in range(5)])['sent'] == 5
+    assert engine.stats['sessions_opened'] == 3
+    engine.close()
+
+def test_email_message_is_sent_as_is(server):
+    engine = make_engine(server)
+    message = EmailMessage()
+    message["From"] = "agent@example.com"
+    message["To"] = "a@example.com"
+    message["Subject"] = "Report"
+    message.set_content("Bitcoin is flat.")
+    assert engine.deliver([message])['sent'] == 1
+    assert server.delivered == ["a@example.com"]
+    engine.close()
+
+def test_connect_failure_is_retried(server):
+    server.drops = ['connect']
+    engine = make_engine(server)
+    assert engine.deliver([raw("a@example.com")])['sent'] == 1
+    assert server.sessions == 2
+    assert engine.stats['reconnects'] == 1
+    engine.close()
+
+def test_disconnect_before_data_is_retried_on_a_new_session(server):
+    engine = make_engine(server)
+    engine.deliver([raw("a@example.com")])
+    server.drops = ['MAIL']
+    assert engine.deliver([raw("b@example.com")])['sent'] == 1
+    assert server.delivered == ["a@example.com", "b@example.com"]
+    assert engine.stats['reconnects'] == 1
+    engine.close()
+
+def test_disconnect_after_data_is_not_retried(server):
+    server.drops = ['DATA']
+    engine = make_engine(server)
+    report = engine.deliver([raw("a@example.com")])
+    # The server may have queued it already, a retry could deliver it twice
+    assert report['sent'] == 0 and report['failed'] == 1
+    assert server.delivered == ["a@example.com"]
+    assert server.sessions == 1
+    # The next message gets a fresh session
+    assert engine.deliver([raw("b@example.com")])['sent'] == 1
+    assert server.delivered == ["a@example.com", "b@example.com"]
+    engine.close()
+
+def test_second_failure_is_reported(server):
+    server.drops = ['MAIL', 'MAIL']
+    engine = make_engine(server)
+    assert engine.deliver([raw("a@example.com")])['failed'] == 1
+    assert server.delivered == []
+    engine.close()
+
+def test_unreachable_server_fails_the_message():
+    engine = DeliveryEngine(host='127.0.0.1', port=9, use_ssl=False, pool_size=1, rate_limit=0, timeout=1)
+    assert engine.deliver([raw("a@example.com")])['failed'] == 1
+    assert engine.stats['failed'] == 1